@@ -1,7 +1,6 @@
 import argparse
-import asyncio
+import json
 import sys
-from .client import TrisulAIClient
 from importlib.metadata import version
 
 
@@ -10,6 +9,152 @@ def docs(args=None):
     👉 https://www.trisul.org/blog/trisul-ai-2025-a-new-way-to-interact-with-network-intelligence""")
 
 
+def batch(args):
+    """Run a list of queries (one per line, # for comments) non-interactively and write the answers as JSONL."""
+    import asyncio
+    from .client import TrisulAIClient
+
+    source = sys.stdin if args.file in (None, "-") else open(args.file)
+    with source:
+        queries = [line.strip() for line in source if line.strip() and not line.strip().startswith("#")]
+    if not queries:
+        print("No queries to run.", file=sys.stderr)
+        sys.exit(1)
+
+    output = open(args.output, "w") if args.output else sys.stdout
+    client = TrisulAIClient(transport=args.transport)
+
+    async def run():
+        try:
+            return await client.run_batch(queries, output=output, concurrency=args.concurrency)
+        finally:
+            await client.cleanup()
+
+    try:
+        summary = asyncio.run(run())
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    print(json.dumps(summary, indent=2), file=sys.stderr)
+    sys.exit(1 if summary["errors"] else 0)
+
+
+def schedule(args):
+    """Scheduled reports: record the tool calls of a report query once, then replay them on a cron expression without the LLM."""
+    import asyncio
+    from datetime import datetime
+    from .client import TrisulAIClient
+    from .tools.report_scheduler import CronSchedule
+
+    client = TrisulAIClient(transport=args.transport)
+    store = client.get_job_store()
+
+    if args.action == "list":
+        for job in store.list():
+            print(json.dumps({
+                "name": job["name"],
+                "cron": job["cron"],
+                "query": job["query"],
+                "tool_calls": [step["tool"] for step in job["plan"]],
+                "output_dir": job["output_dir"],
+                "next_run": datetime.fromtimestamp(job["next_run"]).isoformat(timespec="minutes"),
+                "last_run": datetime.fromtimestamp(job["last_run"]).isoformat(timespec="minutes") if job["last_run"] else None,
+                "last_status": job["last_status"],
+            }))
+        return
+
+    if args.action != "start" and not args.name:
+        print(f"schedule {args.action} needs a job name.", file=sys.stderr)
+        sys.exit(1)
+
+    if args.action == "remove":
+        if not store.remove(args.name):
+            print(f"No scheduled job named '{args.name}'.", file=sys.stderr)
+            sys.exit(1)
+        return
+
+    if args.action == "add":
+        if not args.cron or not args.query:
+            print("schedule add needs --cron and --query.", file=sys.stderr)
+            sys.exit(1)
+        try:
+            CronSchedule(args.cron)
+        except ValueError as e:
+            print(str(e), file=sys.stderr)
+            sys.exit(1)
+        job = None
+    elif args.action == "run":
+        job = store.get(args.name)
+        if job is None:
+            print(f"No scheduled job named '{args.name}'.", file=sys.stderr)
+            sys.exit(1)
+
+    async def run():
+        try:
+            if args.action == "add":
+                return await client.record_scheduled_job(args.name, args.cron, args.query, args.output_dir)
+            if args.action == "run":
+                return await client.run_scheduled_job(job, store)
+            return await client.run_scheduler()
+        finally:
+            await client.cleanup()
+
+    try:
+        result = asyncio.run(run())
+    except KeyboardInterrupt:
+        return
+    except RuntimeError as e:
+        print(str(e), file=sys.stderr)
+        sys.exit(1)
+
+    print(json.dumps(result, indent=2, default=str))
+    if args.action == "run" and result["status"] == "error":
+        sys.exit(1)
+
+
+def daemon(args):
+    """Status of the shared MCP daemon of the current user, or stop it."""
+    import asyncio
+    from .client import TrisulAIClient
+    from .tools.daemon_auth import load_or_create_token
+
+    client = TrisulAIClient(transport="daemon")
+
+    async def run():
+        if args.action == "stop":
+            return await client.stop_daemon()
+        identity = await client.daemon_identity(load_or_create_token())
+        if identity is False:
+            return {"status": "not_yours", "url": client.daemon_url}
+        return {"status": "running", "pid": identity["pid"], "url": client.daemon_url} if identity else {"status": "not_running", "url": client.daemon_url}
+
+    try:
+        result = asyncio.run(run())
+    except RuntimeError as e:
+        print(str(e), file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps(result))
+    if result["status"] == "not_yours":
+        sys.exit(1)
+
+
+def sessions(args):
+    """List the saved conversations of the current user, most recent first."""
+    from datetime import datetime
+    from .client import TrisulAIClient
+
+    client = TrisulAIClient(transport=args.transport)
+    for session in client.get_session_store().list(limit=args.limit):
+        print(json.dumps({
+            "session_id": session["session_id"],
+            "title": session["title"],
+            "turns": session["turns"],
+            "created_at": datetime.fromtimestamp(session["created_at"]).isoformat(timespec="minutes"),
+            "updated_at": datetime.fromtimestamp(session["updated_at"]).isoformat(timespec="minutes"),
+        }))
+
+
 def cli_main():
     parser = argparse.ArgumentParser(
         prog="trisul_ai_cli", 
@@ -20,18 +165,39 @@ def cli_main():
     )
 
     parser.add_argument("-h", "--help", action="store_true", help="print help")
+    parser.add_argument("--transport", choices=["stdio", "inprocess", "daemon"], default=None, help="MCP transport: stdio (server in its own process), inprocess or daemon (shared local server)")
+    parser.add_argument("--resume", nargs="?", const="last", metavar="SESSION_ID", help="continue a saved conversation, the most recent one without SESSION_ID")
     parser.add_argument("-v", "-V", "--version", action="version", version=f"Trisul AI CLI - {version('trisul_ai_cli')}")
 
     subparsers = parser.add_subparsers(dest="command", title="Commands")
     # Available subcommands
     commands = {
         "docs": ("Open Trisul online documentation", docs),
+        "batch": ("Answer a list of queries non-interactively, output as JSONL", batch),
+        "schedule": ("Record a report query once and rerun it on a cron schedule without the LLM", schedule),
+        "daemon": ("Show or stop the shared MCP daemon started with --transport daemon", daemon),
+        "sessions": ("List the saved conversations, continue one with --resume SESSION_ID", sessions),
     }
 
     # Register each subcommand
+    command_parsers = {}
     for name, (desc, func) in commands.items():
         sp = subparsers.add_parser(name, help=desc)
         sp.set_defaults(func=func)
+        command_parsers[name] = sp
+
+    command_parsers["batch"].add_argument("file", nargs="?", default="-", help="file with one query per line (default: stdin)")
+    command_parsers["batch"].add_argument("-o", "--output", help="JSONL file for the answers (default: stdout)")
+    command_parsers["batch"].add_argument("-c", "--concurrency", type=int, default=4, help="queries run at the same time (default: 4)")
+
+    command_parsers["schedule"].add_argument("action", choices=["add", "list", "remove", "run", "start"], help="add: record a job, run: run a job now, start: run the scheduler until interrupted")
+    command_parsers["schedule"].add_argument("name", nargs="?", help="job name")
+    command_parsers["schedule"].add_argument("--cron", help='cron expression, e.g. "0 7 * * *" (daily at 07:00) or @weekly')
+    command_parsers["schedule"].add_argument("--query", help="report query to record, e.g. \"PDF report of the top 10 hosts in the last 24 hours\"")
+    command_parsers["schedule"].add_argument("-o", "--output-dir", help="directory for the reports (default: TRISUL_REPORT_DIR or /tmp)")
+
+    command_parsers["daemon"].add_argument("action", choices=["status", "stop"], help="status: whether your daemon is running, stop: shut it down")
+    command_parsers["sessions"].add_argument("-n", "--limit", type=int, default=20, help="sessions to list (default: 20)")
 
     args, _ = parser.parse_known_args()
     
@@ -43,8 +209,11 @@ def cli_main():
 
     # Default behavior (no subcommand → start chat)
     if args.command is None:
-        client = TrisulAIClient()
-        asyncio.run(client.main())
+        # Imported here so that `--help`, `--version` and the other commands do not pay for the client imports
+        import asyncio
+        from .client import TrisulAIClient
+        client = TrisulAIClient(transport=args.transport)
+        asyncio.run(client.main(resume=args.resume))
         return
 
     # Execute the subcommand
@@ -15,9 +15,23 @@ from pathlib import Path
 import os
 import readline
 from importlib.metadata import version
+from urllib.parse import urlparse
 import re
+import shutil
+import hmac
+import signal
 import subprocess
+import threading
+import time
 from trisul_ai_cli.tools.utils import TrisulAIUtils
+from trisul_ai_cli.tools.inprocess_session import InProcessSession
+from trisul_ai_cli.tools.log_setup import setup_logging_from_env, log_payload
+from trisul_ai_cli.tools.tracing import Tracer, current_trace_meta, summarize_turn
+from trisul_ai_cli.tools.tool_router import ToolRouter
+from trisul_ai_cli.tools.user_memory import MemoryStore, MEMORY_UPDATE_TOP_K, parse_memory_diff, format_facts
+from trisul_ai_cli.tools.report_scheduler import ScheduledJobStore, CronSchedule, UNREPLAYED_TOOLS, step_outputs, plan_dependencies, map_outputs, replay_args, inline_data_steps
+from trisul_ai_cli.tools.session_store import SessionStore, SESSION_RESUME_TURNS, handles_in
+from trisul_ai_cli.tools.daemon_auth import load_or_create_token, identity_proof, DAEMON_TOKEN_ENV, DAEMON_IDENTITY_PATH, DAEMON_STOP_PATH
 from trisul_ai_cli.llm_factory import LLMFactory
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, ToolMessage
 import json
@@ -27,17 +41,23 @@ import stdiomask
 
 
 class TrisulAIClient:
-    def __init__(self):
+    MCP_TRANSPORTS = ["stdio", "inprocess", "daemon"]
+    DAEMON_DEFAULT_URL = "http://127.0.0.1:8731/mcp"
+    DAEMON_START_TIMEOUT_SECS = 30
+    # Tools the server exposes for the CLI itself, never offered to the LLM
+    INTERNAL_TOOLS = ["get_trace_spans", "export_results", "restore_results"]
+    INTERACTIVE_ONLY_TOOLS = ["configure_llm_model", "configure_embedding_model", "configure_llm_api_key", "configure_embedding_api_key"]
+    REPORT_TOOLS = ["generate_trisul_report", "generate_report_from_template"]
+    SCHEDULE_POLL_SECS = 30
+    MEMORY_EXIT_GRACE_SECS = 3
+
+    def __init__(self, transport: str = None):
         # Initialize asyncio
         nest_asyncio.apply()
         os.environ["QT_QPA_PLATFORM"] = "xcb"
         
-        # Initialize logging
-        logging.basicConfig(
-            filename= Path(os.getcwd()) / "trisul_ai_cli.log",
-            level=logging.INFO,
-            format="%(asctime)s - %(levelname)s - %(message)s"
-        )
+        # Initialize logging (queued, size capped and rotated, see tools/log_setup.py)
+        setup_logging_from_env(Path(__file__).resolve().parent / ".env", Path(os.getcwd()) / "trisul_ai_cli.log")
         
         
         # Initialize utils
@@ -48,32 +68,71 @@ class TrisulAIClient:
         self.exit_stack = AsyncExitStack()
         self.stdio = None
         self.write = None
+        self.mcp_tools = None
+        self.tool_router = None
+        self.server_task = None
+        self.server_ready = None
+        self.server_shutdown = None
         
         # Initialize Global variables
         self.root_dir = Path(__file__).resolve().parent
         self.env_path = self.root_dir / ".env"
         self.llm_factory = LLMFactory(env_path=self.env_path, logging=logging)
-        self.existing_ai_memory = []
-        self.memory_json_path = self.root_dir / "trisul_ai_memory.json"
-        with open(self.memory_json_path, "r") as file:
-            self.existing_ai_memory = json.load(file)
+        # stdio runs the MCP server in its own process, inprocess loads its tools into this process,
+        # daemon attaches to a local server shared by all CLI sessions (started on first use)
+        self.transport = transport or self.llm_factory.config.get("TRISUL_MCP_TRANSPORT", "stdio")
+        if self.transport not in self.MCP_TRANSPORTS:
+            logging.warning(f"[Client] Unknown MCP transport '{self.transport}', using stdio")
+            self.transport = "stdio"
+        self.daemon_url = self.llm_factory.config.get("TRISUL_MCP_DAEMON_URL", self.DAEMON_DEFAULT_URL)
+        # Bind only the tools relevant to the conversation instead of all of them (see tools/tool_router.py)
+        self.tool_routing = str(self.llm_factory.config.get("TRISUL_TOOL_ROUTING", "on")).lower() in ("on", "true", "1")
+        self.tracer = Tracer("trisul-ai-cli", export_path=self.llm_factory.config.get("TRISUL_TRACE_FILE"), logging=logging)
+        self.last_trace_id = None
+        # Remembered facts, the ones relevant to a question are attached to it (see user_message)
+        self.memory_store = MemoryStore(
+            self.llm_factory.config.get("TRISUL_MEMORY_DB") or self.root_dir / "trisul_ai_memory.sqlite",
+            import_path=self.root_dir / "trisul_ai_memory.json",
+            logging=logging,
+        )
+        # Memory is updated in the background after every answer, from the messages after memory_cursor
+        self.memory_cursor = 1
+        self.memory_pending_until = 1
+        self.memory_task = None
         self.confidence_threshold = 90
         self.line_chart_data = {}
         self.pie_chart_data = {}
         self.report_path = None
+        # Charts being saved to image files, they render in parallel with the rest of the turn
+        self.pending_renders = []
         self.max_iterations = 15
+        # Saved conversation (see tools/session_store.py), created with the first answer or resumed with --resume.
+        # session_saved_until is the history index up to which the messages are saved, session_first_turn
+        # the oldest saved turn in the history. The results of a resumed session go back to the server
+        # only when a tool call refers to their handle.
+        self.session_store = None
+        self.session_id = None
+        self.session_saved_until = 1
+        self.session_first_turn = 1
+        self.session_max_handle = 0
+        self.session_result_handles = set()
+        self.session_restored_handles = set()
+        self.session_counter_restored = True
                 
         
         # Load main system prompt
         system_prompt_path = self.root_dir / "prompts/system_main.txt"
         template = system_prompt_path.read_text()
-        main_system_prompt = template.format(
-            existing_ai_memory=self.existing_ai_memory
-        )
+        self.main_system_prompt = template.format()
     
-        self.conversation_history = [
-            SystemMessage(content=main_system_prompt)
-        ]
+        self.conversation_history = self.new_conversation_history()
+        # False in batch mode, tools that need the terminal (model and API key prompts, chart windows) are skipped
+        self.interactive = True
+
+
+
+    def new_conversation_history(self):
+        return [SystemMessage(content=self.main_system_prompt)]
 
 
 
@@ -261,25 +320,163 @@ class TrisulAIClient:
 
 
 
-    async def connect_to_server(self, server_module: str = "trisul_ai_cli.server"):
-        server_params = StdioServerParameters(
-            command="python3",
-            args=["-m", server_module],
+    def start_server(self, server_module: str = "trisul_ai_cli.server"):
+        """Spawn the MCP server and run the handshake in the background, so the prompt is shown right away."""
+        if self.server_task:
+            return
+        loop = asyncio.get_running_loop()
+        self.server_ready = loop.create_future()
+        self.server_shutdown = asyncio.Event()
+        self.server_task = asyncio.create_task(self._run_server(server_module))
+
+
+    async def _run_server(self, server_module: str):
+        # The stdio transport and session are entered and closed in this task, their cancel scopes are bound to it
+        try:
+            if self.transport == "inprocess":
+                self.session = InProcessSession(server_module, logging=logging)
+                self.exit_stack.push_async_callback(self.session.aclose)
+                await self.session.initialize()
+            elif self.transport == "daemon":
+                from mcp.client.streamable_http import streamablehttp_client
+
+                token = await self.ensure_daemon(server_module)
+                self.stdio, self.write, _ = await self.exit_stack.enter_async_context(streamablehttp_client(self.daemon_url, headers={"Authorization": f"Bearer {token}"}))
+                self.session = await self.exit_stack.enter_async_context(ClientSession(self.stdio, self.write))
+                await self.session.initialize()
+            else:
+                server_params = StdioServerParameters(
+                    command="python3",
+                    args=["-m", server_module],
+                )
+
+                stdio_transport = await self.exit_stack.enter_async_context(stdio_client(server_params))
+                self.stdio, self.write = stdio_transport
+                self.session = await self.exit_stack.enter_async_context(ClientSession(self.stdio, self.write))
+                await self.session.initialize()
+            logging.info(f"[Client] Connected to server ({self.transport})")
+
+            # Prefetch the tool list, it does not change during the session
+            self.mcp_tools = await self.get_mcp_tools()
+            logging.info(f"[Client] Prefetched {len(self.mcp_tools)} MCP tools")
+            if self.tool_routing:
+                self.tool_router = ToolRouter(self.mcp_tools, logging=logging)
+
+            self.server_ready.set_result(True)
+
+            await self.server_shutdown.wait()
+        except Exception as e:
+            logging.error(f"[Client] MCP server error: {e}")
+            if not self.server_ready.done():
+                self.server_ready.set_exception(e)
+        finally:
+            await self.exit_stack.aclose()
+
+
+    async def daemon_identity(self, token: str):
+        """Identity of the process listening on the daemon address: None when nothing listens,
+        False when it is not a daemon holding this user's token, else {"pid": ...}."""
+        import httpx
+
+        url = urlparse(self.daemon_url)
+        nonce = os.urandom(16).hex()
+        try:
+            async with httpx.AsyncClient(timeout=3) as http:
+                response = await http.get(f"{url.scheme}://{url.netloc}{DAEMON_IDENTITY_PATH}", params={"nonce": nonce})
+        except httpx.TransportError:
+            return None
+        try:
+            identity = response.json()
+        except ValueError:
+            return False
+        if not isinstance(identity, dict) or not identity.get("proof") or not hmac.compare_digest(str(identity["proof"]), identity_proof(token, nonce)):
+            return False
+        return identity
+
+
+    async def ensure_daemon(self, server_module: str) -> str:
+        """Start the user's MCP daemon if nothing is listening on the daemon address yet, and check that a
+        listening process is that daemon before attaching. Returns the token to authenticate with."""
+        url = urlparse(self.daemon_url)
+        host, port = url.hostname, url.port or 80
+        token = await asyncio.to_thread(load_or_create_token)
+        not_ours = f"{host}:{port} is held by a process that is not your Trisul MCP daemon, set TRISUL_MCP_DAEMON_URL in .env to another address"
+
+        identity = await self.daemon_identity(token)
+        if identity is False:
+            raise RuntimeError(not_ours)
+        if identity:
+            logging.info(f"[Client] Attaching to MCP daemon at {self.daemon_url} (pid {identity.get('pid')})")
+            return token
+
+        logging.info(f"[Client] Starting MCP daemon at {self.daemon_url}")
+        # New session, so the daemon outlives this CLI and is not hit by its Ctrl+C.
+        # The token goes through the environment, the command line is visible to other users.
+        subprocess.Popen(
+            ["python3", "-m", server_module, "--transport", "streamable-http", "--host", host, "--port", str(port)],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+            env={**os.environ, DAEMON_TOKEN_ENV: token},
         )
 
-        stdio_transport = await self.exit_stack.enter_async_context(stdio_client(server_params))
-        self.stdio, self.write = stdio_transport
-        self.session = await self.exit_stack.enter_async_context(ClientSession(self.stdio, self.write))
-        await self.session.initialize()
+        deadline = asyncio.get_running_loop().time() + self.DAEMON_START_TIMEOUT_SECS
+        while True:
+            identity = await self.daemon_identity(token)
+            if identity is False:
+                raise RuntimeError(not_ours)
+            if identity:
+                return token
+            if asyncio.get_running_loop().time() > deadline:
+                raise RuntimeError(f"MCP daemon did not start listening on {host}:{port} within {self.DAEMON_START_TIMEOUT_SECS}s")
+            await asyncio.sleep(0.2)
+
+
+    async def stop_daemon(self) -> dict:
+        """Stop the user's MCP daemon. Returns {"status": "stopped" | "not_running", "pid": ...}."""
+        import httpx
+
+        token = await asyncio.to_thread(load_or_create_token)
+        identity = await self.daemon_identity(token)
+        if identity is None:
+            return {"status": "not_running", "url": self.daemon_url}
+        if identity is False:
+            url = urlparse(self.daemon_url)
+            raise RuntimeError(f"{url.hostname}:{url.port} is held by a process that is not your Trisul MCP daemon")
+
+        url = urlparse(self.daemon_url)
+        async with httpx.AsyncClient(timeout=5) as http:
+            response = await http.post(f"{url.scheme}://{url.netloc}{DAEMON_STOP_PATH}", headers={"Authorization": f"Bearer {token}"})
+        response.raise_for_status()
+        logging.info(f"[Client] Stopped MCP daemon pid {identity.get('pid')}")
+        return {"status": "stopped", "pid": identity.get("pid"), "url": self.daemon_url}
+
+
+    async def wait_for_server(self):
+        """Wait until the MCP server is up. Returns immediately once the handshake is done."""
+        if not self.server_task:
+            self.start_server()
+        if not self.server_ready.done():
+            logging.info("[Client] Waiting for MCP server to finish starting")
+        await asyncio.shield(self.server_ready)
+
 
-        logging.info("[Client] Connected to server")
+    async def connect_to_server(self, server_module: str = "trisul_ai_cli.server"):
+        self.start_server(server_module)
+        await self.wait_for_server()
 
 
 
     async def get_mcp_tools(self) -> List[Dict[str, Any]]:
+        if self.mcp_tools is not None:
+            return self.mcp_tools
+
         tools_result = await self.session.list_tools()
         tool_list = []
         for tool in tools_result.tools:
+            if tool.name in self.INTERNAL_TOOLS:
+                continue
             # Convert to OpenAI function format which is widely supported by LangChain bind_tools
             tool_list.append({
                 "type": "function",
@@ -292,6 +489,20 @@ class TrisulAIClient:
         return tool_list
 
 
+    async def get_bound_tools(self, history: list) -> List[Dict[str, Any]]:
+        """Tools to bind for the conversation in history: all of them, or the subset picked by the tool router
+        from the user messages and the tools already called."""
+        tools = await self.get_mcp_tools()
+        if not self.tool_routing:
+            return tools
+        if self.tool_router is None:
+            self.tool_router = ToolRouter(tools, logging=logging)
+
+        user_texts = [m.additional_kwargs.get("query", m.content) for m in history if isinstance(m, HumanMessage) and isinstance(m.content, str)]
+        used_tools = {c["name"] for m in history if isinstance(m, AIMessage) for c in m.tool_calls}
+        return self.tool_router.select(user_texts, used_tools, conversation=history[0] if history else None)
+
+
     def extract_message(self, e):
         s = str(e)
         m = re.search(r'message["\']?\s*[:=]\s*["\']?([^,"\}\]]+)', s)
@@ -316,31 +527,128 @@ class TrisulAIClient:
         return str(content)
 
 
-    async def process_query(self, query: str) -> str:
-        """Process a query using LangChain and MCP tools."""
-        
-        self.conversation_history.append(HumanMessage(content=query))
+    async def process_query(self, query: str, history: list = None, stats: dict = None) -> str:
+        """Process a query using LangChain and MCP tools.
+
+        history defaults to the interactive conversation, stats (if given) collects the LLM call,
+        token and tool call counts of the query.
+        """
+        history = self.conversation_history if history is None else history
+        stats = {} if stats is None else stats
+        stats.update({"llm_calls": 0, "input_tokens": 0, "output_tokens": 0, "cache_read_tokens": 0, "cost_usd": 0.0, "models": {}, "tool_calls": [], "tool_plan": [], "error": None})
+
+        with self.tracer.span("agent.turn", query_chars=len(query)) as turn_span:
+            stats["trace_id"] = turn_span.trace_id
+            if history is self.conversation_history:
+                self.last_trace_id = turn_span.trace_id
+            response = await self._process_query(query, history, stats)
+            await self.wait_for_renders()
+            turn_span.set(llm_calls=stats["llm_calls"], tool_calls=len(stats["tool_calls"]), input_tokens=stats["input_tokens"], output_tokens=stats["output_tokens"], cost_usd=round(stats["cost_usd"], 6), tools_bound=stats.get("tools_bound"), error=stats["error"])
+            return response
+
+
+    def schedule_chart_render(self, kind, data, file_path):
+        """Save a chart image in the background, see wait_for_renders."""
+        async def render():
+            with self.tracer.span("chart.render", chart=kind):
+                display = self.utils.display_line_chart if kind == "line" else self.utils.display_pie_chart
+                await display(data, file_path)
+
+        self.pending_renders.append(asyncio.create_task(render()))
+
+
+    async def wait_for_renders(self):
+        pending, self.pending_renders = self.pending_renders, []
+        for result in await asyncio.gather(*pending, return_exceptions=True):
+            if isinstance(result, Exception):
+                logging.error(f"[Client] Chart rendering failed: {result}")
+
+
+    async def invoke_llm(self, llm, model_name, role, history, stats, iteration):
+        """One LLM call, recording its latency, tokens and estimated cost per model in stats and the trace."""
+        with self.tracer.span("llm.invoke", iteration=iteration, messages=len(history), model=model_name, role=role) as llm_span:
+            started = time.perf_counter()
+            response = await llm.ainvoke(self.llm_factory.cacheable_messages(history))
+            latency = time.perf_counter() - started
+
+            usage = getattr(response, "usage_metadata", None) or {}
+            input_tokens, output_tokens = usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+            token_details = usage.get("input_token_details") or {}
+            cache_read, cache_write = token_details.get("cache_read") or 0, token_details.get("cache_creation") or 0
+            cost = self.llm_factory.estimate_cost(model_name, input_tokens, output_tokens, cache_read, cache_write)
+            llm_span.set(input_tokens=input_tokens, output_tokens=output_tokens, cache_read_tokens=cache_read, cache_write_tokens=cache_write, cost_usd=cost, tool_calls=len(response.tool_calls))
+
+        stats["llm_calls"] += 1
+        stats["input_tokens"] += input_tokens
+        stats["output_tokens"] += output_tokens
+        stats["cache_read_tokens"] += cache_read
+        stats["cost_usd"] += cost or 0
+        model_stats = stats["models"].setdefault(model_name, {"role": role, "calls": 0, "input_tokens": 0, "output_tokens": 0, "latency_secs": 0.0, "cost_usd": 0.0})
+        model_stats["calls"] += 1
+        model_stats["input_tokens"] += input_tokens
+        model_stats["output_tokens"] += output_tokens
+        model_stats["latency_secs"] = round(model_stats["latency_secs"] + latency, 3)
+        model_stats["cost_usd"] += cost or 0
+        logging.info(f"[Client] LLM call: model={model_name} role={role} latency={latency:.2f}s tokens={input_tokens}/{output_tokens} cache_read={cache_read} cost={cost}")
+        return response
+
+
+    def user_message(self, query: str) -> HumanMessage:
+        """The question as sent to the LLM, followed by the remembered facts relevant to it. The plain question
+        is kept in additional_kwargs for the tool router and the memory update."""
+        content = query
+        try:
+            facts = self.memory_store.search(query)
+        except Exception as e:
+            logging.error(f"[Client] [ai_memory] Memory search failed: {e}")
+            facts = []
+        if facts:
+            logging.info(f"[Client] [ai_memory] Attaching {len(facts)} facts: {[f.get('key') for f in facts]}")
+            content = f"{query}\n\nKnown about the user (use when relevant):\n{format_facts(facts)}"
+        return HumanMessage(content=content, additional_kwargs={"query": query})
+
+
+    async def _process_query(self, query: str, history: list, stats: dict) -> str:
+        history.append(self.user_message(query))
 
         llm = self.llm_factory.get_llm()
         if not llm:
-             return "Error: API Key not set or LLM not initialized."
-
-        tools = await self.get_mcp_tools()
+            stats["error"] = "API Key not set or LLM not initialized"
+            return "Error: API Key not set or LLM not initialized."
+        model_name = self.llm_factory.model_name
+
+        await self.wait_for_server()
+        tools = await self.get_bound_tools(history)
+        stats["tools_bound"] = len(tools)
+        logging.info(f"[Client] Binding {len(tools)} tools: {[t['function']['name'] for t in tools]}")
+        tools = self.llm_factory.cacheable_tools(tools)
         llm_with_tools = llm.bind_tools(tools)
 
+        # With routing on, the fast router model runs the tool calling steps. Once it stops calling
+        # tools, its answer is dropped and the configured model writes the final answer.
+        router_llm = self.llm_factory.get_router_llm()
+        router_with_tools = router_llm.bind_tools(tools) if router_llm else None
+        router_model_name = self.llm_factory.router_model_name
+
         iteration = 0
         
         while iteration < self.max_iterations:
             iteration += 1
             
             try:
-                response = await llm_with_tools.ainvoke(self.conversation_history)
+                if router_with_tools:
+                    response = await self.invoke_llm(router_with_tools, router_model_name, "router", history, stats, iteration)
+                    if not response.tool_calls:
+                        response = await self.invoke_llm(llm_with_tools, model_name, "main", history, stats, iteration)
+                else:
+                    response = await self.invoke_llm(llm_with_tools, model_name, "main", history, stats, iteration)
             except Exception as e:
                 logging.error(f"[Client] LLM Error: {e}")
                 msg = self.extract_message(str(e))
+                stats["error"] = msg
                 return f"Error communicating with LLM: {msg}"
             
-            self.conversation_history.append(response)
+            history.append(response)
             
             if not response.tool_calls:
                 # Handle both string and list responses
@@ -353,14 +661,24 @@ class TrisulAIClient:
                 function_args = tool_call["args"]
                 tool_call_id = tool_call["id"]
                 
-                logging.info(f"[Client] Calling function: {function_name} with args: {function_args}")
+                logging.info("[Client] Calling function: %s with args: %s", function_name, log_payload(function_args))
+                stats["tool_calls"].append(function_name)
                 
                 try:
+                    # The report embeds the saved chart images, they have to be on disk first
+                    if function_name in self.REPORT_TOOLS:
+                        await self.wait_for_renders()
+
+                    if history is self.conversation_history:
+                        await self.restore_session_results(function_args)
+
                     # Call the tool on MCP server
-                    result = await self.session.call_tool(function_name, function_args)
-                    tool_result = result.content[0].text if result.content else "No result"
+                    with self.tracer.span("mcp.call_tool", tool=function_name, transport=self.transport, args_bytes=len(json.dumps(function_args, default=str))) as tool_span:
+                        result = await self.session.call_tool(function_name, function_args, meta=current_trace_meta())
+                        tool_result = result.content[0].text if result.content else "No result"
+                        tool_span.set(result_bytes=len(tool_result), is_error=bool(result.isError))
                     clean_result = tool_result.replace("\n", "").replace("\r", "").replace("\t", " ").replace("   ", "")
-                    logging.info(f"[Client] Function result: {clean_result}")
+                    logging.info("[Client] Function result: %s", log_payload(clean_result))
                     
                     # Parse JSON if possible for side effects
                     json_result = None
@@ -369,47 +687,62 @@ class TrisulAIClient:
                     except Exception:
                         pass
                     
+                    # Charts drawn from a result handle come back with the data the server looked up,
+                    # the LLM does not need it back in the conversation
+                    chart_data = None
+                    if json_result and json_result.get("chart_data"):
+                        chart_data = json_result.pop("chart_data")
+                        tool_result = json.dumps(json_result)
+
+                    # The calls behind the answer, a scheduled report replays them without the LLM
+                    if not result.isError and function_name not in UNREPLAYED_TOOLS:
+                        stats["tool_plan"].append({"tool": function_name, "args": function_args, "outputs": step_outputs(tool_result)})
+
                     # Handle side effects
                     if function_name == "show_line_chart":
                         if json_result and json_result.get('status') == "success":
                             if json_result.get('file_path'):
-                                await self.utils.display_line_chart(function_args.get("data"), json_result['file_path'])
-                            else:
-                                self.line_chart_data = function_args.get("data")
+                                self.schedule_chart_render("line", chart_data or function_args.get("data"), json_result['file_path'])
+                            elif self.interactive:
+                                self.line_chart_data = chart_data or function_args.get("data")
                         else:
                             logging.warning(f"[Client] [process_query] {json_result.get('message') if json_result else tool_result}")
 
                     if function_name == "show_pie_chart":
                         if json_result and json_result.get('status') == "success":
                             if json_result.get('file_path'):
-                                await self.utils.display_pie_chart(function_args.get("data"), json_result['file_path'])
-                            else:
-                                self.pie_chart_data = function_args.get("data")
+                                self.schedule_chart_render("pie", chart_data or function_args.get("data"), json_result['file_path'])
+                            elif self.interactive:
+                                self.pie_chart_data = chart_data or function_args.get("data")
                         else:
                             logging.warning(f"[Client] [process_query] {json_result.get('message') if json_result else tool_result}")
 
-                    if function_name == "generate_trisul_report":
+                    if function_name in self.REPORT_TOOLS:
                         if json_result and json_result.get('status') == "success":
-                            self.report_path = json_result.get('file_path')
+                            if self.interactive:
+                                self.report_path = json_result.get('file_path')
                         else:
                             logging.warning(f"[Client] [process_query] {json_result.get('message') if json_result else tool_result}")
 
-                    if function_name == "configure_llm_model":
+                    if not self.interactive and function_name in self.INTERACTIVE_ONLY_TOOLS:
+                        tool_result = "This action needs an interactive terminal and is not available in batch mode."
+
+                    elif function_name == "configure_llm_model":
                         print("\033[F\033[K", end="")
                         new_model = self.set_llm_model()
                         tool_result = f'The LLM model version has been changed to {new_model}.'
 
-                    if function_name == "configure_embedding_model":
+                    elif function_name == "configure_embedding_model":
                         print("\033[F\033[K", end="")
                         new_model = self.set_embedding_model()
                         tool_result = f'The Embedding model version has been changed to {new_model}.'
 
-                    if function_name == "configure_llm_api_key":
+                    elif function_name == "configure_llm_api_key":
                         print("\033[F\033[K", end="")
                         self.set_api_key(provider_type="llm")
                         tool_result = "LLM API Key updated."
 
-                    if function_name == "configure_embedding_api_key":
+                    elif function_name == "configure_embedding_api_key":
                         print("\033[F\033[K", end="")
                         self.set_api_key(provider_type="embedding")
                         tool_result = "Embedding API Key updated."
@@ -418,7 +751,7 @@ class TrisulAIClient:
                         tool_result = self.get_current_model_status()
                     
                     # Add tool output to history
-                    self.conversation_history.append(ToolMessage(
+                    history.append(ToolMessage(
                         content=tool_result,
                         tool_call_id=tool_call_id,
                         name=function_name
@@ -426,7 +759,7 @@ class TrisulAIClient:
                     
                 except Exception as e:
                     logging.error(f"[Client] Error calling function {function_name}: {e}")
-                    self.conversation_history.append(ToolMessage(
+                    history.append(ToolMessage(
                         content=f"Error: {str(e)}",
                         tool_call_id=tool_call_id,
                         name=function_name
@@ -434,61 +767,189 @@ class TrisulAIClient:
             
             # Loop continues to send tool outputs back to LLM
         
+        stats["error"] = "max iterations reached"
         return "Reached max iterations without final response"
 
 
 
 
 
-    async def update_user_memory(self):
-        logging.info(f"[Client] [ai_memory] Updating user memory. Existing memory: \n {self.existing_ai_memory}")
-        
-        filtered_conversation = []
+    def schedule_memory_update(self):
+        """Extract memory from the conversation up to here in the background. An update that is already
+        running picks up the new messages once it is done."""
+        self.memory_pending_until = len(self.conversation_history)
+        if self.memory_task is None or self.memory_task.done():
+            self.memory_task = asyncio.create_task(self.update_user_memory())
 
-        for msg in self.conversation_history:
-            if isinstance(msg, HumanMessage):
-                filtered_conversation.append({"user": msg.content})
-            elif isinstance(msg, AIMessage):
-                # Extract text from AIMessage content
-                content = self.extract_text_from_content(msg.content)
-                filtered_conversation.append({"model": content})
 
+    async def update_user_memory(self):
+        """Send the messages added since the last update to the LLM and apply the memory diff it returns to
+        the memory store. Only user questions and final answers are sent, tool calls and results are left out."""
+        while self.memory_cursor < self.memory_pending_until:
+            new_messages = self.conversation_history[self.memory_cursor:self.memory_pending_until]
+            self.memory_cursor = self.memory_pending_until
+
+            filtered_conversation = []
+            for msg in new_messages:
+                if isinstance(msg, HumanMessage):
+                    filtered_conversation.append({"user": msg.additional_kwargs.get("query", msg.content)})
+                elif isinstance(msg, AIMessage):
+                    # Extract text from AIMessage content, tool calling steps have none
+                    content = self.extract_text_from_content(msg.content)
+                    if content:
+                        filtered_conversation.append({"model": content})
+            if not filtered_conversation:
+                continue
+
+            logging.info("[Client] [ai_memory] Updating user memory from %d new messages", len(filtered_conversation))
+
+            # Load update memory system prompt
+            system_prompt_path = self.root_dir / "prompts/system_memory_update.txt"
+            template = system_prompt_path.read_text()
+            # The existing facts the new messages could update, not the whole memory
+            existing_ai_memory = self.memory_store.search(" ".join(text for m in filtered_conversation for text in m.values()), limit=MEMORY_UPDATE_TOP_K)
+            update_memory_system_prompt = template.format(
+                confidence_threshold=self.confidence_threshold,
+                existing_ai_memory=existing_ai_memory,
+                filtered_conversation=filtered_conversation
+            )
+
+            # Fact extraction does not need the main model, the router model is used when it is configured
+            llm = self.llm_factory.get_router_llm() or self.llm_factory.get_llm()
+            if not llm:
+                logging.error("[Client] [ai_memory] LLM not initialized")
+                return
 
-        # Load update memory system prompt
-        system_prompt_path = self.root_dir / "prompts/system_memory_update.txt"
-        template = system_prompt_path.read_text()
-        update_memory_system_prompt = template.format(
-            confidence_threshold=self.confidence_threshold,
-            existing_ai_memory=self.existing_ai_memory,
-            filtered_conversation=filtered_conversation
-        )
+            try:
+                with self.tracer.span("memory.update", messages=len(filtered_conversation)) as span:
+                    response = await llm.ainvoke([HumanMessage(content=update_memory_system_prompt)])
+                    diff = parse_memory_diff(self.extract_text_from_content(response.content))
+                    changes = await asyncio.to_thread(self.memory_store.apply_diff, diff, self.confidence_threshold)
+                    span.set(upserts=len(diff["upsert"]), deletes=len(diff["delete"]), changes=changes)
+                logging.info("[Client] [ai_memory] Memory diff applied, %d facts changed: %s", changes, log_payload(diff))
+            except Exception as e:
+                logging.error(f"[Client] [ai_memory] Error updating memory: {e}")
 
-        llm = self.llm_factory.get_llm()
-        if not llm:
-             logging.error("[Client] [ai_memory] LLM not initialized")
-             return
 
+    async def finish_memory_update(self):
+        """On exit, give an update still running MEMORY_EXIT_GRACE_SECS to finish, then drop it."""
+        if self.memory_task is None or self.memory_task.done():
+            return
         try:
-            logging.info("[Client] [ai_memory] Sending update request to LLM.")
-            response = await llm.ainvoke([HumanMessage(content=update_memory_system_prompt)])
-            
-            # Extract text from response content
-            new_ai_memory_text = self.extract_text_from_content(response.content)
-            
-            new_ai_memory = json.loads(re.sub(r'```json|```', '', new_ai_memory_text).strip())
-            logging.info("[Client] [ai_memory] Received updated memory from LLM")
-            
-            
-            with open(self.memory_json_path, "w") as file:
-                json.dump(new_ai_memory, file, indent=4)
-            
-            logging.info(f"[Client] [ai_memory] New memory updated : \n {new_ai_memory}")
-            
+            await asyncio.wait_for(self.memory_task, self.MEMORY_EXIT_GRACE_SECS)
+        except asyncio.TimeoutError:
+            logging.warning("[Client] [ai_memory] Memory update still running at exit, dropped")
         except Exception as e:
             logging.error(f"[Client] [ai_memory] Error updating memory: {e}")
 
 
 
+    def get_session_store(self):
+        """Sessions of the current user, in ~/.trisul_ai_cli/sessions.sqlite unless TRISUL_SESSION_DB is set."""
+        if self.session_store is None:
+            db_path = self.llm_factory.config.get("TRISUL_SESSION_DB")
+            if not db_path:
+                session_dir = Path.home() / ".trisul_ai_cli"
+                session_dir.mkdir(parents=True, exist_ok=True)
+                db_path = session_dir / "sessions.sqlite"
+            self.session_store = SessionStore(db_path)
+        return self.session_store
+
+
+    async def save_session_turn(self):
+        """Save the messages of the last turn and the results behind the handles its tool calls returned."""
+        messages = self.conversation_history[self.session_saved_until:]
+        if not messages:
+            return
+        self.session_saved_until = len(self.conversation_history)
+        try:
+            store = self.get_session_store()
+            if self.session_id is None:
+                self.session_id = await asyncio.to_thread(store.create, messages[0].additional_kwargs.get("query", messages[0].content))
+                logging.info(f"[Client] [session] Started session {self.session_id}")
+
+            handles = sorted({h for m in messages if isinstance(m, ToolMessage) for h in handles_in(m.content)})
+            results = []
+            if handles:
+                result = await self.session.call_tool("export_results", {"handles": handles})
+                results = json.loads(result.content[0].text).get("results", []) if result.content else []
+            turn = await asyncio.to_thread(store.add_turn, self.session_id, messages, results)
+            logging.info(f"[Client] [session] Saved turn {turn} of session {self.session_id}: {len(messages)} messages, {len(results)} results")
+        except Exception as e:
+            logging.error(f"[Client] [session] Unable to save the turn: {e}")
+
+
+    def resume_session(self, session_id: str = None) -> bool:
+        """Continue a saved session (the most recent one when session_id is None) with its last
+        SESSION_RESUME_TURNS turns in the conversation. Older turns are paged in with /history."""
+        store = self.get_session_store()
+        saved = store.get(session_id)
+        if saved is None:
+            print(f"\n🤖 (Bot) : No saved session {'named ' + repr(session_id) if session_id else 'to resume'}, starting a new one.\n")
+            return False
+
+        self.session_first_turn = max(1, saved["turns"] - SESSION_RESUME_TURNS + 1)
+        messages = store.load_turns(saved["session_id"], saved["turns"] + 1)
+        self.conversation_history = self.new_conversation_history() + messages
+        self.session_id = saved["session_id"]
+        self.session_saved_until = len(self.conversation_history)
+        # The resumed turns were already used for the memory
+        self.memory_cursor = self.memory_pending_until = len(self.conversation_history)
+        self.session_max_handle = saved["max_handle"]
+        self.session_result_handles = store.result_handles(self.session_id)
+        self.session_restored_handles = set()
+        self.session_counter_restored = False
+        logging.info(f"[Client] [session] Resumed session {self.session_id} at turn {saved['turns']}, {len(messages)} messages loaded")
+
+        print(f"\n🤖 (Bot) : Resuming session {self.session_id} \"{saved['title']}\" ({saved['turns']} turns)")
+        self.print_turns(messages)
+        if self.session_first_turn > 1:
+            print(f"🤖 (Bot) : {self.session_first_turn - 1} older turns not loaded, type /history to page them in.\n")
+        return True
+
+
+    async def page_in_history(self):
+        """Load the SESSION_RESUME_TURNS saved turns before the oldest one in the conversation."""
+        if self.session_id is None or self.session_first_turn <= 1:
+            print("\n🤖 (Bot) : No older turns in this session.\n")
+            return
+
+        messages = await asyncio.to_thread(self.get_session_store().load_turns, self.session_id, self.session_first_turn)
+        self.session_first_turn = max(1, self.session_first_turn - SESSION_RESUME_TURNS)
+        self.conversation_history[1:1] = messages
+        self.session_saved_until += len(messages)
+        self.memory_cursor += len(messages)
+        self.memory_pending_until += len(messages)
+        logging.info(f"[Client] [session] Paged in {len(messages)} messages of session {self.session_id}, from turn {self.session_first_turn}")
+        self.print_turns(messages)
+        if self.session_first_turn > 1:
+            print(f"🤖 (Bot) : {self.session_first_turn - 1} older turns left.\n")
+
+
+    def print_turns(self, messages):
+        for msg in messages:
+            if isinstance(msg, HumanMessage):
+                print(f"\n👤 (You) : {msg.additional_kwargs.get('query', msg.content)}")
+            elif isinstance(msg, AIMessage) and not msg.tool_calls:
+                print(f"\n🤖 (Bot) : {self.extract_text_from_content(msg.content).strip()}\n")
+
+
+    async def restore_session_results(self, function_args):
+        """Before a tool call of a resumed session: put the stored results of the session handles the call
+        refers to back on the server, and on the first call move the server's handles past the session's ones."""
+        wanted = [h for h in handles_in(function_args) if h in self.session_result_handles and h not in self.session_restored_handles]
+        if self.session_counter_restored and not wanted:
+            return
+        try:
+            results = await asyncio.to_thread(self.get_session_store().load_results, self.session_id, wanted)
+            await self.session.call_tool("restore_results", {"results": results, "min_counter": self.session_max_handle})
+            self.session_restored_handles.update(wanted)
+            self.session_counter_restored = True
+            logging.info(f"[Client] [session] Restored results {wanted} of session {self.session_id}")
+        except Exception as e:
+            logging.error(f"[Client] [session] Unable to restore the session results: {e}")
+
+
     async def loading_animation(self, task, message):
         spinner = ["⢄", "⢂", "⢁", "⡁", "⡈", "⡐", "⡠"]
         i = 0
@@ -506,9 +967,314 @@ class TrisulAIClient:
         
 
 
+    async def run_batch(self, queries: List[str], output=None, concurrency: int = 4) -> dict:
+        """Answer queries without a terminal, each in its own conversation history, at most `concurrency` at a time.
+
+        One JSON line per query is written to `output` as the answers come in. Returns a summary of the run.
+        """
+        self.interactive = False
+        output = output or sys.stdout
+        semaphore = asyncio.Semaphore(max(1, int(concurrency)))
+        write_lock = asyncio.Lock()
+        records = []
+
+        if not self.llm_factory.get_current_api_key():
+            raise RuntimeError("LLM API key is not set, run trisul_ai_cli once interactively to configure it")
+
+        self.start_server("trisul_ai_cli.server")
+        await self.wait_for_server()
+
+        async def run_one(index, query):
+            async with semaphore:
+                stats = {}
+                started = time.perf_counter()
+                try:
+                    answer = await self.process_query(query, history=self.new_conversation_history(), stats=stats)
+                except Exception as e:
+                    logging.error(f"[Client] [batch] Query {index} failed: {e}")
+                    answer = None
+                    stats["error"] = self.extract_message(str(e))
+
+                record = {
+                    "index": index,
+                    "query": query,
+                    "answer": answer,
+                    "status": "error" if stats.get("error") else "success",
+                    "error": stats.get("error"),
+                    "latency_secs": round(time.perf_counter() - started, 3),
+                    "llm_calls": stats.get("llm_calls", 0),
+                    "input_tokens": stats.get("input_tokens", 0),
+                    "output_tokens": stats.get("output_tokens", 0),
+                    "cache_read_tokens": stats.get("cache_read_tokens", 0),
+                    "cost_usd": round(stats.get("cost_usd", 0), 6),
+                    "models": stats.get("models", {}),
+                    "tool_calls": stats.get("tool_calls", []),
+                }
+                logging.info(f"[Client] [batch] Query {index} done in {record['latency_secs']}s, status={record['status']}")
+
+                async with write_lock:
+                    output.write(json.dumps(record) + "\n")
+                    output.flush()
+                    records.append(record)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(run_one(i, q) for i, q in enumerate(queries)))
+
+        latencies = sorted(r["latency_secs"] for r in records)
+        tool_counts = {}
+        for r in records:
+            for name in r["tool_calls"]:
+                tool_counts[name] = tool_counts.get(name, 0) + 1
+
+        return {
+            "queries": len(records),
+            "errors": sum(1 for r in records if r["status"] == "error"),
+            "wall_secs": round(time.perf_counter() - started, 3),
+            "latency_p50_secs": latencies[len(latencies) // 2] if latencies else None,
+            "latency_p95_secs": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else None,
+            "input_tokens": sum(r["input_tokens"] for r in records),
+            "output_tokens": sum(r["output_tokens"] for r in records),
+            "prompt_cache_hit_rate": round(sum(r["cache_read_tokens"] for r in records) / max(1, sum(r["input_tokens"] for r in records)), 3),
+            "cost_usd": round(sum(r["cost_usd"] for r in records), 6),
+            "tool_calls": tool_counts,
+        }
+
+
+
+    def get_job_store(self):
+        """Scheduled report jobs, in TRISUL_SCHEDULE_DB (default report_schedule.sqlite next to the package .env)."""
+        return ScheduledJobStore(self.llm_factory.config.get("TRISUL_SCHEDULE_DB") or self.root_dir / "report_schedule.sqlite")
+
+
+    async def record_scheduled_job(self, name: str, cron: str, query: str, output_dir: str = None) -> dict:
+        """Answer query once with the LLM and save the tool calls behind the answer as a scheduled job."""
+        self.interactive = False
+        if not self.llm_factory.get_current_api_key():
+            raise RuntimeError("LLM API key is not set, run trisul_ai_cli once interactively to configure it")
+
+        stats = {}
+        recorded_at = time.time()
+        answer = await self.process_query(query, history=self.new_conversation_history(), stats=stats)
+        if stats.get("error"):
+            raise RuntimeError(f"Recording failed: {stats['error']}")
+        if not any(step["tool"] in self.REPORT_TOOLS for step in stats["tool_plan"]):
+            raise RuntimeError(f"The query did not generate a report, nothing to schedule. Answer: {answer}")
+        inline = inline_data_steps(stats["tool_plan"])
+        if inline:
+            raise RuntimeError(
+                f"The report copies its numbers into the tool calls ({'; '.join(inline)}), every scheduled run would show "
+                "the numbers recorded today under the new dates. Ask for a report whose tables and charts are built from result "
+                "handles, or one that fits a report template (e.g. \"report of the top 10 hosts with their trends\"), and record it again."
+            )
+
+        next_run = self.get_job_store().add(name, cron, query, stats["tool_plan"], recorded_at, output_dir)
+        logging.info(f"[Client] [schedule] Recorded job {name} with {len(stats['tool_plan'])} tool calls, next run at {next_run}")
+        return {"name": name, "cron": cron, "tool_calls": [step["tool"] for step in stats["tool_plan"]], "next_run": next_run, "answer": answer}
+
+
+    async def run_tool_plan(self, plan: list, recorded_at: float, output_dir: str = None, cron: str = None, run_at: float = None) -> dict:
+        """Replay a recorded tool plan without the LLM.
+
+        Calls that do not use each other's result handles or files run concurrently. Absolute time arguments move
+        forward by the whole periods of the cron schedule between the recording and run_at (the run's slot, default
+        now), or by the time since recording without a schedule. Report file names get the run time and the reports
+        are moved to output_dir (default: where the server wrote them, /tmp). Returns the report paths and the errors.
+        """
+        self.interactive = False
+        await self.wait_for_server()
+
+        dependencies = plan_dependencies(plan)
+        run_at = run_at or time.time()
+        if cron:
+            time_shift = CronSchedule(cron).time_shift(recorded_at, run_at)
+        else:
+            time_shift = lambda ts: ts + int(run_at - recorded_at)
+        run_stamp = time.strftime("%Y%m%d_%H%M")
+        substitutions = {}
+        reports, errors = [], []
+
+        async def run_step(index):
+            step = plan[index]
+            function_name = step["tool"]
+            args = replay_args(step["args"], substitutions, time_shift, run_stamp if function_name in self.REPORT_TOOLS else None)
+            if function_name in self.REPORT_TOOLS:
+                await self.wait_for_renders()
+
+            with self.tracer.span("mcp.call_tool", tool=function_name, transport=self.transport, replay=True) as tool_span:
+                result = await self.session.call_tool(function_name, args, meta=current_trace_meta())
+                tool_result = result.content[0].text if result.content else ""
+                tool_span.set(result_bytes=len(tool_result), is_error=bool(result.isError))
+            json_result = None
+            try:
+                json_result = json.loads(tool_result)
+            except Exception:
+                pass
+            # Tools answer with a JSON status or, for the TRP tools, TOON that starts with the error
+            if result.isError or tool_result.startswith("error:"):
+                raise RuntimeError(f"{function_name}: {tool_result}")
+            if isinstance(json_result, dict) and json_result.get("status") == "error":
+                raise RuntimeError(f"{function_name}: {json_result.get('message')}")
+            json_result = json_result if isinstance(json_result, dict) else {}
+
+            substitutions.update(map_outputs(step.get("outputs"), step_outputs(tool_result)))
+            if function_name in ("show_line_chart", "show_pie_chart") and json_result.get("file_path"):
+                self.schedule_chart_render("line" if function_name == "show_line_chart" else "pie", json_result.get("chart_data") or args.get("data"), json_result["file_path"])
+            if function_name in self.REPORT_TOOLS and json_result.get("file_path"):
+                path = json_result["file_path"]
+                if output_dir and os.path.dirname(os.path.abspath(path)) != os.path.abspath(output_dir):
+                    os.makedirs(output_dir, exist_ok=True)
+                    path = shutil.move(path, os.path.join(output_dir, os.path.basename(path)))
+                reports.append(path)
+
+        with self.tracer.span("schedule.replay", steps=len(plan)) as replay_span:
+            # Chart windows are of no use to a scheduled run, only saved charts are replayed
+            remaining = [i for i, step in enumerate(plan) if not (step["tool"] in ("show_line_chart", "show_pie_chart") and not step["args"].get("save_image"))]
+            done, failed = set(i for i in range(len(plan)) if i not in remaining), set()
+            while remaining:
+                ready = [i for i in remaining if dependencies[i] <= done]
+                remaining = [i for i in remaining if i not in ready]
+                runnable = []
+                for i in ready:
+                    if dependencies[i] & failed:
+                        errors.append(f"{plan[i]['tool']}: skipped, an earlier call it depends on failed")
+                        failed.add(i)
+                    else:
+                        runnable.append(i)
+                for i, outcome in zip(runnable, await asyncio.gather(*(run_step(i) for i in runnable), return_exceptions=True)):
+                    if isinstance(outcome, Exception):
+                        logging.error(f"[Client] [schedule] Replaying {plan[i]['tool']} failed: {outcome}")
+                        errors.append(str(outcome))
+                        failed.add(i)
+                done.update(ready)
+            await self.wait_for_renders()
+            replay_span.set(reports=len(reports), errors=len(errors))
+
+        return {"reports": reports, "errors": errors}
+
+
+    async def run_scheduled_job(self, job: dict, store=None) -> dict:
+        """Run one scheduled job now and record the outcome."""
+        store = store or self.get_job_store()
+        started_at = time.time()
+        output_dir = job.get("output_dir") or self.llm_factory.config.get("TRISUL_REPORT_DIR")
+        try:
+            # A due run covers its slot even when it starts late, a run by hand covers the time it starts
+            run_at = job["next_run"] if job["next_run"] <= started_at else started_at
+            outcome = await self.run_tool_plan(job["plan"], job["recorded_at"], output_dir, cron=job["cron"], run_at=run_at)
+            status = "error" if outcome["errors"] or not outcome["reports"] else "success"
+        except Exception as e:
+            logging.error(f"[Client] [schedule] Job {job['name']} failed: {e}")
+            outcome, status = {"reports": [], "errors": [str(e)]}, "error"
+        outcome.update({"name": job["name"], "status": status, "duration_secs": round(time.time() - started_at, 3)})
+        outcome["next_run"] = store.record_run(job["name"], status, outcome, started_at)
+        logging.info(f"[Client] [schedule] Job {job['name']} {status} in {outcome['duration_secs']}s: {outcome['reports']}")
+        return outcome
+
+
+    async def run_scheduler(self, output=None):
+        """Run the due jobs every SCHEDULE_POLL_SECS until interrupted, jobs due at the same time run concurrently.
+        One JSON line per run is written to output."""
+        output = output or sys.stdout
+        store = self.get_job_store()
+        self.start_server("trisul_ai_cli.server")
+        await self.wait_for_server()
+        logging.info(f"[Client] [schedule] Scheduler started with {len(store.list())} jobs")
+
+        while True:
+            due = store.due()
+            if due:
+                for outcome in await asyncio.gather(*(self.run_scheduled_job(job, store) for job in due)):
+                    output.write(json.dumps(outcome) + "\n")
+                    output.flush()
+            await asyncio.sleep(self.SCHEDULE_POLL_SECS)
+
+
+
+    async def print_turn_stats(self):
+        """Print where the time of the last turn went, from the client spans and the server spans of the same trace."""
+        if not self.last_trace_id:
+            print("\n🤖 (Bot) : No query has been run yet.\n")
+            return
+
+        spans = self.tracer.spans(self.last_trace_id)
+        try:
+            result = await self.session.call_tool("get_trace_spans", {"trace_id": self.last_trace_id})
+            spans += json.loads(result.content[0].text).get("spans", []) if result.content else []
+        except Exception as e:
+            logging.warning(f"[Client] Unable to fetch server spans: {e}")
+
+        summary = summarize_turn(spans)
+
+        def row(label, ms, extra=""):
+            duration = f"{ms / 1000:8.2f} s" if ms is not None else " " * 10
+            return f"{label:<42}{duration}   {extra}".rstrip()
+
+        lines = [
+            row("Last turn", summary["turn_ms"]),
+            row(f"  LLM calls ({summary['llm_calls']})", summary["llm_ms"], f"tokens in {summary['input_tokens']} / out {summary['output_tokens']}, ${summary['cost_usd']:.4f}"),
+            *[row(f"    {model} ({m['role']}, {m['calls']})", m["ms"], f"tokens in {m['input_tokens']} / out {m['output_tokens']}") for model, m in summary["models"].items()],
+            row("    prompt cache", None, f"{summary['cache_read_tokens']} input tokens read from cache ({summary['cache_hit_rate']:.0%})"),
+            row(f"  MCP tool calls ({summary['tool_calls']})", summary["tool_ms"]),
+            row("    server tools", summary["server_tool_ms"]),
+            row(f"      TRP round trips ({summary['trp_requests']})", summary["trp_ms"], self.utils.bytes_to_human(summary["trp_bytes"])),
+            row("      MessageToDict", summary["message_to_dict_ms"]),
+            row("      TOON encoding", summary["toon_ms"]),
+        ]
+        if summary["transport_ms"] is not None:
+            lines.append(row("    MCP transport", summary["transport_ms"]))
+        lines.append(row("  chart rendering", summary["chart_ms"]))
+        lines.append(row("  other client work", summary["other_ms"]))
+        for name, tool in sorted(summary["tools"].items(), key=lambda kv: kv[1]["ms"], reverse=True):
+            lines.append(row(f"  - {name} x{tool['calls']}", tool["ms"], f"{self.utils.bytes_to_human(tool['result_bytes'])} result"))
+
+        print("\n🤖 (Bot) : Latency breakdown of the last turn\n" + "\n".join(lines) + "\n")
+
+
+
+    async def read_input(self, prompt: str) -> str:
+        """input() on a daemon thread, so the event loop keeps running background tasks while the user types.
+        A daemon thread does not hold up the interpreter exit if the CLI is closed at the prompt."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def _set_result(setter, value):
+            if not future.done():
+                setter(value)
+
+        def _read():
+            try:
+                line = input(prompt)
+            except BaseException as e:
+                loop.call_soon_threadsafe(_set_result, future.set_exception, e)
+            else:
+                loop.call_soon_threadsafe(_set_result, future.set_result, line)
+
+        # Ctrl-C goes to the main thread, which is in the event loop and not in input(). Raise it from this await,
+        # so the caller's handler and cleanup run (before Python 3.11 it would escape from asyncio.run instead).
+        try:
+            loop.add_signal_handler(signal.SIGINT, _set_result, future.set_exception, KeyboardInterrupt())
+            sigint_handled = True
+        except (NotImplementedError, RuntimeError, ValueError):
+            sigint_handled = False
+
+        threading.Thread(target=_read, name="trisul-input", daemon=True).start()
+        try:
+            return await future
+        finally:
+            if sigint_handled:
+                loop.remove_signal_handler(signal.SIGINT)
+
+
+
     async def cleanup(self):
+        self.utils.shutdown_renderer()
         try:
-            if self.exit_stack:
+            if self.server_task:
+                self.server_shutdown.set()
+                if not self.server_ready.done():
+                    self.server_task.cancel()
+                await asyncio.gather(self.server_task, return_exceptions=True)
+            elif self.exit_stack:
                 await self.exit_stack.aclose()
         except Exception as e:
             logging.error(f"[Client] Error during cleanup: {e}")
@@ -516,9 +1282,10 @@ class TrisulAIClient:
 
 
 
-    async def main(self):
-        # Connect to server
-        await self.connect_to_server("trisul_ai_cli.server")
+    async def main(self, resume: str = None):
+        """Interactive chat. resume: a session id to continue, or "last" for the most recent session."""
+        # Start the server in the background, the first query waits for it only if it is still starting
+        self.start_server("trisul_ai_cli.server")
 
         print("\033[1;36m" + "╔══════════════════════════════════════════════════════════════╗")
         print("║  🚀  Trisul AI CLI - Because your network should talk back.  ║")
@@ -530,10 +1297,13 @@ class TrisulAIClient:
         
         # verify model and api key
         self.get_api_key()
+
+        if resume:
+            self.resume_session(None if resume == "last" else resume)
         
         try:
             while True:
-                query = input("👤 (You) : ").strip()
+                query = (await self.read_input("👤 (You) : ")).strip()
                 
                 # skip empty inputs
                 if not query:
@@ -543,16 +1313,22 @@ class TrisulAIClient:
                 
                 # Exit
                 if query.lower() in ["exit", "quit"]:
-                    task = asyncio.create_task(self.update_user_memory())
-                    spinner = asyncio.create_task(self.loading_animation(task,"Adapting to your world"))
-                    await task
-                    await spinner
-                    
                     logging.info("[Client] Bye!")
                     print("\n🤖 (Bot) : 👋 Bye!")
                     break
 
                 
+                # older turns of a resumed session
+                if query.lower() == "/history":
+                    await self.page_in_history()
+                    continue
+
+                # latency breakdown of the last turn
+                if query.lower() == "/stats":
+                    await self.wait_for_server()
+                    await self.print_turn_stats()
+                    continue
+
                 # change the llm api key
                 if query.lower() == "change_llm_api_key":
                     self.set_api_key(provider_type="llm")
@@ -580,9 +1356,10 @@ class TrisulAIClient:
                     response = await task
                     await spinner
                     
-                    logging.info(f"[Client] Full Conversation History: \n{self.conversation_history[1:]}")
-                    logging.info(f"[Client] Response: \n{response}")
+                    logging.info("[Client] Response: %s", log_payload(response))
                     print(f"\n🤖 (Bot) : {response.strip()}\n")
+                    self.schedule_memory_update()
+                    await self.save_session_turn()
                     
                     # If a chart data was prepared, display it and reset the chart data
                     if(self.line_chart_data):
@@ -611,12 +1388,14 @@ class TrisulAIClient:
                     print("\n👋 Exiting gracefully...")
                     return
 
-        except KeyboardInterrupt:
+        except (KeyboardInterrupt, EOFError, asyncio.CancelledError):
             logging.info("[Client] Exiting gracefully...")
             print("\n👋 Exiting gracefully...")
             return
 
         finally:
+            # The memory update of the last answer also finishes on Ctrl-C and Ctrl-D
+            await self.finish_memory_update()
             # Always clean up async resources
             await self.cleanup()
             # Give ZeroMQ sockets time to close cleanly
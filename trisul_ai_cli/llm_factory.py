@@ -1,8 +1,6 @@
 from dotenv import dotenv_values, set_key
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain_anthropic import ChatAnthropic
-from langchain_community.embeddings import VoyageEmbeddings
+
+# The LangChain provider packages are slow to import, each one is imported only when its provider is used
 
 
 
@@ -24,6 +22,41 @@ class LLMFactory:
                     }
     }
 
+    # Fast model per provider for the tool selection steps when routing is on (TRISUL_AI_ROUTING=on),
+    # overridden with TRISUL_{PROVIDER}_ROUTER_MODEL
+    ROUTER_MODELS = {
+        "gemini": "gemini-2.5-flash-lite",
+        "openai": "gpt-4.1-mini",
+        "anthropic": "claude-3-haiku-20240307",
+    }
+
+    # List price in USD per million (input, output) tokens, used for the cost estimates
+    MODEL_PRICING = {
+        "gemini-2.5-pro": (1.25, 10.00),
+        "gemini-2.5-flash": (0.30, 2.50),
+        "gemini-2.5-flash-lite": (0.10, 0.40),
+        "gemini-2.0-flash": (0.10, 0.40),
+        "gemini-2.0-flash-lite": (0.075, 0.30),
+        "gpt-5.1": (1.25, 10.00),
+        "gpt-5.1-mini": (0.25, 2.00),
+        "gpt-5.1-nano": (0.05, 0.40),
+        "gpt-4.1": (2.00, 8.00),
+        "gpt-4.1-mini": (0.40, 1.60),
+        "gpt-4.1-nano": (0.10, 0.40),
+        "gpt-4o": (2.50, 10.00),
+        "gpt-4o-mini": (0.15, 0.60),
+        "gpt-4-turbo": (10.00, 30.00),
+        "gpt-3.5-turbo": (0.50, 1.50),
+        "claude-3-5-sonnet-20240620": (3.00, 15.00),
+        "claude-3-opus-20240229": (15.00, 75.00),
+        "claude-3-sonnet-20240229": (3.00, 15.00),
+        "claude-3-haiku-20240307": (0.25, 1.25),
+    }
+
+    # Approximate price of prompt cache reads (and Anthropic cache writes) relative to the input price
+    CACHE_READ_PRICE_FACTOR = {"gemini": 0.25, "openai": 0.25, "anthropic": 0.10}
+    CACHE_WRITE_PRICE_FACTOR = {"anthropic": 1.25}
+
     def __init__(self, env_path = None, logging = None):
         self.env_path = env_path
         self.logging = logging
@@ -35,6 +68,10 @@ class LLMFactory:
         self.model_name = self.config.get("TRISUL_AI_MODEL")
         self.api_key = self.config.get(f"TRISUL_{self.provider.upper()}_API_KEY")
 
+        # Model routing: the router model picks the tools, the configured model writes the final answer
+        self.routing_enabled = str(self.config.get("TRISUL_AI_ROUTING", "off")).lower() in ("on", "true", "1")
+        self.router_model_name = self.config.get(f"TRISUL_{self.provider.upper()}_ROUTER_MODEL") or self.ROUTER_MODELS.get(self.provider)
+
         # Embedding config
         self.embedding_model = self.config.get("TRISUL_EMBEDDING_MODEL")
         self.embedding_provider = self.config.get("TRISUL_EMBEDDING_PROVIDER")
@@ -48,7 +85,7 @@ class LLMFactory:
         
         self.embedding_api_key = self.config.get(f"TRISUL_{str(self.embedding_provider).upper()}_API_KEY") if self.embedding_provider else None
 
-        self.logging.info(f"[LLMFactory] Loaded config: provider={self.provider}, model={self.model_name}, embedding_model={self.embedding_model}, embedding_provider={self.embedding_provider}")
+        self.logging.info(f"[LLMFactory] Loaded config: provider={self.provider}, model={self.model_name}, routing={self.routing_enabled}, router_model={self.router_model_name}, embedding_model={self.embedding_model}, embedding_provider={self.embedding_provider}")
 
 
 
@@ -61,15 +98,68 @@ class LLMFactory:
             self.logging.warning("[LLMFactory] API key not found. Please set it using the 'set_api_key' method.")
             return None
 
+        return self._build_llm(self.model_name)
+
+    def get_router_llm(self):
+        """Fast model for the intermediate tool calling steps, None when routing is off or would use the configured model anyway."""
+        self._load_config()
+        if not self.routing_enabled or not self.api_key or not self.router_model_name or self.router_model_name == self.model_name:
+            return None
+
+        self.logging.info(f"[LLMFactory] Getting router LLM for provider {self.provider} with model {self.router_model_name}")
+        return self._build_llm(self.router_model_name)
+
+    def _build_llm(self, model_name):
         if self.provider == "gemini":
-            return ChatGoogleGenerativeAI(model=self.model_name, google_api_key=self.api_key)
+            from langchain_google_genai import ChatGoogleGenerativeAI
+            return ChatGoogleGenerativeAI(model=model_name, google_api_key=self.api_key)
         elif self.provider == "openai":
-            return ChatOpenAI(model=self.model_name, api_key=self.api_key)
+            from langchain_openai import ChatOpenAI
+            return ChatOpenAI(model=model_name, api_key=self.api_key)
         elif self.provider == "anthropic":
-            return ChatAnthropic(model=self.model_name, api_key=self.api_key)
+            from langchain_anthropic import ChatAnthropic
+            return ChatAnthropic(model=model_name, api_key=self.api_key)
         else:
             raise ValueError(f"Unsupported provider: {self.provider}")
 
+    def estimate_cost(self, model_name, input_tokens, output_tokens, cache_read_tokens=0, cache_write_tokens=0):
+        """Cost in USD from MODEL_PRICING, None for models without a known price.
+        input_tokens includes the tokens read from or written to the prompt cache."""
+        pricing = self.MODEL_PRICING.get(model_name)
+        if not pricing:
+            return None
+        uncached = max(0, input_tokens - cache_read_tokens - cache_write_tokens)
+        input_cost = pricing[0] * (
+            uncached
+            + cache_read_tokens * self.CACHE_READ_PRICE_FACTOR.get(self.provider, 1)
+            + cache_write_tokens * self.CACHE_WRITE_PRICE_FACTOR.get(self.provider, 1)
+        )
+        return (input_cost + output_tokens * pricing[1]) / 1_000_000
+
+    # Prompt caching: the system prompt and the tool schemas are the same on every call of a session.
+    # OpenAI and Gemini cache a repeated prompt prefix on their own as long as it stays byte identical,
+    # Anthropic caches only up to an explicit cache_control breakpoint.
+
+    def cacheable_tools(self, tools):
+        """Tool list (OpenAI function format) for bind_tools, with a cache breakpoint after the last tool for Anthropic."""
+        if self.provider != "anthropic" or not tools:
+            return tools
+        anthropic_tools = [
+            {"name": t["function"]["name"], "description": t["function"].get("description") or "", "input_schema": t["function"]["parameters"]}
+            for t in tools
+        ]
+        anthropic_tools[-1]["cache_control"] = {"type": "ephemeral"}
+        return anthropic_tools
+
+    def cacheable_messages(self, messages):
+        """Messages for the LLM call, with a cache breakpoint after the system prompt for Anthropic."""
+        from langchain_core.messages import SystemMessage
+
+        if self.provider != "anthropic" or not messages or not isinstance(messages[0], SystemMessage) or not isinstance(messages[0].content, str):
+            return messages
+        system = SystemMessage(content=[{"type": "text", "text": messages[0].content, "cache_control": {"type": "ephemeral"}}])
+        return [system, *messages[1:]]
+
     def get_embedding_llm(self):
         self._load_config()
         if not self.embedding_model or not self.embedding_provider:
@@ -80,10 +170,13 @@ class LLMFactory:
              return None
 
         if self.embedding_provider == "gemini":
+            from langchain_google_genai import GoogleGenerativeAIEmbeddings
             return GoogleGenerativeAIEmbeddings(model=self.embedding_model, google_api_key=self.embedding_api_key)
         elif self.embedding_provider == "openai":
+            from langchain_openai import OpenAIEmbeddings
             return OpenAIEmbeddings(model=self.embedding_model, api_key=self.embedding_api_key)
         elif self.embedding_provider == "voyageai":
+            from langchain_community.embeddings import VoyageEmbeddings
             return VoyageEmbeddings(model=self.embedding_model, voyage_api_key=self.embedding_api_key)
         else:
             return None
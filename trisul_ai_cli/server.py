@@ -1,39 +1,45 @@
 import warnings
 warnings.filterwarnings("ignore", category=FutureWarning, module="google")
 
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import FastMCP, Context
 from trisul_ai_cli import trp_pb2
 import zmq
 import datetime
+import asyncio
+import time
 import sqlite3
 import uuid
-import chromadb
 from google.protobuf.json_format import MessageToDict
 import logging
 from pathlib import Path
 from datetime import datetime, timedelta, timezone
 import random
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.units import inch
-from reportlab.lib.utils import ImageReader
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak, Image
-from reportlab.lib.styles import getSampleStyleSheet
 import os
 import ast
 from trisul_ai_cli.tools.json_to_toon_converter import json_to_toon
+from trisul_ai_cli.tools.session_export import SessionFileWriter, session_to_row
+from trisul_ai_cli.tools.result_store import ResultStore, analyze_rows, result_to_rows, rows_to_series, rows_to_table
+from trisul_ai_cli.tools.utils import TrisulAIUtils
+from trisul_ai_cli.tools.trp_cache import TRPResultCache, closed_segments, contiguous_runs
+from trisul_ai_cli.tools.prefetch import Prefetcher
+from trisul_ai_cli.tools.daemon_auth import DaemonAuthMiddleware, DAEMON_TOKEN_ENV
+from trisul_ai_cli.tools.tracing import Tracer, TRACE_META_KEY, remote_trace_context
+from trisul_ai_cli.tools.log_setup import setup_logging_from_env
+import contextvars
+import functools
+import threading
+import weakref
 import json
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 from dotenv import dotenv_values
 from pathlib import Path
 from trisul_ai_cli.llm_factory import LLMFactory
 
 
-logging.basicConfig(
-    filename= Path(os.getcwd()) / "trisul_ai_cli.log",
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s"
-)
+# The server has its own log file, a rotating log cannot be shared by two processes.
+# When the server runs in the CLI process this is a no-op and it logs to the CLI's log.
+setup_logging_from_env(Path(__file__).resolve().parent / ".env", Path(os.getcwd()) / "trisul_ai_cli_server.log")
 
 
 global _global_zmq_context
@@ -42,6 +48,49 @@ _global_zmq_context = zmq.Context()
 
 mcp = FastMCP(name="trisul-mcp-server")
 
+# Shared local daemon (streamable-http), see the __main__ block and TrisulAIClient
+DAEMON_DEFAULT_HOST = "127.0.0.1"
+DAEMON_DEFAULT_PORT = 8731
+
+# Disk cache of TRP results for closed time intervals, see get_trp_cache
+TRP_CACHE_PATH = Path(__file__).resolve().parent / "trp_cache.sqlite"
+TRP_CACHE_DEFAULT_MAX_MB = 256
+TRP_CACHE_SEGMENT_SECS = 3600
+TRP_CACHE_GRACE_SECS = 60
+COUNTER_GROUP_META_TTL_SECS = 600
+_trp_cache = None
+_counter_group_meta_cache = {}
+
+# Likely follow-up queries run in the background, see get_prefetcher
+PREFETCH_DEFAULT_TOP_K = 3
+PREFETCH_DEFAULT_BUDGET = 20
+PREFETCH_WORKERS = 2
+_prefetcher = None
+_prefetch_top_k = PREFETCH_DEFAULT_TOP_K
+
+# Knowledge base handles for rag_query, kept warm for the life of the server
+_rag_embedding = None
+_rag_collection = None
+
+# Spans of the tool calls, the client fetches them with get_trace_spans for its /stats breakdown
+tracer = Tracer("trisul-mcp-server", export_path=dotenv_values(Path(__file__).resolve().parent / ".env").get("TRISUL_TRACE_FILE"), logging=logging)
+
+# Last TRP tool results, for follow-up questions answered locally by analyze_cached_results.
+# Each MCP session has its own store (see get_result_store), calls without a session use _result_store.
+RESULT_STORE_MAX_ENTRIES = 20
+_result_store = ResultStore(max_entries=RESULT_STORE_MAX_ENTRIES)
+_session_result_stores = weakref.WeakKeyDictionary()
+_session_result_stores_lock = threading.Lock()
+
+# Report layouts the server fills from its own TRP queries, see generate_report_from_template
+REPORT_TEMPLATES = {
+    "top_keys": "Top keys table and their share as a pie chart",
+    "top_keys_with_trends": "Top keys table, their share as a pie chart and the traffic trend of each top key, one chart per page",
+}
+REPORT_TEMPLATE_QUERY_WORKERS = 8
+# Most top keys a template report covers, each key of top_keys_with_trends is one trend query and one page
+REPORT_TEMPLATE_MAX_KEYS = 20
+
 # Helper functions
 
 def normalize_context(ctx: str) -> str:
@@ -95,7 +144,7 @@ def countergroup_info(zmq_endpoint: str = None, context: str = "context0", get_m
         logging.info("[countergroup_info] Sending COUNTER_GROUP_INFO_REQUEST...")
         resp = get_response(zmq_endpoint, req)
         
-        result = MessageToDict(resp)
+        result = message_to_dict(resp)
         logging.info(f"[countergroup_info] Received response with {len(result.get('groupDetails', []))} groups")
         return result
         
@@ -158,34 +207,102 @@ _RESPONSE_FIELD_MAP = {
     'COUNTER_ITEM_RESPONSE': 'counter_item_response',
     'QUERY_ALERTS_RESPONSE': 'query_alerts_response',
     'QUERY_SESSIONS_RESPONSE': 'query_sessions_response',
+    'KEYSPACE_RESPONSE': 'key_space_response',
+    'ASYNC_RESPONSE': 'async_response',
 }
 
+# Chunking of export_flows_or_sessions_to_file
+SESSION_EXPORT_CHUNK_MAXITEMS = 10000
+SESSION_EXPORT_MIN_CHUNK_SECS = 10
+
+# Polling for queries submitted with run_async, see get_response_async
+ASYNC_POLL_INTERVAL_SECS = 1
+ASYNC_MAX_WAIT_SECS = 900
+
+def unwrap_message(resp):
+    """Return the typed response payload of a parsed TRP Message, or the Message itself if it has none."""
+    command_name = None
+    for x in resp.DESCRIPTOR.enum_types:
+        val = x.values_by_number.get(int(resp.trp_command))
+        if val:
+            command_name = val.name
+            break
+    
+    logging.info(f"[unwrap_response] Response command: {command_name}")
+    
+    field_name = _RESPONSE_FIELD_MAP.get(command_name)
+    if field_name and resp.HasField(field_name):
+        return getattr(resp, field_name)
+    
+    return resp
+
+
 def unwrap_response(data):
     try:
         logging.info("[unwrap_response] Unwrapping response")
         resp = trp_pb2.Message()
         resp.ParseFromString(data)
-        
-        command_name = None
-        for x in resp.DESCRIPTOR.enum_types:
-            val = x.values_by_number.get(int(resp.trp_command))
-            if val:
-                command_name = val.name
-                break
-        
-        logging.info(f"[unwrap_response] Response command: {command_name}")
-        
-        field_name = _RESPONSE_FIELD_MAP.get(command_name)
-        if field_name and resp.HasField(field_name):
-            return getattr(resp, field_name)
-        
-        return resp
+        return unwrap_message(resp)
     except Exception as e:
         logging.error(f"[unwrap_response] Error unwrapping response: {str(e)}")
         raise
 
 
-def get_response(zmq_endpoint, req, timeout_ms=10000):
+def incoming_trace_context():
+    """Trace context the client sent with the current tool call (request _meta, or set directly in-process)."""
+    try:
+        meta = mcp.get_context().request_context.meta
+        trace = getattr(meta, TRACE_META_KEY, None) or (meta.model_extra or {}).get(TRACE_META_KEY)
+        if trace:
+            return trace
+    except Exception:
+        pass
+    return remote_trace_context.get()
+
+
+def traced_tool():
+    """mcp.tool() with a server.tool span around every call, joined to the client's trace when one is sent."""
+    def decorator(fn):
+        def start_span():
+            trace = incoming_trace_context() or {}
+            return tracer.span("server.tool", trace_id=trace.get("traceId"), parent_id=trace.get("parentSpanId"), tool=fn.__name__)
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                with start_span():
+                    return await fn(*args, **kwargs)
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with start_span():
+                    return fn(*args, **kwargs)
+
+        return mcp.tool()(wrapper)
+    return decorator
+
+
+def message_to_dict(message, **kwargs):
+    with tracer.span("trp.message_to_dict", message_type=type(message).__name__):
+        return MessageToDict(message, **kwargs)
+
+
+def to_toon(data):
+    with tracer.span("toon.encode") as span:
+        result = json_to_toon(data)
+        span.set(output_chars=len(result) if isinstance(result, str) else None)
+        return result
+
+
+def request_message(zmq_endpoint, req, timeout_ms=10000):
+    """Send a TRP request and return the raw parsed TRP Message without unwrapping it."""
+    with tracer.span("trp.request", command=trp_pb2.Message.Command.Name(req.trp_command), request_bytes=req.ByteSize()) as span:
+        resp = _request_message(zmq_endpoint, req, timeout_ms)
+        span.set(response_bytes=resp.ByteSize())
+        return resp
+
+
+def _request_message(zmq_endpoint, req, timeout_ms):
     socket = None
     try:
         logging.info(f"[get_response] Connecting to {zmq_endpoint}")
@@ -200,7 +317,9 @@ def get_response(zmq_endpoint, req, timeout_ms=10000):
         
         data = socket.recv()
         logging.info(f"[get_response] Received {len(data)} bytes")
-        return unwrap_response(data)
+        resp = trp_pb2.Message()
+        resp.ParseFromString(data)
+        return resp
     except zmq.Again:
         error_msg = f"[get_response] ZMQ timeout after {timeout_ms}ms - no response from {zmq_endpoint}"
         logging.error(error_msg)
@@ -221,12 +340,384 @@ def get_response(zmq_endpoint, req, timeout_ms=10000):
                 logging.warning(f"Error closing socket: {str(e)}")
 
 
+def next_async_poll(resp):
+    """Check a response to a request sent with run_async.
+    Returns (final_message, None) once the hub has finished the job, or (None, poll_request) while it is still running.
+    The hub either answers the poll with the final response directly or wraps it in the AsyncResponse.
+    """
+    if resp.trp_command != resp.ASYNC_RESPONSE:
+        return resp, None
+
+    async_resp = resp.async_response
+    if async_resp.HasField("response"):
+        return async_resp.response, None
+
+    poll_req = trp_pb2.Message()
+    poll_req.trp_command = poll_req.ASYNC_REQUEST
+    poll_req.async_request.token = async_resp.token
+    if resp.destination_node:
+        poll_req.destination_node = resp.destination_node
+    if resp.probe_id:
+        poll_req.probe_id = resp.probe_id
+    return None, poll_req
+
+
+def get_response(zmq_endpoint, req, timeout_ms=10000):
+    """Send a TRP request and return the unwrapped response. Long running queries go through get_response_async."""
+    return unwrap_message(request_message(zmq_endpoint, req, timeout_ms))
+
+
+async def get_response_async(zmq_endpoint, req, timeout_ms=10000, run_async=False, poll_interval_secs=ASYNC_POLL_INTERVAL_SECS, max_wait_secs=ASYNC_MAX_WAIT_SECS, ctx: Context = None):
+    """Same as get_response but for async tools, the ZMQ round trips run in a worker thread.
+    With run_async the hub runs the query in the background and returns a token, which is polled with ASYNC_REQUEST
+    until the result is ready. Each poll is a short round trip, so long scans are only bounded by max_wait_secs
+    instead of the socket receive timeout. The polling waits on the event loop, so the MCP server keeps serving
+    other requests while a long query runs. Progress is reported to the client through the MCP context when it is available.
+    """
+    if not run_async:
+        return await asyncio.to_thread(get_response, zmq_endpoint, req, timeout_ms)
+
+    req.run_async = True
+    resp = await asyncio.to_thread(request_message, zmq_endpoint, req, timeout_ms)
+    started = time.monotonic()
+
+    while True:
+        final_resp, poll_req = next_async_poll(resp)
+        if final_resp is not None:
+            logging.info(f"[get_response_async] Async request completed in {time.monotonic() - started:.1f}s")
+            return unwrap_message(final_resp)
+
+        elapsed = time.monotonic() - started
+        if elapsed > max_wait_secs:
+            error_msg = f"[get_response_async] Async request token={poll_req.async_request.token} did not complete within {max_wait_secs}s"
+            logging.error(error_msg)
+            raise Exception(error_msg)
+
+        progress_message = resp.async_response.response_message or "Query running on the hub"
+        logging.info(f"[get_response_async] Async request token={poll_req.async_request.token} pending: {progress_message}")
+        if ctx:
+            try:
+                await ctx.report_progress(elapsed, max_wait_secs, progress_message)
+            except Exception as e:
+                logging.warning(f"[get_response_async] Unable to report progress: {str(e)}")
+
+        await asyncio.sleep(poll_interval_secs)
+        resp = await asyncio.to_thread(request_message, zmq_endpoint, poll_req, timeout_ms)
+
+
+
+
+
+def get_result_store():
+    """Result store of the MCP session of the current tool call, so the CLIs attached to the daemon do not see
+    or overwrite each other's handles. In-process calls have no MCP session and use the shared _result_store."""
+    try:
+        session = mcp.get_context().request_context.session
+    except Exception:
+        return _result_store
+    with _session_result_stores_lock:
+        store = _session_result_stores.get(session)
+        if store is None:
+            store = _session_result_stores[session] = ResultStore(max_entries=RESULT_STORE_MAX_ENTRIES)
+    return store
+
+
+def store_result(tool_name, query_args, result):
+    """Keep a TRP tool result in the local result store and return its handle for follow-up analysis."""
+    try:
+        handle = get_result_store().put(tool_name, query_args, result)
+        logging.info(f"[store_result] Stored {tool_name} result as {handle}")
+        return handle
+    except Exception as e:
+        logging.warning(f"[store_result] Unable to store {tool_name} result: {str(e)}")
+        return None
+
+
+def line_chart_from_results(result_handle, series, title=None, y_label=None, rows=None):
+    """Line chart data (the show_line_chart `data` format) built from cached time series results.
+    Each series is {"column": "meter_1", "legend_label": str, "color": str, "multiplier": number, "result_handle": str},
+    a series without its own result_handle uses result_handle, or rows when they are given instead of a handle."""
+    keys = []
+    for spec in series or [{"column": "meter_0"}]:
+        handle = spec.get("result_handle") or result_handle
+        column = spec.get("column") or f"meter_{spec.get('meter', 0)}"
+        series_rows = get_result_store().rows(handle) if handle else rows or []
+        timestamps, values = rows_to_series(series_rows, column, multiplier=spec.get("multiplier") or 1)
+        if not timestamps:
+            raise ValueError(f"{f'Result {handle}' if handle else 'The result'} has no time series values in column '{column}'")
+        entry = {"timestamps": timestamps, "values": values, "legend_label": spec.get("legend_label") or f"{handle or 'series'} {column}"}
+        if spec.get("color"):
+            entry["color"] = spec["color"]
+        keys.append(entry)
+    return {"title": title or "Traffic", "x_label": "Time", "y_label": y_label or "Traffic", "keys": keys}
+
+
+def pie_chart_from_result(result_handle, value_column="metric", label_column="label", multiplier=1, limit=10, chart_title=None, legend_title=None):
+    """Pie chart data (the show_pie_chart `data` format) built from a cached topper style result.
+    The SYS: rows of a topper (SYS:GROUP_TOTALS) are totals, not keys, and are left out."""
+    rows = [
+        r for r in get_result_store().rows(result_handle)
+        if isinstance(r.get(value_column), (int, float)) and not str(r.get("key", "")).startswith("SYS:")
+    ][:limit]
+    if not rows:
+        raise ValueError(f"Result {result_handle} has no numeric values in column '{value_column}'")
+    return {
+        "chart_title": chart_title or "Traffic Distribution",
+        "legend_title": legend_title or label_column.capitalize(),
+        "labels": [str(r.get(label_column) or r.get("readable") or r.get("key")) for r in rows],
+        "volumes": [r[value_column] * multiplier for r in rows],
+    }
+
+
+def table_from_result(page):
+    """Table data (2D list) of a report page that references a cached result:
+    {"result_handle": "r2", "columns": [...], "headers": [...], "byte_columns": [...], "sort_by": str, "limit": int}"""
+    rows = analyze_rows(get_result_store().rows(page["result_handle"]), sort_by=page.get("sort_by"), limit=page.get("limit"))
+    columns = page.get("columns") or (list(rows[0].keys()) if rows else [])
+    bytes_to_human = TrisulAIUtils().bytes_to_human
+    formatters = {c: bytes_to_human for c in page.get("byte_columns") or []}
+    return rows_to_table(rows, columns, headers=page.get("headers"), formatters=formatters)
+
+
+def write_report(pages, filename, report_title, from_ts, to_ts):
+    """Write the report pages to /tmp/<filename> and return the path. Pages with a result_handle get their
+    table or chart data from the result store (see generate_trisul_report for the page format)."""
+    # Pages that reference cached results get their table or chart data here, the engine lays them out
+    for page in pages:
+        if not page.get("result_handle"):
+            continue
+        try:
+            if page.get("type") == "table":
+                page["data"] = table_from_result(page)
+            elif page.get("type") == "chart" and not page.get("file_path"):
+                page["chart"] = page.get("chart", "line")
+                if page["chart"] == "line":
+                    page["data"] = line_chart_from_results(page["result_handle"], page.get("series", []), title=page.get("title"), y_label=page.get("y_label"))
+                else:
+                    page["data"] = pie_chart_from_result(
+                        page["result_handle"],
+                        value_column=page.get("value_column", "metric"),
+                        label_column=page.get("label_column", "label"),
+                        multiplier=page.get("multiplier", 1),
+                        limit=page.get("limit", 10),
+                        chart_title=page.get("title"),
+                        legend_title=page.get("legend_title"),
+                    )
+        except (KeyError, ValueError) as e:
+            logging.warning(f"[write_report] Unable to build the {page.get('type')} of page '{page.get('title', '')}' from {page.get('result_handle')}: {str(e)}")
+            page["data"] = [] if page.get("type") == "table" else None
+
+    # reportlab is only needed for reports, the engine imports it on first use to keep the server start fast
+    from trisul_ai_cli.tools.report_engine import build_report
+
+    return build_report(
+        pages,
+        f"/tmp/{filename}",
+        report_title,
+        epoch_to_duration(from_ts, to_ts),
+        Path(__file__).resolve().parent / "assets/logo_tlhs.png",
+        logging,
+    )
+
+
+def get_trp_cache():
+    """Result cache for the TRP tools, created on first use. Returns None when disabled with TRISUL_TRP_CACHE=off."""
+    global _trp_cache
+    if _trp_cache is None:
+        try:
+            config = dotenv_values(Path(__file__).resolve().parent / ".env")
+            if str(config.get("TRISUL_TRP_CACHE", "on")).lower() in ("off", "false", "0"):
+                logging.info("[get_trp_cache] TRP result cache is disabled")
+                _trp_cache = False
+                return None
+            max_mb = int(config.get("TRISUL_TRP_CACHE_MAX_MB", TRP_CACHE_DEFAULT_MAX_MB))
+            _trp_cache = TRPResultCache(TRP_CACHE_PATH, max_bytes=max_mb * 1024 * 1024, logging=logging)
+            logging.info(f"[get_trp_cache] TRP result cache at {TRP_CACHE_PATH}, max {max_mb} MB")
+        except Exception as e:
+            logging.error(f"[get_trp_cache] Unable to open the TRP result cache: {str(e)}")
+            _trp_cache = False
+    return _trp_cache or None
+
+
+def get_prefetcher():
+    """Prefetcher of the likely follow-up queries, created on first use. Returns None when disabled with TRISUL_PREFETCH=off.
+    TRISUL_PREFETCH_TOP_K is the number of top keys whose traffic is prefetched after a topper query,
+    TRISUL_PREFETCH_BUDGET the number of prefetch queries allowed per minute."""
+    global _prefetcher, _prefetch_top_k
+    if _prefetcher is None:
+        try:
+            config = dotenv_values(Path(__file__).resolve().parent / ".env")
+            if str(config.get("TRISUL_PREFETCH", "on")).lower() in ("off", "false", "0"):
+                logging.info("[get_prefetcher] Prefetching is disabled")
+                _prefetcher = False
+                return None
+            budget = int(config.get("TRISUL_PREFETCH_BUDGET", PREFETCH_DEFAULT_BUDGET))
+            _prefetcher = Prefetcher(max_workers=PREFETCH_WORKERS, budget=budget, logging=logging)
+            _prefetch_top_k = int(config.get("TRISUL_PREFETCH_TOP_K", PREFETCH_DEFAULT_TOP_K))
+            logging.info(f"[get_prefetcher] Prefetching the traffic of the top {_prefetch_top_k} keys, at most {budget} queries a minute")
+        except Exception as e:
+            logging.error(f"[get_prefetcher] Unable to start the prefetcher: {str(e)}")
+            _prefetcher = False
+    return _prefetcher or None
+
+
+def key_traffic_prefetch_key(zmq_endpoint, counter_group, readable, duration_secs):
+    return ("key_traffic", zmq_endpoint, str(counter_group).upper(), str(readable).lower(), int(duration_secs))
+
+
+def prefetch_job(name, fn, *args):
+    """fn(*args) as a prefetch, in its own trace. Error results raise, so they are never served."""
+    with tracer.span("trp.prefetch", query=name):
+        result = fn(*args)
+    if isinstance(result, dict) and "error" in result:
+        raise Exception(result["error"])
+    return result
+
+
+def prefetch_top_key_traffic(zmq_endpoint, counter_group_guid, duration_secs, result):
+    """After a topper query, prefetch the traffic of its top keys over the same duration,
+    the usual next step is get_key_traffic_data on those keys."""
+    prefetcher = get_prefetcher()
+    if not prefetcher or _prefetch_top_k <= 0:
+        return
+    readables = [k.get("readable") for k in result.get("keys", []) if k.get("readable") and not str(k.get("key", "")).startswith("SYS:")]
+    started = [
+        readable for readable in readables[:_prefetch_top_k]
+        if prefetcher.submit(
+            key_traffic_prefetch_key(zmq_endpoint, counter_group_guid, readable, duration_secs),
+            prefetch_job, "key_traffic", fetch_key_traffic_result, zmq_endpoint, counter_group_guid, readable, duration_secs,
+        )
+    ]
+    if started:
+        logging.info(f"[prefetch_top_key_traffic] Prefetching the traffic of {started}")
+
+
+def prefetch_counter_group_details(zmq_endpoint):
+    """After the counter groups are listed, prefetch their details with the meters for get_cginfo_from_countergroup_name."""
+    prefetcher = get_prefetcher()
+    if prefetcher and prefetcher.submit(("cginfo", zmq_endpoint), prefetch_job, "cginfo", countergroup_info, zmq_endpoint, "context0", True):
+        logging.info(f"[prefetch_counter_group_details] Prefetching the counter group details of {zmq_endpoint}")
+
+
+def get_counter_group_meta(zmq_endpoint, counter_group_guid):
+    """Counter group details (bucket sizes, name) from COUNTER_GROUP_INFO, kept in memory for COUNTER_GROUP_META_TTL_SECS."""
+    fetched_at, groups = _counter_group_meta_cache.get(zmq_endpoint, (0, {}))
+    if time.time() - fetched_at > COUNTER_GROUP_META_TTL_SECS:
+        all_cgs = countergroup_info(zmq_endpoint, get_meter_info=False)
+        if "error" in all_cgs:
+            return {}
+        groups = {g.get("guid", "").upper(): g for g in all_cgs.get("groupDetails", [])}
+        _counter_group_meta_cache[zmq_endpoint] = (time.time(), groups)
+    return groups.get(str(counter_group_guid).upper(), {})
+
+
+def get_counter_group_bucket_secs(zmq_endpoint, counter_group_guid, field, default_secs):
+    """Bucket size of a counter group in seconds. bucketSize is reported in milliseconds, topperBucketSize in seconds."""
+    try:
+        value = int(get_counter_group_meta(zmq_endpoint, counter_group_guid).get(field, 0))
+        if field == "bucketSize":
+            value //= 1000
+        return value if value > 0 else default_secs
+    except Exception as e:
+        logging.warning(f"[get_counter_group_bucket_secs] Using default {field}={default_secs}: {str(e)}")
+        return default_secs
+
+
+def fetch_key_traffic(zmq_endpoint, base_req, from_ts, to_ts):
+    """Run the COUNTER_ITEM_REQUEST in base_req for a different time window."""
+    req = trp_pb2.Message()
+    req.CopyFrom(base_req)
+    getattr(req.counter_item_request.time_interval, 'from').tv_sec = int(from_ts)
+    req.counter_item_request.time_interval.to.tv_sec = int(to_ts)
+    resp = get_response(zmq_endpoint, req)
+    if not isinstance(resp, trp_pb2.CounterItemResponse):
+        raise Exception(f"Unexpected response to COUNTER_ITEM_REQUEST: {message_to_dict(resp)}")
+    return message_to_dict(resp)
+
+
+def cached_key_traffic(trp_cache, zmq_endpoint, req, window_to):
+    """Key traffic for the window in req, served from the result cache where possible.
+
+    The window is cut into bucket aligned segments. Closed segments come from the cache or are fetched
+    (consecutive missing segments with a single request) and cached forever, only the open tail after
+    the last closed segment is fetched fresh on every call.
+    """
+    q = req.counter_item_request
+    from_ts = getattr(q.time_interval, 'from').tv_sec
+    to_ts = q.time_interval.to.tv_sec
+    bucket_secs = get_counter_group_bucket_secs(zmq_endpoint, q.counter_group, "bucketSize", 60)
+    segment_secs = -(-TRP_CACHE_SEGMENT_SECS // bucket_secs) * bucket_secs
+
+    segments, tail_start = closed_segments(from_ts, to_ts, window_to - TRP_CACHE_GRACE_SECS, segment_secs)
+
+    pieces = []
+    missing = []
+    for segment in segments:
+        cache_key = trp_cache.make_key(zmq_endpoint, "key_traffic", q.counter_group, q.key.label, *segment)
+        cached = trp_cache.get(cache_key)
+        if cached is None:
+            missing.append(segment)
+        else:
+            pieces.append(cached)
+
+    for run in contiguous_runs(missing):
+        fetched = fetch_key_traffic(zmq_endpoint, req, run[0][0], run[-1][1] - 1)
+        for segment in run:
+            piece = dict(fetched)
+            piece.pop("totals", None)
+            piece["stats"] = [st for st in fetched.get("stats", []) if segment[0] <= int(st["tsTvSec"]) < segment[1]]
+            trp_cache.put(trp_cache.make_key(zmq_endpoint, "key_traffic", q.counter_group, q.key.label, *segment), piece)
+            pieces.append(piece)
+
+    if tail_start is not None:
+        pieces.append(fetch_key_traffic(zmq_endpoint, req, max(tail_start, from_ts), to_ts))
+
+    logging.info(f"[cached_key_traffic] {len(segments) - len(missing)} cached segments, {len(missing)} fetched, open tail from {tail_start}")
+
+    result = dict(pieces[0]) if pieces else {"counterGroup": q.counter_group}
+    result.pop("totals", None)
+    stats = {}
+    for piece in pieces:
+        for st in piece.get("stats", []):
+            if from_ts <= int(st["tsTvSec"]) <= to_ts:
+                stats[int(st["tsTvSec"])] = st
+    result["stats"] = [stats[ts] for ts in sorted(stats)]
+    return result
+
+
+def set_session_filters(q, key=None, source_ip=None, source_port=None, dest_ip=None, dest_port=None, any_ip=None, any_port=None, ip_pair=None, protocol=None, flowtag=None, nf_routerid=None, nf_ifindex_in=None, nf_ifindex_out=None, subnet_24=None, subnet_16=None, idlist=None, any_nf_ifindex=None):
+    """Apply the optional QuerySessionsRequest filters, fields provided are AND-ed by the hub."""
+    if key: q.key = key
+    if source_ip: q.source_ip.label = source_ip
+    if source_port: q.source_port.label = source_port
+    if dest_ip: q.dest_ip.label = dest_ip
+    if dest_port: q.dest_port.label = dest_port
+    if any_ip: q.any_ip.label = any_ip
+    if any_port: q.any_port.label = any_port
+    if protocol: q.protocol.label = protocol
+    if flowtag: q.flowtag = flowtag
+    if nf_routerid: q.nf_routerid.label = nf_routerid
+    if nf_ifindex_in: q.nf_ifindex_in.label = nf_ifindex_in
+    if nf_ifindex_out: q.nf_ifindex_out.label = nf_ifindex_out
+    if subnet_24: q.subnet_24 = subnet_24
+    if subnet_16: q.subnet_16 = subnet_16
+    if any_nf_ifindex: q.any_nf_ifindex.label = any_nf_ifindex
+
+    if ip_pair and len(ip_pair) == 2:
+        p1 = q.ip_pair.add(); p1.label = ip_pair[0]
+        p2 = q.ip_pair.add(); p2.label = ip_pair[1]
+
+    if idlist:
+        for fid in idlist:
+            q.idlist.append(fid)
+
+
 
 
 
 # TRP tools
 
-@mcp.tool()
+@traced_tool()
 def list_all_available_counter_groups(context: str = "context0", zmq_endpoint: str = None):
     """List all available counter groups from Trisul via ZMQ for a given context or the zmq_endpoint.
     Arguments: 
@@ -253,7 +744,7 @@ def list_all_available_counter_groups(context: str = "context0", zmq_endpoint: s
         
         if "error" in all_cgs:
             logging.error(f"[list_all_available_counter_groups] Error from countergroup_info: {all_cgs['error']}")
-            return json_to_toon({"error": all_cgs["error"], "groupDetails": []})
+            return to_toon({"error": all_cgs["error"], "groupDetails": []})
         
         group_details = all_cgs.get("groupDetails", [])
         logging.info(f"[list_all_available_counter_groups] Processing {len(group_details)} counter groups")
@@ -267,15 +758,16 @@ def list_all_available_counter_groups(context: str = "context0", zmq_endpoint: s
                 continue
         
         logging.info(f"[list_all_available_counter_groups] Retrieved {len(simplified_groups)} counter groups")
-        return json_to_toon({"groupDetails": simplified_groups})
+        prefetch_counter_group_details(zmq_endpoint)
+        return to_toon({"groupDetails": simplified_groups})
         
     except Exception as e:
         logging.error(f"[list_all_available_counter_groups] Error in list_all_available_counter_groups: {str(e)}", exc_info=True)
-        return json_to_toon({"error": str(e), "groupDetails": []})
+        return to_toon({"error": str(e), "groupDetails": []})
 
 
 
-@mcp.tool()
+@traced_tool()
 def get_cginfo_from_countergroup_name(countergroup_name: str, context: str = "context0", zmq_endpoint: str = None):
     """Fetch counter group details by counter group name from Trisul via ZMQ for a given context or the zmq_endpoint.
     and it will also fetch meters info for each counter group so that we can determine what each meter means and its index.
@@ -303,12 +795,17 @@ def get_cginfo_from_countergroup_name(countergroup_name: str, context: str = "co
             
         logging.info(f"[get_cginfo_from_countergroup_name] Fetching counter group info for name: {countergroup_name}, zmq_endpoint: {zmq_endpoint}")
         
-        # Get all counter groups (with meter info if available)
-        all_cgs = countergroup_info(zmq_endpoint, get_meter_info=True)
+        # Get all counter groups (with meter info if available), prefetched when the groups were just listed
+        prefetcher = get_prefetcher()
+        all_cgs = prefetcher.take(("cginfo", zmq_endpoint)) if prefetcher else None
+        if all_cgs is not None:
+            logging.info("[get_cginfo_from_countergroup_name] Served from prefetch")
+        else:
+            all_cgs = countergroup_info(zmq_endpoint, get_meter_info=True)
         
         if "error" in all_cgs:
             logging.error(f"[get_cginfo_from_countergroup_name] Error from countergroup_info: {all_cgs['error']}")
-            return json_to_toon({"name": countergroup_name, "guid": f"Error: {all_cgs['error']}"})
+            return to_toon({"name": countergroup_name, "guid": f"Error: {all_cgs['error']}"})
         
         group_details = all_cgs.get("groupDetails", [])
         logging.info(f"[get_cginfo_from_countergroup_name] Retrieved {len(group_details)} counter groups")
@@ -325,14 +822,14 @@ def get_cginfo_from_countergroup_name(countergroup_name: str, context: str = "co
                 normalized_group_name = group_name.lower().replace(" ", "")
                 if normalized_group_name == normalized_search_name:
                     logging.info(f"[get_cginfo_from_countergroup_name] Found matching counter group: {group_name}")
-                    return json_to_toon(group)  # return full raw group dict
+                    return to_toon(group)  # return full raw group dict
             except Exception as e:
                 logging.warning(f"[get_cginfo_from_countergroup_name] Error processing group: {str(e)}, skipping")
                 continue
         
         # If not found
         logging.warning(f"[get_cginfo_from_countergroup_name] Counter group '{countergroup_name}' not found. Available groups: {group_names}")
-        return json_to_toon({
+        return to_toon({
             "name": countergroup_name,
             "guid": "Not Found",
             "available_groups": group_names
@@ -340,16 +837,76 @@ def get_cginfo_from_countergroup_name(countergroup_name: str, context: str = "co
             
     except Exception as e:
         logging.error(f"[get_cginfo_from_countergroup_name] Error in get_cginfo_from_countergroup_name: {str(e)}", exc_info=True)
-        return json_to_toon({"name": countergroup_name, "guid": f"Error: {str(e)}"})
+        return to_toon({"name": countergroup_name, "guid": f"Error: {str(e)}"})
     
 
 
-@mcp.tool()
-def get_counter_group_topper(counter_group_guid: str, meter: int = 0, duration_secs: int = 3600, max_count: int = 10, context: str = "context0", zmq_endpoint: str = None):
+def query_counter_group_topper(zmq_endpoint, counter_group_guid, meter=0, duration_secs=3600, max_count=10, start_ts=None, end_ts=None):
+    """Run a counter group topper query over the last duration_secs, or from start_ts to end_ts, and keep it in the
+    result store. An explicit window that has closed is served from the result cache. Returns (result handle, result).
+    Raises on TRP errors."""
+    # Step 1: Get available timeslices
+    logging.info("[get_counter_group_topper] Step 1: Getting available timeslices")
+    req = trp_pb2.Message()
+    req.trp_command = req.TIMESLICES_REQUEST
+    req.time_slices_request.get_total_window = True
+    resp = get_response(zmq_endpoint, req)
+    logging.info("[get_counter_group_topper] Timeslices received")
+
+    # Step 2: Build topper request
+    logging.info("[get_counter_group_topper] Step 2: Building topper request")
+    req = trp_pb2.Message()
+    req.trp_command = req.COUNTER_GROUP_TOPPER_REQUEST
+    req.counter_group_topper_request.counter_group = counter_group_guid
+    req.counter_group_topper_request.meter = meter
+    req.counter_group_topper_request.maxitems = max_count
+
+    # Step 3: Time interval from start_ts to end_ts, or the last duration_secs up to the newest data on the hub
+    logging.info("[get_counter_group_topper] Step 3: Setting time interval")
+    window_to = resp.total_window.to.tv_sec
+    trp_cache = get_trp_cache()
+    tm = trp_pb2.TimeInterval()
+    object = getattr(tm, 'from')
+    if start_ts and end_ts:
+        object.tv_sec = int(start_ts)
+        tm.to.tv_sec = int(end_ts)
+    else:
+        tm.to.tv_sec = window_to
+        object.tv_sec = tm.to.tv_sec - duration_secs
+    req.counter_group_topper_request.time_interval.MergeFrom(tm)
+    logging.info(f"[get_counter_group_topper] Time interval: from={object.tv_sec}, to={tm.to.tv_sec}")
+
+    # Step 4: Get topper response. The top keys of a window are not the merge of the top keys of its parts,
+    # so only an explicit window that has closed as a whole is served from the result cache. A window of the
+    # last duration_secs ends at the newest data and is always queried live.
+    logging.info("[get_counter_group_topper] Step 4: Getting topper response")
+    cache_key = None
+    result = None
+    if trp_cache and tm.to.tv_sec + TRP_CACHE_GRACE_SECS <= window_to:
+        cache_key = trp_cache.make_key(zmq_endpoint, "topper", counter_group_guid, meter, max_count, object.tv_sec, tm.to.tv_sec)
+        result = trp_cache.get(cache_key)
+        if result is not None:
+            logging.info(f"[get_counter_group_topper] Served from result cache: {cache_key}")
+
+    if result is None:
+        resp = get_response(zmq_endpoint, req)
+        logging.info("[get_counter_group_topper] Successfully retrieved counter group topper")
+
+        # Step 5: Return JSON-serializable dict
+        result = message_to_dict(resp)
+        if cache_key and isinstance(resp, trp_pb2.CounterGroupTopperResponse):
+            trp_cache.put(cache_key, result)
+    handle = store_result("get_counter_group_topper", {"counter_group_guid": counter_group_guid, "meter": meter, "duration_secs": duration_secs, "max_count": max_count, "start_ts": start_ts, "end_ts": end_ts, "zmq_endpoint": zmq_endpoint}, result)
+    return handle, result
+
+
+@traced_tool()
+def get_counter_group_topper(counter_group_guid: str, meter: int = 0, duration_secs: int = 3600, max_count: int = 10, start_ts: int = None, end_ts: int = None, context: str = "context0", zmq_endpoint: str = None):
     """
     Fetch the topper metrics for a given counter group and meter over the last `duration_secs` seconds.
     Arguments: 
     counter_group_guid (str): GUID of the Counter group , meter (int): Meter index, duration_secs (int): Duration in seconds, max_count (int): maximum number of toppers retrive, 
+    start_ts (int), end_ts (int): Epoch seconds of a fixed time window (e.g. yesterday), used instead of duration_secs,
     context (str): Context name, 
     zmp_endpoint (str): ZMQ endpoint in the format "tcp://<ip_address>:<port>", for example "tcp://10.16.8.44:5008". The IP address and port may vary.
     Returns: dict: Dictionary containing topper metrics.
@@ -368,48 +925,103 @@ def get_counter_group_topper(counter_group_guid: str, meter: int = 0, duration_s
             context = normalize_context(context)
             zmq_endpoint = f"ipc:///usr/local/var/lib/trisul-hub/domain0/hub0/{context}/run/trp_0"
         
-        logging.info(f"[get_counter_group_topper] Fetching counter group topper: counter_group_guid={counter_group_guid}, meter={meter}, duration_secs={duration_secs}, max_count={max_count}, context={zmq_endpoint}")
+        logging.info(f"[get_counter_group_topper] Fetching counter group topper: counter_group_guid={counter_group_guid}, meter={meter}, duration_secs={duration_secs}, max_count={max_count}, start_ts={start_ts}, end_ts={end_ts}, context={zmq_endpoint}")
 
-        # Step 1: Get available timeslices
-        logging.info("[get_counter_group_topper] Step 1: Getting available timeslices")
+        handle, result = query_counter_group_topper(zmq_endpoint, counter_group_guid, meter, duration_secs, max_count, start_ts, end_ts)
+        # The prefetched follow-ups cover the last duration_secs, not a fixed window
+        if not (start_ts and end_ts):
+            prefetch_top_key_traffic(zmq_endpoint, counter_group_guid, duration_secs, result)
+        return to_toon({"resultHandle": handle, **result})
+    
+    except Exception as e:
+        logging.error(f"[get_counter_group_topper] Error in get_counter_group_topper: {str(e)}", exc_info=True)
+        return to_toon({"error": str(e)})
+
+
+
+def query_key_traffic(zmq_endpoint, counter_group, readable, duration_secs=3600, start_ts=None, end_ts=None):
+    """Run a key traffic query (served from a prefetch of the same query, closed segments from the result cache)
+    and keep it in the result store. Returns (result handle, result). Raises on TRP errors."""
+    prefetcher = get_prefetcher()
+    result = None
+    if prefetcher and not (start_ts and end_ts):
+        result = prefetcher.take(key_traffic_prefetch_key(zmq_endpoint, counter_group, readable, duration_secs))
+    if result is not None:
+        logging.info(f"[get_key_traffic_data] Served from prefetch: counter_group={counter_group}, readable={readable}")
+    else:
+        result = fetch_key_traffic_result(zmq_endpoint, counter_group, readable, duration_secs, start_ts, end_ts)
+
+    handle = store_result("get_key_traffic_data", {"counter_group": counter_group, "readable": readable, "duration_secs": duration_secs, "start_ts": start_ts, "end_ts": end_ts, "zmq_endpoint": zmq_endpoint}, result)
+    return handle, result
+
+
+def fetch_key_traffic_result(zmq_endpoint, counter_group, readable, duration_secs=3600, start_ts=None, end_ts=None):
+    """Key traffic of one key from the hub, closed segments served from the result cache. Raises on TRP errors."""
+    #Construct time request
+    try:
+        logging.info("[get_key_traffic_data] Constructing TIMESLICES_REQUEST")
         req = trp_pb2.Message()
         req.trp_command = req.TIMESLICES_REQUEST
         req.time_slices_request.get_total_window = True
-        resp = get_response(zmq_endpoint, req)
-        logging.info("[get_counter_group_topper] Timeslices received")
+        logging.info("[get_key_traffic_data] Sending TIMESLICES_REQUEST")
+        tint_resp = get_response(zmq_endpoint, req)
+        logging.info("[get_key_traffic_data] Received timeslices response")
+    except Exception as e:
+        logging.error(f"[get_key_traffic_data] Error getting timeslices: {str(e)}")
+        raise
+
 
-        # Step 2: Build topper request
-        logging.info("[get_counter_group_topper] Step 2: Building topper request")
+    #construct counter item request request for internal host
+    try:
+        logging.info("[get_key_traffic_data] Constructing COUNTER_ITEM_REQUEST")
         req = trp_pb2.Message()
-        req.trp_command = req.COUNTER_GROUP_TOPPER_REQUEST
-        req.counter_group_topper_request.counter_group = counter_group_guid
-        req.counter_group_topper_request.meter = meter
-        req.counter_group_topper_request.maxitems = max_count
+        req.trp_command = req.COUNTER_ITEM_REQUEST
+        req.counter_item_request.counter_group = counter_group
+        req.counter_item_request.key.label = readable.lower()
+        logging.info(f"[get_key_traffic_data] Counter item request configured: counter_group={counter_group}, readable={readable}")
+    except Exception as e:
+        logging.error(f"[get_key_traffic_data] Error constructing counter item request: {str(e)}")
+        raise
 
-        # Step 3: Time interval for last duration_secs
-        logging.info("[get_counter_group_topper] Step 3: Setting time interval")
+    #construct time interval for last 1 hour
+    try:
+        logging.info("[get_key_traffic_data] Constructing time interval")
         tm = trp_pb2.TimeInterval()
-        tm.to.tv_sec = resp.total_window.to.tv_sec
+        tm.MergeFrom(tint_resp.total_window)
         object = getattr(tm, 'from')
         object.tv_sec = tm.to.tv_sec - duration_secs
-        req.counter_group_topper_request.time_interval.MergeFrom(tm)
-        logging.info(f"[get_counter_group_topper] Time interval: from={object.tv_sec}, to={tm.to.tv_sec}")
 
-        # Step 4: Get topper response
-        logging.info("[get_counter_group_topper] Step 4: Getting topper response")
-        resp = get_response(zmq_endpoint, req)
-        logging.info("[get_counter_group_topper] Successfully retrieved counter group topper")
+        logging.info(f"[get_key_traffic_data] Default time interval: from={object.tv_sec}, to={tm.to.tv_sec}")
 
-        # Step 5: Return JSON-serializable dict
-        return json_to_toon(MessageToDict(resp))
-    
+        #assign time interval to counter group topper request
+        if start_ts and end_ts:
+            logging.info(f"[get_key_traffic_data] Overriding time interval with start_ts={start_ts}, end_ts={end_ts}")
+            object = getattr(tm, 'from')
+            object.tv_sec = start_ts
+            object = getattr(tm, 'to')
+            object.tv_sec = end_ts
+            logging.info(f"[get_key_traffic_data] Time interval set: from={start_ts}, to={end_ts}")
+        else:
+            logging.info(f"[get_key_traffic_data] Time interval set: from={object.tv_sec}, to={tm.to.tv_sec} (duration: {duration_secs}s)")
+
+        req.counter_item_request.time_interval.MergeFrom(tm)
     except Exception as e:
-        logging.error(f"[get_counter_group_topper] Error in get_counter_group_topper: {str(e)}", exc_info=True)
-        return json_to_toon({"error": str(e)})
+        logging.error(f"[get_key_traffic_data] Error setting time interval: {str(e)}")
+        raise
 
+    logging.info("[get_key_traffic_data] Sending COUNTER_ITEM_REQUEST")
+    trp_cache = get_trp_cache()
+    if trp_cache:
+        result = cached_key_traffic(trp_cache, zmq_endpoint, req, tint_resp.total_window.to.tv_sec)
+    else:
+        resp = get_response(zmq_endpoint, req)
+        result = message_to_dict(resp)
+    logging.info("[get_key_traffic_data] Successfully received key traffic response")
+    logging.info(f"[get_key_traffic_data] Response converted to dict, keys: {result.keys()}")
+    return result
 
 
-@mcp.tool()
+@traced_tool()
 def get_key_traffic_data(counter_group: str, readable: str = None, duration_secs: int = 3600, start_ts: int = None, end_ts: int = None, context: str = "context0", zmq_endpoint: str = None):
     """
     Fetch the key traffic metrics for a given counter group and readable over the last `duration_secs` seconds.
@@ -453,74 +1065,16 @@ def get_key_traffic_data(counter_group: str, readable: str = None, duration_secs
         logging.info(f"[get_key_traffic_data] Fetching key traffic: counter_group={counter_group}, readable={readable}, duration_secs={duration_secs}, start_ts={start_ts}, end_ts={end_ts}, zmq_endpoint={zmq_endpoint}")
                         
 
-        #Construct time request
-        try:
-            logging.info("[get_key_traffic_data] Constructing TIMESLICES_REQUEST")
-            req = trp_pb2.Message()
-            req.trp_command = req.TIMESLICES_REQUEST
-            req.time_slices_request.get_total_window = True
-            logging.info("[get_key_traffic_data] Sending TIMESLICES_REQUEST")
-            tint_resp = get_response(zmq_endpoint, req)
-            logging.info("[get_key_traffic_data] Received timeslices response")
-        except Exception as e:
-            logging.error(f"[get_key_traffic_data] Error getting timeslices: {str(e)}")
-            raise
-
-
-        #construct counter item request request for internal host
-        try:
-            logging.info("[get_key_traffic_data] Constructing COUNTER_ITEM_REQUEST")
-            req = trp_pb2.Message()
-            req.trp_command = req.COUNTER_ITEM_REQUEST
-            req.counter_item_request.counter_group = counter_group
-            req.counter_item_request.key.label = readable.lower()
-            logging.info(f"[get_key_traffic_data] Counter item request configured: counter_group={counter_group}, readable={readable}")
-        except Exception as e:
-            logging.error(f"[get_key_traffic_data] Error constructing counter item request: {str(e)}")
-            raise
-
-        #construct time interval for last 1 hour
-        try:
-            logging.info("[get_key_traffic_data] Constructing time interval")
-            tm = trp_pb2.TimeInterval()
-            tm.MergeFrom(tint_resp.total_window)
-            object = getattr(tm, 'from')
-            object.tv_sec = tm.to.tv_sec - duration_secs
-            
-            logging.info(f"[get_key_traffic_data] Default time interval: from={object.tv_sec}, to={tm.to.tv_sec}")
-
-            #assign time interval to counter group topper request
-            if start_ts and end_ts:
-                logging.info(f"[get_key_traffic_data] Overriding time interval with start_ts={start_ts}, end_ts={end_ts}")
-                object = getattr(tm, 'from')
-                object.tv_sec = start_ts
-                object = getattr(tm, 'to')
-                object.tv_sec = end_ts
-                logging.info(f"[get_key_traffic_data] Time interval set: from={start_ts}, to={end_ts}")
-            else:
-                logging.info(f"[get_key_traffic_data] Time interval set: from={object.tv_sec}, to={tm.to.tv_sec} (duration: {duration_secs}s)")
-                
-            req.counter_item_request.time_interval.MergeFrom(tm)
-        except Exception as e:
-            logging.error(f"[get_key_traffic_data] Error setting time interval: {str(e)}")
-            raise
-        
-        logging.info("[get_key_traffic_data] Sending COUNTER_ITEM_REQUEST")
-        resp = get_response(zmq_endpoint, req)
-        logging.info("[get_key_traffic_data] Successfully received key traffic response")
-        
-        result = MessageToDict(resp)
-        logging.info(f"[get_key_traffic_data] Response converted to dict, keys: {result.keys()}")
-        
-        return json_to_toon(result)
+        handle, result = query_key_traffic(zmq_endpoint, counter_group, readable, duration_secs, start_ts, end_ts)
+        return to_toon({"resultHandle": handle, **result})
     
         
     except zmq.ZMQError as e:
         logging.error(f"[get_key_traffic_data] ZMQ error in key_traffic: {str(e)}", exc_info=True)
-        return json_to_toon({"error": f"ZMQ error: {str(e)}"})
+        return to_toon({"error": f"ZMQ error: {str(e)}"})
     except Exception as e:
         logging.error(f"[get_key_traffic_data] Error in key_traffic: {str(e)}", exc_info=True)
-        return json_to_toon({"error": str(e)})
+        return to_toon({"error": str(e)})
     finally:
         if socket:
             try:
@@ -531,8 +1085,8 @@ def get_key_traffic_data(counter_group: str, readable: str = None, duration_secs
 
 
 
-@mcp.tool()
-def get_alerts_data(
+@traced_tool()
+async def get_alerts_data(
     alert_group: str,
     duration_secs: int = 3600,
     start_ts: int = None,
@@ -556,7 +1110,8 @@ def get_alerts_data(
     aux_message1: str = None,
     aux_message2: str = None,
     message_regex: str = None,
-    idlist: List[str] = None
+    idlist: List[str] = None,
+    ctx: Context = None
 ):
     """
     Retrieve alert telemetry from Trisul using QUERY_ALERTS_REQUEST.
@@ -605,6 +1160,7 @@ def get_alerts_data(
         - Always provide a valid GUID for `alert_group` to avoid request rejection.
         - Absolute time window (start_ts/end_ts) overrides duration_secs if both provided.
         - Optimized for downstream dashboards, analytics engines, and correlation pipelines.
+        - The query runs asynchronously on the hub, so scans over several days of alerts are supported.
     """
 
 
@@ -612,8 +1168,8 @@ def get_alerts_data(
         logging.info(f"[get_alerts_data] Start | alert_group={alert_group} duration_secs={duration_secs} start_ts={start_ts} end_ts={end_ts}")
 
         if not zmq_endpoint:
-            ctx = normalize_context(context)
-            zmq_endpoint = f"ipc:///usr/local/var/lib/trisul-hub/domain0/hub0/{ctx}/run/trp_0"
+            context_name = normalize_context(context)
+            zmq_endpoint = f"ipc:///usr/local/var/lib/trisul-hub/domain0/hub0/{context_name}/run/trp_0"
         logging.info(f"[get_alerts_data] ZMQ endpoint: {zmq_endpoint}")
 
 
@@ -622,7 +1178,7 @@ def get_alerts_data(
         req.trp_command = req.TIMESLICES_REQUEST
         req.time_slices_request.get_total_window = True
         req.time_slices_request.get_total_window = True
-        tint_resp = get_response(zmq_endpoint, req)
+        tint_resp = await get_response_async(zmq_endpoint, req)
 
         tm = trp_pb2.TimeInterval()
         tm.MergeFrom(tint_resp.total_window)
@@ -691,19 +1247,34 @@ def get_alerts_data(
                 kt2.label = str(p[1]).lower()
             logging.info(f"[get_alerts_data] ip_pair count={len(pairs)}")
 
-        logging.info("[get_alerts_data] Executing QUERY_ALERTS_REQUEST")
-        resp = get_response(zmq_endpoint, req)
-        
-        return json_to_toon(MessageToDict(resp))
+        # Alerts of a closed interval never change, those are served from the result cache
+        trp_cache = get_trp_cache()
+        cache_key = None
+        result = None
+        if trp_cache and tm.to.tv_sec + TRP_CACHE_GRACE_SECS <= tint_resp.total_window.to.tv_sec:
+            cache_key = trp_cache.make_key(zmq_endpoint, "alerts", json.dumps(message_to_dict(q), sort_keys=True))
+            result = trp_cache.get(cache_key)
+            if result is not None:
+                logging.info(f"[get_alerts_data] Served from result cache: {cache_key}")
+
+        if result is None:
+            logging.info("[get_alerts_data] Executing QUERY_ALERTS_REQUEST")
+            resp = await get_response_async(zmq_endpoint, req, run_async=True, ctx=ctx)
+
+            result = message_to_dict(resp)
+            if cache_key and isinstance(resp, trp_pb2.QueryAlertsResponse):
+                trp_cache.put(cache_key, result)
+        handle = store_result("get_alerts_data", {"alert_group": alert_group, "from": getattr(tm, 'from').tv_sec, "to": tm.to.tv_sec, "zmq_endpoint": zmq_endpoint, "query": message_to_dict(q)}, result)
+        return to_toon({"resultHandle": handle, **result})
 
     except Exception as e:
         logging.error(f"[get_alerts_data] Error: {str(e)}", exc_info=True)
-        return json_to_toon({"error": str(e)})
+        return to_toon({"error": str(e)})
 
 
 
-@mcp.tool()
-def get_flows_or_sessions_data(
+@traced_tool()
+async def get_flows_or_sessions_data(
         session_group: str = "{99A78737-4B41-4387-8F31-8077DB917336}",
         key: str = None,
         source_ip: str = None,
@@ -730,7 +1301,8 @@ def get_flows_or_sessions_data(
         start_ts: int = None,
         end_ts: int = None,
         context: str = "context0",
-        zmq_endpoint: str = None
+        zmq_endpoint: str = None,
+        ctx: Context = None
     ):
     """
     Unified QuerySessions API pull.
@@ -759,7 +1331,7 @@ def get_flows_or_sessions_data(
         idlist: Flow IDs to retrieve directly. Skips filters.
         any_nf_ifindex: Match IN or OUT NF interface.
         duration_secs: Time window if timestamps not provided.
-        start_ts, end_ts: Epoch timestamps override duration_secs.
+        start_ts, end_ts: Epoch timestamps override duration_secs. Long historical windows are supported, the query runs asynchronously on the hub.
         context: Trisul context.
         zmq_endpoint: Custom TRP endpoint.
         
@@ -791,7 +1363,7 @@ def get_flows_or_sessions_data(
         req.trp_command = req.TIMESLICES_REQUEST
         req.time_slices_request.get_total_window = True
         req.time_slices_request.get_total_window = True
-        tint_resp = get_response(zmq_endpoint, req)
+        tint_resp = await get_response_async(zmq_endpoint, req)
 
         tm = trp_pb2.TimeInterval()
         tm.MergeFrom(tint_resp.total_window)
@@ -819,46 +1391,362 @@ def get_flows_or_sessions_data(
         q.resolve_keys = resolve_keys
         if outputpath: q.outputpath = outputpath
 
-        if key: q.key = key
-        if source_ip: q.source_ip.label = source_ip
-        if source_port: q.source_port.label = source_port
-        if dest_ip: q.dest_ip.label = dest_ip
-        if dest_port: q.dest_port.label = dest_port
-        if any_ip: q.any_ip.label = any_ip
-        if any_port: q.any_port.label = any_port
-        if protocol: q.protocol.label = protocol
-        if flowtag: q.flowtag = flowtag
-        if nf_routerid: q.nf_routerid.label = nf_routerid
-        if nf_ifindex_in: q.nf_ifindex_in.label = nf_ifindex_in
-        if nf_ifindex_out: q.nf_ifindex_out.label = nf_ifindex_out
-        if subnet_24: q.subnet_24 = subnet_24
-        if subnet_16: q.subnet_16 = subnet_16
-        if any_nf_ifindex: q.any_nf_ifindex.label = any_nf_ifindex
-
-        if ip_pair and len(ip_pair) == 2:
-            p1 = q.ip_pair.add(); p1.label = ip_pair[0]
-            p2 = q.ip_pair.add(); p2.label = ip_pair[1]
-
-        if idlist:
-            for fid in idlist:
-                q.idlist.append(fid)
+        set_session_filters(
+            q, key=key, source_ip=source_ip, source_port=source_port, dest_ip=dest_ip, dest_port=dest_port,
+            any_ip=any_ip, any_port=any_port, ip_pair=ip_pair, protocol=protocol, flowtag=flowtag,
+            nf_routerid=nf_routerid, nf_ifindex_in=nf_ifindex_in, nf_ifindex_out=nf_ifindex_out,
+            subnet_24=subnet_24, subnet_16=subnet_16, idlist=idlist, any_nf_ifindex=any_nf_ifindex
+        )
 
         logging.info(f"[QuerySessions] Executing QuerySessions with provided filters")
         
-        resp = MessageToDict(get_response(zmq_endpoint, req))
+        resp = message_to_dict(await get_response_async(zmq_endpoint, req, run_async=True, ctx=ctx))
         
         resp["sessions"][:] = [
             s for s in resp.get("sessions", [])
             if int(s["timeInterval"]["from"]["tvSec"]) <= end_ts and int(s["timeInterval"]["to"]["tvSec"]) >= start_ts
         ][-maxitems:]
         
-        logging.info(resp)
+        logging.info("[QuerySessions] Returning %d sessions", len(resp.get("sessions", [])))
         
-        return json_to_toon(resp)
+        handle = store_result("get_flows_or_sessions_data", {"zmq_endpoint": zmq_endpoint, "query": message_to_dict(q)}, resp)
+        return to_toon({"resultHandle": handle, **resp})
         
     except Exception as e:
         logging.error(f"[QuerySessions] Exception: {e}")
-        return json_to_toon({"error": str(e)})
+        return to_toon({"error": str(e)})
+
+
+
+@traced_tool()
+async def export_flows_or_sessions_to_file(
+        session_group: str = "{99A78737-4B41-4387-8F31-8077DB917336}",
+        key: str = None,
+        source_ip: str = None,
+        source_port: str = None,
+        dest_ip: str = None,
+        dest_port: str = None,
+        any_ip: str = None,
+        any_port: str = None,
+        ip_pair: List[str] = None,
+        protocol: str = None,
+        flowtag: str = None,
+        nf_routerid: str = None,
+        nf_ifindex_in: str = None,
+        nf_ifindex_out: str = None,
+        subnet_24: str = None,
+        subnet_16: str = None,
+        volume_filter: int = 0,
+        any_nf_ifindex: str = None,
+        duration_secs: int = 3600,
+        start_ts: int = None,
+        end_ts: int = None,
+        file_format: str = "csv",
+        filename: str = None,
+        chunk_secs: int = 300,
+        context: str = "context0",
+        zmq_endpoint: str = None,
+        ctx: Context = None
+    ):
+    """
+    Export all the flows or sessions matching the filters into a local CSV or Parquet file.
+    Use this instead of get_flows_or_sessions_data for bulk or forensics pulls (thousands of flows, long time windows)
+    and when the user asks to export, save or download flows. The flows are not returned, only the file path,
+    the row count and a small summary (total volume, top source ips, top destination ips and ports).
+
+    Args:
+        session_group, key, source_ip, source_port, dest_ip, dest_port, any_ip, any_port, ip_pair, protocol, flowtag,
+        nf_routerid, nf_ifindex_in, nf_ifindex_out, subnet_24, subnet_16, volume_filter, any_nf_ifindex:
+            Same filters as get_flows_or_sessions_data.
+        duration_secs: Time window if timestamps not provided. Default 1 hour.
+        start_ts, end_ts: Epoch timestamps override duration_secs.
+        file_format: "csv" (default) or "parquet".
+        filename: Output file name, written under /tmp. Auto-generated if not provided.
+        chunk_secs: The window is fetched from the hub in chunks of this many seconds. Default 300.
+        context: Trisul context.
+        zmq_endpoint: Custom TRP endpoint.
+
+    Returns:
+        dict: file_path, row_count and summary of the exported flows.
+    """
+
+    writer = None
+    try:
+        if not zmq_endpoint:
+            context = normalize_context(context)
+            zmq_endpoint = f"ipc:///usr/local/var/lib/trisul-hub/domain0/hub0/{context}/run/trp_0"
+
+        logging.info(f"[export_flows_or_sessions_to_file] TRP endpoint={zmq_endpoint}, file_format={file_format}, chunk_secs={chunk_secs}")
+
+        # Step 1: Pull Time Window
+        req = trp_pb2.Message()
+        req.trp_command = req.TIMESLICES_REQUEST
+        req.time_slices_request.get_total_window = True
+        tint_resp = await get_response_async(zmq_endpoint, req)
+
+        if not start_ts or not end_ts:
+            end_ts = tint_resp.total_window.to.tv_sec
+            start_ts = end_ts - int(duration_secs)
+        start_ts = int(start_ts)
+        end_ts = int(end_ts)
+
+        # Step 2: Open the output file
+        file_format = (file_format or "csv").lower()
+        notes = []
+        if file_format == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                logging.warning("[export_flows_or_sessions_to_file] pyarrow is not installed, falling back to csv")
+                notes.append("Parquet needs the pyarrow package which is not installed, the flows were exported as CSV instead.")
+                file_format = "csv"
+        elif file_format != "csv":
+            return {"status": "error", "message": f"Unsupported file format '{file_format}'", "message_to_llm": "Call this tool again with file_format 'csv' or 'parquet'"}
+
+        if not filename:
+            filename = f"trisul_sessions_{start_ts}_{end_ts}_{random.randint(1000, 9999)}"
+        filename = Path(filename).name
+        if not filename.endswith(f".{file_format}"):
+            filename = f"{filename}.{file_format}"
+        file_path = f"/tmp/{filename}"
+
+        writer = SessionFileWriter(file_path, file_format=file_format, logging=logging)
+
+        # Step 3: Stream the window chunk by chunk, a chunk that fills up maxitems is split in half and fetched again
+        # so that no flows are dropped. A flow is written by the chunk in which it started, flows that started before
+        # the window belong to the first chunk.
+        chunk_secs = max(int(chunk_secs), SESSION_EXPORT_MIN_CHUNK_SECS)
+        windows = [(t, min(t + chunk_secs, end_ts)) for t in range(start_ts, end_ts, chunk_secs)]
+        windows.reverse()
+        truncated_windows = 0
+
+        while windows:
+            chunk_start, chunk_end = windows.pop()
+
+            req = trp_pb2.Message()
+            req.trp_command = req.QUERY_SESSIONS_REQUEST
+            q = req.query_sessions_request
+            q.session_group = session_group
+            getattr(q.time_interval, 'from').tv_sec = chunk_start
+            q.time_interval.to.tv_sec = chunk_end
+            q.maxitems = SESSION_EXPORT_CHUNK_MAXITEMS
+            q.volume_filter = volume_filter
+            q.resolve_keys = True
+            set_session_filters(
+                q, key=key, source_ip=source_ip, source_port=source_port, dest_ip=dest_ip, dest_port=dest_port,
+                any_ip=any_ip, any_port=any_port, ip_pair=ip_pair, protocol=protocol, flowtag=flowtag,
+                nf_routerid=nf_routerid, nf_ifindex_in=nf_ifindex_in, nf_ifindex_out=nf_ifindex_out,
+                subnet_24=subnet_24, subnet_16=subnet_16, any_nf_ifindex=any_nf_ifindex
+            )
+
+            resp = await get_response_async(zmq_endpoint, req, run_async=True, ctx=ctx)
+
+            if len(resp.sessions) >= SESSION_EXPORT_CHUNK_MAXITEMS:
+                if chunk_end - chunk_start > SESSION_EXPORT_MIN_CHUNK_SECS:
+                    middle = (chunk_start + chunk_end) // 2
+                    windows.append((middle, chunk_end))
+                    windows.append((chunk_start, middle))
+                    logging.info(f"[export_flows_or_sessions_to_file] Chunk {chunk_start}-{chunk_end} is full, splitting at {middle}")
+                    continue
+                truncated_windows += 1
+
+            rows = []
+            for session in resp.sessions:
+                session_start = getattr(session.time_interval, 'from').tv_sec
+                if session_start >= chunk_end:
+                    continue
+                if session_start < chunk_start and chunk_start != start_ts:
+                    continue
+                rows.append(session_to_row(session))
+            writer.write_rows(rows)
+
+            logging.info(f"[export_flows_or_sessions_to_file] Chunk {chunk_start}-{chunk_end}: wrote {len(rows)} flows, total {writer.row_count}")
+            if ctx:
+                try:
+                    await ctx.report_progress(chunk_end - start_ts, end_ts - start_ts, f"Exported {writer.row_count} flows")
+                except Exception as e:
+                    logging.warning(f"[export_flows_or_sessions_to_file] Unable to report progress: {str(e)}")
+
+        writer.close()
+
+        if truncated_windows:
+            notes.append(f"{truncated_windows} windows of {SESSION_EXPORT_MIN_CHUNK_SECS}s had more than {SESSION_EXPORT_CHUNK_MAXITEMS} flows and were truncated.")
+
+        summary = writer.summary()
+        logging.info(f"[export_flows_or_sessions_to_file] Exported {summary['row_count']} flows to {file_path}")
+
+        return to_toon({
+            "status": "success",
+            "file_path": file_path,
+            "file_format": file_format,
+            "row_count": summary["row_count"],
+            "time_window": {"from": start_ts, "to": end_ts},
+            "summary": summary,
+            "notes": notes,
+            "message": f"The flows are exported to {file_path}. Tell the user the file path, the row count and summarize the top talkers.",
+        })
+
+    except Exception as e:
+        logging.error(f"[export_flows_or_sessions_to_file] Exception: {e}", exc_info=True)
+        return to_toon({"status": "error", "message": str(e)})
+    finally:
+        if writer:
+            writer.close()
+
+
+
+@traced_tool()
+def get_key_space_range(counter_group_guid: str, from_key: str, to_key: str, maxitems: int = 100, totals_only: bool = False, page_cursor: str = None, duration_secs: int = 3600, start_ts: int = None, end_ts: int = None, context: str = "context0", zmq_endpoint: str = None):
+    """
+    Scan a range of keys in a counter group using KEYSPACE_REQUEST and return the keys that were active in the time window.
+    Use this to find all active hosts in a subnet (eg: 10.1.1.0 to 10.1.1.255) or all active ports in a port range (eg: 1 to 1024)
+    instead of pulling a large number of toppers. It only returns the keys and counts, not the traffic rows.
+    Arguments:
+        counter_group_guid (str): GUID of the Counter group (eg: Hosts for IP ranges, Apps for port ranges)
+        from_key (str): Start of the key range in readable format like 10.1.1.0 or 1
+        to_key (str): End of the key range in readable format like 10.1.1.255 or 1024
+        maxitems (int): Maximum number of keys returned per page (Default: 100)
+        totals_only (bool): Set True to return only the total number of active keys in the range without the keys (Default: False)
+        page_cursor (str): Value of `nextPageCursor` from the previous page to fetch the next page of keys. Leave empty for the first page.
+        duration_secs (int): Duration in seconds, ignored if start_ts and end_ts are provided (Default: 3600)
+        start_ts, end_ts (int): Epoch timestamps of the time window
+        context (str): Context name
+        zmq_endpoint (str): ZMQ endpoint in the format "tcp://<ip_address>:<port>", for example "tcp://10.16.8.44:5008". The IP address and port may vary.
+    Returns: dict: Total active keys in the range and one page of keys.
+    Example: get_key_space_range("{XXXXXXXX-XXXX-XXXXXXXX-XXXXXXXXXXXXX}", "10.1.1.0", "10.1.1.255", 100) ->
+        {
+            "counterGroup": "{XXXXXXXX-XXXX-XXXXXXXX-XXXXXXXXXXXXX}", "totalHits": 142, "returned": 100,
+            "keys": [ {"key": "0A.01.01.05", "readable": "10.1.1.5", "label": "10.1.1.5"}, ... ],
+            "nextPageCursor": "0A.01.01.6E"
+        }
+    """
+    try:
+        if not zmq_endpoint:
+            context = normalize_context(context)
+            zmq_endpoint = f"ipc:///usr/local/var/lib/trisul-hub/domain0/hub0/{context}/run/trp_0"
+
+        logging.info(f"[get_key_space_range] Scanning key space: counter_group_guid={counter_group_guid}, from_key={from_key}, to_key={to_key}, maxitems={maxitems}, totals_only={totals_only}, page_cursor={page_cursor}, zmq_endpoint={zmq_endpoint}")
+
+        # Step 1: Get available timeslices
+        req = trp_pb2.Message()
+        req.trp_command = req.TIMESLICES_REQUEST
+        req.time_slices_request.get_total_window = True
+        tint_resp = get_response(zmq_endpoint, req)
+
+        tm = trp_pb2.TimeInterval()
+        tm.MergeFrom(tint_resp.total_window)
+        getattr(tm, 'from').tv_sec = tm.to.tv_sec - int(duration_secs)
+
+        if start_ts and end_ts:
+            getattr(tm, 'from').tv_sec = int(start_ts)
+            getattr(tm, 'to').tv_sec = int(end_ts)
+            logging.info(f"[get_key_space_range] Custom time window applied: {start_ts} to {end_ts}")
+
+        # Step 2: Build keyspace request, the cursor is the internal key of the last key on the previous page
+        req = trp_pb2.Message()
+        req.trp_command = req.KEYSPACE_REQUEST
+        q = req.key_space_request
+        q.counter_group = counter_group_guid
+        q.time_interval.MergeFrom(tm)
+        # A page after the first starts at the cursor key, which is dropped, so one more key is asked for
+        q.maxitems = int(maxitems) + 1 if page_cursor else int(maxitems)
+        q.totals_only = bool(totals_only)
+        q.resolve_keys = True
+
+        space = q.spaces.add()
+        if page_cursor:
+            space.from_key.key = page_cursor
+        else:
+            space.from_key.label = str(from_key).lower()
+        space.to_key.label = str(to_key).lower()
+
+        # Step 3: Get keyspace response
+        logging.info("[get_key_space_range] Executing KEYSPACE_REQUEST")
+        resp = get_response(zmq_endpoint, req)
+
+        result = {
+            "counterGroup": counter_group_guid,
+            "totalHits": resp.total_hits,
+        }
+        if totals_only:
+            logging.info(f"[get_key_space_range] Total hits: {resp.total_hits}")
+            return to_toon(result)
+
+        # Only the key identity is returned, the cursor key itself was already sent on the previous page
+        keys = [
+            {"key": hit.key, "readable": hit.readable, "label": hit.label}
+            for hit in resp.hits
+            if not (page_cursor and hit.key == page_cursor)
+        ][:int(maxitems)]
+
+        result["returned"] = len(keys)
+        result["keys"] = keys
+        if keys and len(resp.hits) >= q.maxitems:
+            result["nextPageCursor"] = keys[-1]["key"]
+
+        logging.info(f"[get_key_space_range] Total hits: {resp.total_hits}, returned: {len(keys)}")
+        result["resultHandle"] = store_result("get_key_space_range", {"counter_group_guid": counter_group_guid, "from_key": from_key, "to_key": to_key, "page_cursor": page_cursor, "from": getattr(tm, 'from').tv_sec, "to": tm.to.tv_sec, "zmq_endpoint": zmq_endpoint}, result)
+        return to_toon(result)
+
+    except Exception as e:
+        logging.error(f"[get_key_space_range] Error in get_key_space_range: {str(e)}", exc_info=True)
+        return to_toon({"error": str(e)})
+
+
+
+@traced_tool()
+def analyze_cached_results(result_handle: str = None, filters: List[dict] = None, group_by: List[str] = None, aggregations: List[str] = None, sort_by: str = None, descending: bool = True, limit: int = 20, columns: List[str] = None):
+    """
+    Answer follow-up questions locally from the results of previous data tool calls, without fetching from Trisul again.
+    Every result of get_counter_group_topper, get_key_traffic_data, get_alerts_data, get_flows_or_sessions_data and
+    get_key_space_range carries a `resultHandle` (eg: "r3"). Use this tool for follow-ups like "sort those by upload",
+    "what is the average over that window", "only the hosts above 1 MB", "group these flows by destination port".
+    It does not need any context name or the zmq_endpoint.
+    Arguments:
+        result_handle (str): The resultHandle of a previous result. Leave empty to list the cached results with their columns.
+        filters (list): Row filters, eg: [{"column": "meter_1", "op": ">", "value": 1000}]. op is one of ==, !=, >, >=, <, <=, contains, startswith, in
+        group_by (list): Columns to group by, eg: ["dest_port"]
+        aggregations (list): Aggregations like "sum(meter_1)", "avg(metric)", "max(az_bytes)", "median(meter_0)", "count(*)".
+            The output columns are named sum_meter_1, avg_metric, count ...
+        sort_by (str): Column to sort by, can be an aggregation output column
+        descending (bool): Sort order (Default: True)
+        limit (int): Maximum number of rows returned (Default: 20)
+        columns (list): Columns to return, all columns by default
+    Columns: topper rows have key, readable, label, metric, metricMax, metricMin, metricAvg. Key traffic rows have tsTvSec and
+        meter_0, meter_1 ... (one column per meter index). Alerts and flows have one column per field with readable values.
+        The values are raw, apply the same unit conversions as for the original tool output.
+    Returns: dict: The resulting rows.
+    Example: analyze_cached_results("r2", aggregations=["avg(meter_0)", "max(meter_0)"]) ->
+        { "resultHandle": "r2", "row_count": 1, "rows": [ {"avg_meter_0": 121143.5, "max_meter_0": 302793} ] }
+    """
+    try:
+        if not result_handle:
+            logging.info("[analyze_cached_results] Listing cached results")
+            return to_toon({"cachedResults": get_result_store().describe()})
+
+        logging.info(f"[analyze_cached_results] result_handle={result_handle}, filters={filters}, group_by={group_by}, aggregations={aggregations}, sort_by={sort_by}, limit={limit}")
+
+        if isinstance(filters, dict):
+            filters = [filters]
+        if isinstance(group_by, str):
+            group_by = [group_by]
+        if isinstance(aggregations, str):
+            aggregations = [aggregations]
+
+        try:
+            rows = get_result_store().rows(result_handle)
+        except KeyError:
+            logging.warning(f"[analyze_cached_results] Unknown result handle {result_handle}")
+            return to_toon({"error": f"Unknown or expired result handle '{result_handle}'", "cachedResults": get_result_store().describe(), "message_to_llm": "Use one of the cached result handles or fetch the data again"})
+
+        out_rows = analyze_rows(rows, filters=filters, group_by=group_by, aggregations=aggregations, sort_by=sort_by, descending=descending, limit=limit, columns=columns)
+        logging.info(f"[analyze_cached_results] {len(rows)} rows in, {len(out_rows)} rows out")
+
+        return to_toon({"resultHandle": result_handle, "row_count": len(out_rows), "rows": out_rows})
+
+    except Exception as e:
+        logging.error(f"[analyze_cached_results] Error in analyze_cached_results: {str(e)}", exc_info=True)
+        return to_toon({"error": str(e)})
 
 
 
@@ -866,7 +1754,7 @@ def get_flows_or_sessions_data(
 
 # Non TRP tools
 
-@mcp.tool()
+@traced_tool()
 def create_crosskey_counter_group( context: str = "context0", name: str = None, description: str = "No description", toppers_interval: int = 300, bucket_size: int = 60, track_hi_water: int = 500, track_lo_water: int = 100, tail_prune_factor: int = None, last_topper_bucket_ts: str = None, row_status: str = "Active", cardinality_estimate_bits: int = None, topper_traffic_only: bool = None, enable_slice_keys: int = 1, resolver_counter_guid: str = None, cross_guid1: str = None, cross_guid2: str = None, cross_guid3: str = None, balance_depth : int = None):
     """
     Create a new crosskey counter group in Trisul.
@@ -1001,7 +1889,37 @@ def create_crosskey_counter_group( context: str = "context0", name: str = None,
 
 
 
-@mcp.tool()
+def get_rag_embedding_model():
+    """Embedding model for rag_query, reused across queries until the embedding config in .env changes."""
+    global _rag_embedding
+    factory = LLMFactory(env_path=Path(__file__).resolve().parent / ".env", logging=logging)
+    config_key = (factory.embedding_provider, factory.embedding_model, factory.embedding_api_key)
+    if _rag_embedding is None or _rag_embedding[0] != config_key:
+        logging.info(f"[get_rag_embedding_model] Initializing embedding model {factory.embedding_model}")
+        _rag_embedding = (config_key, factory.get_embedding_llm())
+    return _rag_embedding[1], factory.embedding_model
+
+
+def get_rag_collection():
+    """ChromaDB collection of the knowledge base, opened once per server process."""
+    global _rag_collection
+    if _rag_collection is None:
+        logging.info("[get_rag_collection] Initializing ChromaDB client")
+        chroma_store = Path(__file__).resolve().parent / "chroma_store"
+        logging.info(f"[get_rag_collection] ChromaDB store path: {chroma_store}")
+
+        if not chroma_store.exists():
+            logging.warning(f"[get_rag_collection] ChromaDB store path does not exist: {chroma_store}")
+
+        import chromadb
+
+        chroma_client = chromadb.PersistentClient(path=str(chroma_store))
+        _rag_collection = chroma_client.get_or_create_collection("pdf_docs")
+        logging.info("[get_rag_collection] ChromaDB client initialized successfully")
+    return _rag_collection
+
+
+@traced_tool()
 def rag_query(question: str):
     """
     Perform a RAG (Retrieval-Augmented Generation) query using Gemini and ChromaDB.
@@ -1020,14 +1938,12 @@ def rag_query(question: str):
         # Embed query
         logging.info("[rag_query] Initializing Embedding Model via LLMFactory")
         try:
-            env_path = Path(__file__).resolve().parent / ".env"
-            factory = LLMFactory(env_path=env_path, logging=logging)
-            embedding_model = factory.get_embedding_llm()
+            embedding_model, embedding_model_name = get_rag_embedding_model()
             
             if not embedding_model:
                  return "Error: Embedding model not configured or API key missing. Please configure it using the CLI."
 
-            logging.info(f"[rag_query] Generating embedding for question using {factory.embedding_model}")
+            logging.info(f"[rag_query] Generating embedding for question using {embedding_model_name}")
             q_emb = embedding_model.embed_query(question)
             logging.info(f"[rag_query] Embedding generated successfully, dimension: {len(q_emb)}")
             
@@ -1037,16 +1953,7 @@ def rag_query(question: str):
 
         # Search in Chroma
         try:
-            logging.info("[rag_query] Initializing ChromaDB client")
-            CHROMA_STORE = Path(__file__).resolve().parent / "chroma_store"
-            logging.info(f"[rag_query] ChromaDB store path: {CHROMA_STORE}")
-            
-            if not CHROMA_STORE.exists():
-                logging.warning(f"[rag_query] ChromaDB store path does not exist: {CHROMA_STORE}")
-            
-            chroma_client = chromadb.PersistentClient(path=str(CHROMA_STORE))
-            collection = chroma_client.get_or_create_collection("pdf_docs")
-            logging.info("[rag_query] ChromaDB client initialized successfully")
+            collection = get_rag_collection()
         except Exception as e:
             logging.error(f"[rag_query] Error initializing ChromaDB: {str(e)}", exc_info=True)
             return f"Error: Failed to initialize ChromaDB - {str(e)}"
@@ -1117,10 +2024,14 @@ def rag_query(question: str):
 
 # UI related tools
 
-@mcp.tool()
-def show_line_chart(data, save_image: bool = False):
+@traced_tool()
+def show_line_chart(data: dict = None, save_image: bool = False, result_handle: str = None, series: List[dict] = None, title: str = None, y_label: str = None):
     """
     Plots a static traffic chart (line chart) using matplotlib based on the provided JSON-like input and show it in a new pop-up window.
+    Prefer plotting a get_key_traffic_data result by its resultHandle instead of copying the values into `data`:
+        show_line_chart(result_handle="r2", series=[{"column": "meter_1", "legend_label": "Upload"}, {"column": "meter_2", "legend_label": "Download"}], title="HTTPS Traffic")
+    Each series is {"column": "meter_N", "legend_label": str, "color": str, "multiplier": number, "result_handle": str}.
+    Use "multiplier": 8 for VT_RATE_COUNTER meters. Give a series its own result_handle to plot several keys in one chart.
     the input values should be in raw bytes format  not in mb or kb.
     the time stamps should be in epoc seconds format as integer not in the string date time format like this '2025-10-16 01:00:00'.
     It does not need any context name or the zmq_endpoint.
@@ -1143,8 +2054,16 @@ def show_line_chart(data, save_image: bool = False):
     
     logging.info(f"[show_line_chart] Generating the line chart for the given data")
     
+    if result_handle or series:
+        try:
+            data = line_chart_from_results(result_handle, series, title=title, y_label=y_label)
+        except (KeyError, ValueError) as e:
+            logging.error(f"[show_line_chart] Unable to build the chart from the cached results: {str(e)}")
+            return {"status": "error", "message": str(e), "message_to_llm": "Check the resultHandle and the meter columns with analyze_cached_results, or fetch the data again", "file_path": None}
         
     # Validate the input data
+    if data is None:
+        return {"status": "error", "message": "No chart data given", "message_to_llm": "Pass a result_handle of the fetched data, or the chart data", "file_path": None}
     if isinstance(data, str):
         try:
             data = ast.literal_eval(data)
@@ -1163,21 +2082,28 @@ def show_line_chart(data, save_image: bool = False):
             logging.error("[show_line_chart] Invalid line chart data format. The length of timestamps and values should be same.")
             return {"status": "error", "message" : "Invalid line chart data format from LLM, the length of timestamps and values should be same", "message_to_llm" : "Call this mcp tool (show_line_chart) again with the valid line chart data format. don't retry this more than 3 times in a row", "file_path": None}
 
+    # The client plots the chart from chart_data when it was built here from a result handle,
+    # otherwise from the data argument of the call
+    chart_data = data if (result_handle or series) else None
 
     # Save the chart as an image file if save_image is True
     if(save_image):
         file_path = f"/tmp/line_chart_{int(datetime.now().timestamp())}_{random.randint(1000, 9999)}.png"
         logging.info(f"[show_line_chart] save_image is set to True, so saving the chart as an image file instead of displaying it. path: {file_path}")
-        return {"status": "success", "message" : f"The line chart is saved as an image file successfully.", "file_path": file_path}
+        return {"status": "success", "message" : f"The line chart is saved as an image file successfully.", "file_path": file_path, "chart_data": chart_data}
     else:
-        return {"status": "success", "message" : f"The line chart is displayed in the pop-up window, tell the user to kindly check that. then show this data in the table format and give a short summary about the data.", "file_path": None}
+        return {"status": "success", "message" : f"The line chart is displayed in the pop-up window, tell the user to kindly check that. then show this data in the table format and give a short summary about the data.", "file_path": None, "chart_data": chart_data}
 
 
 
-@mcp.tool()
-def show_pie_chart(data, save_image: bool = False):
+@traced_tool()
+def show_pie_chart(data: dict = None, save_image: bool = False, result_handle: str = None, value_column: str = "metric", label_column: str = "label", multiplier: float = 1, limit: int = 10, chart_title: str = None, legend_title: str = None):
     """
     Plots a static traffic chart (pie chart) using matplotlib based on the provided JSON-like input and show it in a new pop-up window.
+    Prefer plotting a get_counter_group_topper result by its resultHandle instead of copying the values into `data`:
+        show_pie_chart(result_handle="r1", chart_title="Top Applications by Traffic", legend_title="Applications")
+    value_column (default metric), label_column (default label), multiplier (8 for VT_RATE_COUNTER meters) and limit
+    select the slices from the cached rows.
     
     Usage:
         To display pie chart to show the topper values for any counter group and meter.
@@ -1201,8 +2127,16 @@ def show_pie_chart(data, save_image: bool = False):
     """
     logging.info(f"[show_pie_chart] Generating the pie chart for the given data")
     
+    if result_handle:
+        try:
+            data = pie_chart_from_result(result_handle, value_column=value_column, label_column=label_column, multiplier=multiplier, limit=limit, chart_title=chart_title, legend_title=legend_title)
+        except (KeyError, ValueError) as e:
+            logging.error(f"[show_pie_chart] Unable to build the chart from the cached result: {str(e)}")
+            return {"status": "error", "message": str(e), "message_to_llm": "Check the resultHandle and the value column with analyze_cached_results, or fetch the data again", "file_path": None}
     
     # Validate the input data
+    if data is None:
+        return {"status": "error", "message": "No chart data given", "message_to_llm": "Pass a result_handle of the fetched data, or the chart data", "file_path": None}
     if isinstance(data, str):
         try:
             data = ast.literal_eval(data)
@@ -1220,18 +2154,19 @@ def show_pie_chart(data, save_image: bool = False):
         eval(str(v)) if isinstance(v, str) and "*" in v else v
         for v in data.get("volumes", [])
     ]
+    chart_data = data if result_handle else None
     
     if(save_image):
         file_path = f"/tmp/pie_chart_{int(datetime.now().timestamp())}_{random.randint(1000, 9999)}.png"
         logging.info(f"[show_pie_chart] save_image is set to True, so saving the chart as an image file instead of displaying it. path: {file_path}")
-        return {"status": "success", "message" : f"The pie chart is saved as an image file successfully.", "file_path": file_path}
+        return {"status": "success", "message" : f"The pie chart is saved as an image file successfully.", "file_path": file_path, "chart_data": chart_data}
     else:
         logging.info(f"[show_pie_chart] save_image is set to False, so displaying the chart in a pop-up window.")
-        return {"status": "success", "message" : f"The pie chart is displayed in the pop-up window, tell the user to kindly check that. then show this data in the table format and give a short summary about the data.", "file_path": None}
+        return {"status": "success", "message" : f"The pie chart is displayed in the pop-up window, tell the user to kindly check that. then show this data in the table format and give a short summary about the data.", "file_path": None, "chart_data": chart_data}
 
 
 
-@mcp.tool()
+@traced_tool()
 def generate_trisul_report(pages, filename: str, report_title: str, from_ts, to_ts):
     """
     Generate a multi-page PDF report with multiple tables or  traffic charts (one per page).
@@ -1241,7 +2176,17 @@ def generate_trisul_report(pages, filename: str, report_title: str, from_ts, to_
         pages (list[dict]): Each dict = {'title': str, 'subtitle': str, 'data': list[list[str]]}
             Each page should have a title, subtitle, and data.  Data can be either a table or a chart.
             For table pages, 'data' is a 2D list representing rows and columns.
-            For chart pages, 'data' is a dict with 'file_path' key pointing to the chart image file.
+            A table page can take its rows from a cached result instead of 'data':
+                {"type": "table", "title": str, "subtitle": str, "result_handle": "r1", "columns": ["readable", "metric"],
+                 "headers": ["Host", "Volume"], "byte_columns": ["metric"], "sort_by": "metric", "limit": 20}
+            byte_columns are shown in KB/MB/GB.
+            For chart pages, 'file_path' points to the chart image file of an earlier show_line_chart/show_pie_chart call.
+            A chart page can instead be drawn from cached results, without showing the chart first:
+                {"type": "chart", "title": str, "subtitle": str, "chart": "line", "result_handle": "r1",
+                 "series": [{"column": "meter_0", "legend_label": "Total", "color": "blue", "multiplier": 8}], "y_label": "bps"}
+                {"type": "chart", "title": str, "subtitle": str, "chart": "pie", "result_handle": "r2",
+                 "value_column": "metric", "label_column": "label", "limit": 10}
+            The charts of all pages are rendered in parallel.
         report_title (str): Title of the report to be displayed in the header of all pages. The title should be short and descriptive within 2-4 words.
         from_ts (int): Start timestamp of the report duration (epoch seconds).
         to_ts (int): End timestamp of the report duration (epoch seconds).
@@ -1287,142 +2232,127 @@ def generate_trisul_report(pages, filename: str, report_title: str, from_ts, to_
     else:
         pages = list(pages)
 
-    
-    styles = getSampleStyleSheet()
-    title_style = styles["Heading2"]
-    title_style.leftIndent = 0
-    title_style.spaceAfter = 10
 
-    subtitle_style = styles["Heading5"]
-    subtitle_style.leftIndent = 0
-    subtitle_style.spaceAfter = 20
-    subtitle_style.textColor = colors.HexColor("#800080")
+    filename = write_report(pages, filename, report_title, from_ts, to_ts)
 
 
-    filename = f"/tmp/{filename}"
-    
-    pdf = SimpleDocTemplate(
-        filename,
-        pagesize=A4,
-        leftMargin=10,
-        rightMargin=15,
-        topMargin=55,
-        bottomMargin=70,
-    )
+    logging.info(f"[generate_trisul_report] PDF report generated at {filename}")
 
-    # Header/footer rendering
-    def draw_header_footer(canvas, doc):
-        width, height = A4
+    return {"status": "success", "message" : f"The PDF report is generated successfully at {filename}. The report is displayed in the pop-up window, tell the user to kindly check that.", "file_path": filename}
 
-        # Header separator
-        canvas.setStrokeColor(colors.black)
-        canvas.line(15, height - 65, width - 15, height - 65)
-        
-        logo_path = Path(__file__).resolve().parent / "assets/logo_tlhs.png"
-        
-        duration_string = epoch_to_duration(from_ts, to_ts)
-        
-        
-        # Logo
-        try:
-            canvas.drawImage(logo_path, 14, height - 63, width=69, height=49, mask='auto')
-        except:
-            pass
-
-        # Header text
-        canvas.setFillColorRGB(0, 0, 0)
-        canvas.setFont("Helvetica", 14)
-        canvas.drawRightString(width - 15, height - 28, report_title)
-        canvas.setFont("Helvetica", 10)
-        canvas.drawRightString(width - 15, height - 44, duration_string)
-        canvas.drawRightString(width - 15, height - 58, f"Generated at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} +05:30")
-
-        # Footer line and text
-        canvas.line(15, 43, width - 15, 43)
-        canvas.setFont("Helvetica", 9)
-        canvas.setFillColor(colors.black)
-        canvas.drawString(15, 30, "ACME Inc")
-        canvas.drawCentredString(width / 2, 30, f"Page {doc.page}")
-        canvas.drawRightString(width - 15, 30, "Generated by Trisul Network Analytics (AI Edition)")
-
-    # Shared table style
-    base_table_style = TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#2880BA")),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 9),
-        ('GRID', (0, 0), (-1, -1), 0.25, colors.lightgrey),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.whitesmoke, colors.white]),
-    ])
-
-    elements = []
-    for i, page in enumerate(pages):
-        page_type = page.get("type", "")
-        title = page.get("title", "")
-        subtitle = page.get("subtitle", "")
-
-        # Add titles
-        elements.append(Spacer(1, 5))
-        elements.append(Paragraph(title, title_style))
-        elements.append(Paragraph(f"<font color='#800080'>{subtitle}</font>", subtitle_style))
-        elements.append(Spacer(1, 10))
-
-        if page_type == "table":
-            data = page.get("data", [])
-            if not data:
-                elements.append(Paragraph("<i>No table data available.</i>", styles["Normal"]))
-            else:
-                table = Table(
-                    data,
-                    repeatRows=1,
-                    colWidths=[1.5*inch, 1.3*inch, 0.8*inch, 1.1*inch, 1.1*inch, 1.1*inch, 0.8*inch],
-                )
-                table.setStyle(base_table_style)
-                elements.append(table)
-
-        elif page_type == "chart":
-            MAX_WIDTH = 6.5 * inch
-            MAX_HEIGHT = 4.0 * inch
-            
 
-            image_path = page.get("file_path")
-            if image_path:
-                try:
-                    # Read original image size
-                    img_reader = ImageReader(image_path)
-                    orig_w, orig_h = img_reader.getSize()
+@traced_tool()
+def generate_report_from_template(template: str, counter_group_guid: str, filename: str, report_title: str, meter: int = 0, duration_secs: int = 3600, max_count: int = 10, trend_meters: List[int] = None, multiplier: float = 1, y_label: str = None, bytes_metric: bool = True, context: str = "context0", zmq_endpoint: str = None):
+    """
+    Generate a PDF report from a predefined layout. The server runs the TRP queries itself (the key trends in parallel),
+    so no table rows or chart data have to be passed. Prefer this over generate_trisul_report when a template fits the request.
 
-                    # Compute scale factor while preserving aspect ratio
-                    scale_w = MAX_WIDTH / orig_w
-                    scale_h = MAX_HEIGHT / orig_h
-                    scale = min(scale_w, scale_h)
+    Templates:
+        top_keys: Top keys table and their share as a pie chart.
+        top_keys_with_trends: Top keys table, pie chart and the traffic trend of each top key (one chart per page),
+            e.g. "report of the top hosts with the trend of each host".
+
+    Args:
+        template (str): Template name, one of the templates above.
+        counter_group_guid (str): GUID of the counter group (e.g. Hosts, Apps).
+        filename (str): Output PDF file name.
+        report_title (str): Short title shown in the header of all pages (2-4 words).
+        meter (int): Meter the keys are ranked by.
+        duration_secs (int): Report duration in seconds, ending now.
+        max_count (int): Number of top keys, at most 20.
+        trend_meters (list[int]): Meters plotted in the trend charts, default the ranking meter.
+        multiplier (float): Multiplier of the trend values, e.g. 8 to plot a bytes meter in bits.
+        y_label (str): Y axis label of the trend charts, e.g. "bps".
+        bytes_metric (bool): Show the ranking metric in KB/MB/GB in the table.
+        context (str): Context name.
+        zmq_endpoint (str): ZMQ endpoint in the format "tcp://<ip_address>:<port>".
+
+    Example: generate_report_from_template("top_keys_with_trends", "{4CD742B1-C1CA-4708-BE78-0FCA2EB01A86}", "top_hosts_report.pdf", "Top Hosts", max_count=5, multiplier=8, y_label="bps")
+    """
+    logging.info(f"[generate_report_from_template] template={template}, counter_group_guid={counter_group_guid}, meter={meter}, duration_secs={duration_secs}, max_count={max_count}, trend_meters={trend_meters}")
 
-                    # Apply scaled dimensions
-                    new_w = orig_w * scale
-                    new_h = orig_h * scale
+    if template not in REPORT_TEMPLATES:
+        return {"status": "error", "message": f"Unknown report template '{template}'", "message_to_llm": f"Use one of the templates {list(REPORT_TEMPLATES)} or build the pages with generate_trisul_report", "file_path": None}
+    max_count = max(1, min(int(max_count), REPORT_TEMPLATE_MAX_KEYS))
 
-                    img = Image(image_path, width=new_w, height=new_h)
-                    elements.append(img)
-        
-        
-    
-                except Exception as e:
-                    elements.append(Paragraph(f"<i>Failed to load chart: {e}</i>", styles["Normal"]))
-            else:
-                elements.append(Paragraph("<i>No chart image path provided.</i>", styles["Normal"]))
+    try:
+        if not zmq_endpoint:
+            context = normalize_context(context)
+            zmq_endpoint = f"ipc:///usr/local/var/lib/trisul-hub/domain0/hub0/{context}/run/trp_0"
 
-        # Add page break except for the last page
-        if i < len(pages) - 1:
-            elements.append(PageBreak())
+        # One report window for all pages
+        req = trp_pb2.Message()
+        req.trp_command = req.TIMESLICES_REQUEST
+        req.time_slices_request.get_total_window = True
+        to_ts = get_response(zmq_endpoint, req).total_window.to.tv_sec
+        from_ts = to_ts - duration_secs
+
+        group_name = get_counter_group_meta(zmq_endpoint, counter_group_guid).get("name") or "Keys"
+        # The topper includes the group total (SYS:GROUP_TOTALS), it is not one of the keys
+        # Only the topper is kept in the result store, for follow-up questions. The pages are built from the
+        # query results themselves, so a full store cannot evict them before the report is written.
+        topper_handle, topper_result = query_counter_group_topper(zmq_endpoint, counter_group_guid, meter, duration_secs, max_count + 1)
+        top_keys = [r for r in result_to_rows(topper_result) if r.get("key") and not str(r["key"]).startswith("SYS:")][:max_count]
+    except Exception as e:
+        logging.error(f"[generate_report_from_template] Error querying the toppers: {str(e)}", exc_info=True)
+        return {"status": "error", "message": f"Unable to query the toppers: {str(e)}", "message_to_llm": "Check the counter group GUID and the endpoint, then try again", "file_path": None}
 
-    pdf.build(elements, onFirstPage=draw_header_footer, onLaterPages=draw_header_footer)
+    duration_string = epoch_to_duration(from_ts, to_ts)
+    top_keys.sort(key=lambda r: r.get("metric") if isinstance(r.get("metric"), (int, float)) else 0, reverse=True)
+    formatters = {"metric": TrisulAIUtils().bytes_to_human} if bytes_metric else {}
+    pages = [
+        {
+            "type": "table",
+            "title": f"Top {group_name}",
+            "subtitle": f"Top {len(top_keys)} {group_name} by meter {meter}, {duration_string}",
+            "data": rows_to_table(top_keys, ["readable", "label", "metric"], headers=[group_name, "Label", "Volume" if bytes_metric else "Metric"], formatters=formatters),
+        },
+        {
+            "type": "chart",
+            "chart": "pie",
+            "title": f"{group_name} Share",
+            "subtitle": f"Share of the top {len(top_keys)} {group_name}",
+            "data": {
+                "chart_title": f"Top {group_name}",
+                "legend_title": group_name,
+                "labels": [str(r.get("label") or r.get("readable") or r.get("key")) for r in top_keys],
+                "volumes": [r["metric"] if isinstance(r.get("metric"), (int, float)) else 0 for r in top_keys],
+            } if top_keys else None,
+        },
+    ]
 
+    warnings = []
+    if template == "top_keys_with_trends" and top_keys:
+        readables = [str(r.get("readable") or r.get("key")) for r in top_keys]
+        # The trend queries are independent, run them side by side, each keeps the trace context of this tool call
+        with ThreadPoolExecutor(max_workers=min(REPORT_TEMPLATE_QUERY_WORKERS, len(readables))) as pool:
+            futures = [
+                pool.submit(contextvars.copy_context().run, fetch_key_traffic_result, zmq_endpoint, counter_group_guid, readable, duration_secs, from_ts, to_ts)
+                for readable in readables
+            ]
+        series = [{"column": f"meter_{m}", "legend_label": f"Meter {m}", "multiplier": multiplier} for m in (trend_meters or [meter])]
+        for readable, future in zip(readables, futures):
+            try:
+                data = line_chart_from_results(None, series, title=f"{readable} Traffic", y_label=y_label, rows=result_to_rows(future.result()))
+            except Exception as e:
+                logging.warning(f"[generate_report_from_template] Trend of {readable} failed: {str(e)}")
+                warnings.append(f"trend of {readable}: {str(e)}")
+                continue
+            pages.append({
+                "type": "chart",
+                "chart": "line",
+                "title": f"{readable} Traffic",
+                "subtitle": f"Traffic trend of {readable}, {duration_string}",
+                "data": data,
+            })
 
-    logging.info(f"[generate_trisul_report] PDF report generated at {filename}")
+    filename = write_report(pages, filename, report_title, from_ts, to_ts)
+    logging.info(f"[generate_report_from_template] PDF report generated at {filename} with {len(pages)} pages")
 
-    return {"status": "success", "message" : f"The PDF report is generated successfully at {filename}. The report is displayed in the pop-up window, tell the user to kindly check that.", "file_path": filename}
+    message = f"The PDF report is generated successfully at {filename}. The report is displayed in the pop-up window, tell the user to kindly check that."
+    if warnings:
+        message += f" Some pages could not be filled: {'; '.join(warnings)}"
+    return {"status": "success", "message": message, "file_path": filename, "result_handles": {"toppers": topper_handle}}
 
 
 
@@ -1431,7 +2361,7 @@ def generate_trisul_report(pages, filename: str, report_title: str, from_ts, to_
 
 # AI Config tools
 
-@mcp.tool()
+@traced_tool()
 def configure_llm_model():
     """
     Manage and switch between different LLM models for Trisul AI integrations.
@@ -1444,7 +2374,7 @@ def configure_llm_model():
     logging.info(f"[configure_llm_model] Managing LLM model")
     return {"status": "success", "message" : f"The LLM model has been changed successfully."}
 
-@mcp.tool()
+@traced_tool()
 def configure_embedding_model():
     """
     Manage and switch between different Embedding models for Trisul AI integrations.
@@ -1457,7 +2387,7 @@ def configure_embedding_model():
     logging.info(f"[configure_embedding_model] Managing Embedding model")
     return {"status": "success", "message" : f"The Embedding model has been changed successfully."}
 
-@mcp.tool()
+@traced_tool()
 def configure_llm_api_key():
     """
     Change the API key for the current LLM provider.
@@ -1470,7 +2400,7 @@ def configure_llm_api_key():
     logging.info(f"[configure_llm_api_key] Changing LLM API key")
     return {"status": "success", "message" : f"The LLM API key has been changed successfully."}
 
-@mcp.tool()
+@traced_tool()
 def configure_embedding_api_key():
     """
     Change the API key for the current Embedding provider.
@@ -1484,7 +2414,7 @@ def configure_embedding_api_key():
     return {"status": "success", "message" : f"The Embedding API key has been changed successfully."}
 
 
-@mcp.tool()
+@traced_tool()
 def get_current_model_status():
     """
     Get the current model status for Trisul AI integrations.
@@ -1500,5 +2430,56 @@ def get_current_model_status():
 
 
 
+@mcp.tool()
+def get_trace_spans(trace_id: str):
+    """
+    Internal tool used by the CLI for its /stats command, not meant to be called by the assistant.
+    Returns the server side spans (tool calls, TRP round trips, conversions) recorded for a trace id.
+    """
+    return {"spans": tracer.spans(trace_id)}
+
+
+@mcp.tool()
+def export_results(handles: List[str]):
+    """
+    Internal tool used by the CLI to save the results behind result handles with a session, not meant to be called by the assistant.
+    """
+    return {"results": get_result_store().export(handles)}
+
+
+@mcp.tool()
+def restore_results(results: List[dict] = None, min_counter: int = 0):
+    """
+    Internal tool used by the CLI to put the results of a resumed session back under their handles, not meant to be called by the assistant.
+    They go into the result store of the calling MCP session, so resuming on the shared daemon never replaces the handles of another CLI.
+    """
+    get_result_store().restore(results or [], min_counter=min_counter)
+    logging.info(f"[restore_results] Restored {len(results or [])} results, handles continue after r{min_counter}")
+    return {"status": "success", "restored": len(results or [])}
+
+
 if __name__ == "__main__":
-    mcp.run(transport="stdio")
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Trisul MCP server")
+    parser.add_argument("--transport", choices=["stdio", "streamable-http"], default="stdio", help="stdio for a server owned by one CLI, streamable-http for a shared local daemon")
+    parser.add_argument("--host", default=DAEMON_DEFAULT_HOST, help="address the daemon listens on (streamable-http)")
+    parser.add_argument("--port", type=int, default=DAEMON_DEFAULT_PORT, help="port the daemon listens on (streamable-http)")
+    args = parser.parse_args()
+
+    if args.transport == "streamable-http":
+        import uvicorn
+
+        # The token comes from the CLI that starts the daemon, through the environment so it is not on the command line
+        token = os.environ.pop(DAEMON_TOKEN_ENV, None)
+        if not token:
+            parser.error(f"the streamable-http daemon needs the per-user token in {DAEMON_TOKEN_ENV}, start it with trisul_ai_cli --transport daemon")
+        mcp.settings.host = args.host
+        mcp.settings.port = args.port
+        logging.info(f"[main] Starting MCP daemon on http://{args.host}:{args.port}{mcp.settings.streamable_http_path}")
+        app = DaemonAuthMiddleware(mcp.streamable_http_app(), token, logging=logging)
+        daemon = uvicorn.Server(uvicorn.Config(app, host=args.host, port=args.port, log_level=mcp.settings.log_level.lower()))
+        app.server = daemon
+        daemon.run()
+    else:
+        mcp.run(transport=args.transport)
@@ -0,0 +1,88 @@
+import hashlib
+import hmac
+import json
+import os
+import secrets
+from pathlib import Path
+from urllib.parse import parse_qs
+
+
+# Per-user secret shared by the CLI and the daemon it started, readable by the user only
+DAEMON_TOKEN_PATH = Path.home() / ".trisul_ai_cli" / "daemon_token"
+DAEMON_TOKEN_ENV = "TRISUL_DAEMON_TOKEN"
+DAEMON_IDENTITY_PATH = "/daemon/identity"
+DAEMON_STOP_PATH = "/daemon/stop"
+
+
+def load_or_create_token(path=DAEMON_TOKEN_PATH):
+    """The user's daemon token, created with mode 0600 on first use."""
+    path = Path(path)
+    try:
+        return path.read_text().strip()
+    except FileNotFoundError:
+        pass
+
+    path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    token = secrets.token_urlsafe(32)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        # Another CLI created it first
+        return path.read_text().strip()
+    with os.fdopen(fd, "w") as file:
+        file.write(token)
+    return token
+
+
+def identity_proof(token, nonce):
+    """Proof that the daemon holds token, without sending the token to whoever listens on the port."""
+    return hmac.new(token.encode(), nonce.encode(), hashlib.sha256).hexdigest()
+
+
+class DaemonAuthMiddleware:
+    """ASGI middleware of the MCP daemon.
+
+    Every request needs the header "Authorization: Bearer <token>", except DAEMON_IDENTITY_PATH?nonce=...
+    which answers with the daemon's pid and identity_proof(token, nonce), so a CLI can check that the port
+    is held by its own daemon before it sends the token. An authorized POST to DAEMON_STOP_PATH stops the daemon.
+    """
+
+    def __init__(self, app, token, logging=None):
+        self.app = app
+        self.token = token
+        self.logging = logging
+        # uvicorn.Server, set once it is created, for DAEMON_STOP_PATH
+        self.server = None
+
+    async def _send_json(self, send, status, body):
+        payload = json.dumps(body).encode()
+        await send({"type": "http.response.start", "status": status, "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(payload)).encode())]})
+        await send({"type": "http.response.body", "body": payload})
+
+    def _authorized(self, scope):
+        header = dict(scope.get("headers") or []).get(b"authorization", b"").decode("latin-1")
+        return hmac.compare_digest(header, f"Bearer {self.token}")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        path = scope.get("path", "")
+        if path == DAEMON_IDENTITY_PATH:
+            nonce = (parse_qs(scope.get("query_string", b"").decode()).get("nonce") or [""])[0]
+            return await self._send_json(send, 200, {"pid": os.getpid(), "proof": identity_proof(self.token, nonce) if nonce else None})
+
+        if not self._authorized(scope):
+            if self.logging:
+                self.logging.warning(f"[DaemonAuthMiddleware] Rejected unauthenticated request to {path}")
+            return await self._send_json(send, 401, {"error": "unauthorized"})
+
+        if path == DAEMON_STOP_PATH and scope.get("method") == "POST":
+            if self.logging:
+                self.logging.info("[DaemonAuthMiddleware] Stop requested")
+            await self._send_json(send, 200, {"status": "stopping", "pid": os.getpid()})
+            if self.server:
+                self.server.should_exit = True
+            return
+
+        return await self.app(scope, receive, send)
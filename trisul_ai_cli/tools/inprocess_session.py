@@ -0,0 +1,70 @@
+import asyncio
+import importlib
+import json
+import threading
+
+from mcp.types import CallToolResult, ListToolsResult, TextContent
+
+from trisul_ai_cli.tools.tracing import TRACE_META_KEY, remote_trace_context
+
+
+class InProcessSession:
+    """Drop-in for the parts of mcp.ClientSession the client uses, backed by the FastMCP server in this process.
+
+    The server module is imported here and its tools are called directly, so tool results are not
+    serialized to JSON-RPC and piped between two processes. Most TRP tools are synchronous and block
+    on ZMQ, so the calls run on an event loop in a separate thread to keep the client loop responsive.
+    """
+
+    def __init__(self, server_module="trisul_ai_cli.server", logging=None):
+        self.server_module = server_module
+        self.logging = logging
+        self.mcp = None
+        self._loop = None
+        self._thread = None
+
+    async def initialize(self):
+        # Importing the server takes a while, do not block the client loop on it
+        module = await asyncio.to_thread(importlib.import_module, self.server_module)
+        self.mcp = module.mcp
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="trisul-mcp-inprocess", daemon=True)
+        self._thread.start()
+        if self.logging:
+            self.logging.info(f"[InProcessSession] Loaded MCP server {self.server_module} in process")
+
+    async def _run(self, coro):
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self._loop))
+
+    async def list_tools(self):
+        tools = await self._run(self.mcp.list_tools())
+        return ListToolsResult(tools=tools)
+
+    async def _call_tool(self, name, arguments, meta):
+        # There is no MCP request here, the trace context is handed to the server tools directly
+        remote_trace_context.set((meta or {}).get(TRACE_META_KEY))
+        return await self.mcp.call_tool(name, arguments)
+
+    async def call_tool(self, name, arguments=None, meta=None):
+        try:
+            result = await self._run(self._call_tool(name, arguments or {}, meta))
+        except Exception as e:
+            # Same shape as the error result the stdio server sends back
+            if self.logging:
+                self.logging.error(f"[InProcessSession] Error calling tool {name}: {e}")
+            return CallToolResult(content=[TextContent(type="text", text=str(e))], isError=True)
+
+        # Tools with an output schema return (content, structured_content)
+        if isinstance(result, tuple):
+            result = result[0]
+        if isinstance(result, dict):
+            result = [TextContent(type="text", text=json.dumps(result, indent=2))]
+        return CallToolResult(content=list(result))
+
+    async def aclose(self):
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            await asyncio.to_thread(self._thread.join, 5)
+            self._loop.close()
+            self._loop = None
@@ -0,0 +1,130 @@
+import atexit
+import hashlib
+import logging
+import logging.handlers
+import queue
+import reprlib
+
+from dotenv import dotenv_values
+
+
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+DEFAULT_MAX_MB = 10
+DEFAULT_BACKUP_COUNT = 3
+# Payloads (tool results, LLM responses) are cut to this many characters in the log
+PAYLOAD_LOG_CHARS = 500
+# The hash that matches repeated payloads covers this many leading characters, not a whole multi-MB result
+PAYLOAD_HASH_CHARS = 64 * 1024
+
+_listener = None
+
+
+class ModuleLevelFilter(logging.Filter):
+    """Per module log levels, e.g. {"server": WARNING}, other modules log at default_level.
+    Most of the code logs through the root logger, so records are matched on the source module
+    (client, server, utils ...) as well as on the logger name.
+    """
+
+    def __init__(self, levels, default_level=logging.INFO):
+        super().__init__()
+        self.levels = levels
+        self.default_level = default_level
+
+    def filter(self, record):
+        level = self.levels.get(record.module, self.levels.get(record.name, self.default_level))
+        return record.levelno >= level
+
+
+class _ThreadQueueHandler(logging.handlers.QueueHandler):
+    # The message is merged with its args here, while the args (tool arguments, memory diffs ...) are still
+    # as they were at the call. Large payloads are cut by log_payload before they get here. Timestamp and level formatting stay on the writer thread.
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def _bounded_repr(limit):
+    # Nested containers (tool arguments, memory diffs) are rendered only as far as the log line can show
+    bounded = reprlib.Repr()
+    bounded.maxlevel = 4
+    bounded.maxdict = bounded.maxlist = bounded.maxtuple = bounded.maxset = 20
+    bounded.maxstring = bounded.maxother = bounded.maxlong = limit
+    return bounded
+
+
+def log_payload(payload, limit=PAYLOAD_LOG_CHARS):
+    """Use as a %s argument for large payloads: the log gets the first `limit` characters, the full size and
+    a hash of the first PAYLOAD_HASH_CHARS, so repeated payloads can still be matched across lines.
+    The cut is made here on the calling thread at a cost bounded by limit, not by the size of the payload:
+    strings are sliced, other payloads are rendered with a bounded repr."""
+    if isinstance(payload, str):
+        if len(payload) <= limit:
+            return payload
+        text, size = payload[:PAYLOAD_HASH_CHARS], f"{len(payload)} chars"
+    else:
+        text = _bounded_repr(limit).repr(payload)
+        if len(text) <= limit:
+            return text
+        size = "truncated"
+    digest = hashlib.sha1(text.encode("utf-8", "replace")).hexdigest()[:12]
+    return f"{text[:limit]}... [{size}, sha1 {digest}]"
+
+
+def parse_module_levels(spec):
+    """Parse "server=WARNING,client=DEBUG" into {"server": 30, "client": 10}."""
+    levels = {}
+    for item in (spec or "").split(","):
+        if "=" not in item:
+            continue
+        module, level = (part.strip() for part in item.split("=", 1))
+        levels[module] = logging.getLevelName(level.upper()) if not level.isdigit() else int(level)
+    return {m: l for m, l in levels.items() if isinstance(l, int)}
+
+
+def setup_logging(log_path, level="INFO", module_levels=None, max_bytes=DEFAULT_MAX_MB * 1024 * 1024, backup_count=DEFAULT_BACKUP_COUNT):
+    """Route the root logger through a queue to a size capped, rotating log file written by a background thread.
+    Only the first call in a process takes effect (the in-process MCP server shares the client's log)."""
+    global _listener
+    root = logging.getLogger()
+    if _listener is not None:
+        return root
+
+    file_handler = logging.handlers.RotatingFileHandler(log_path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    base_level = logging.getLevelName(str(level).upper()) if not isinstance(level, int) else level
+    if not isinstance(base_level, int):
+        base_level = logging.INFO
+    module_levels = module_levels or {}
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = _ThreadQueueHandler(log_queue)
+    queue_handler.addFilter(ModuleLevelFilter(module_levels, default_level=base_level))
+
+    # The root level must let through the most verbose module, the filter drops the rest
+    root.setLevel(min([base_level, *module_levels.values()]))
+    root.addHandler(queue_handler)
+
+    _listener = logging.handlers.QueueListener(log_queue, file_handler)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return root
+
+
+def setup_logging_from_env(env_path, log_path):
+    """setup_logging with the TRISUL_LOG_* settings from .env:
+    TRISUL_LOG_LEVEL (INFO), TRISUL_LOG_LEVELS (server=WARNING,client=DEBUG), TRISUL_LOG_MAX_MB (10), TRISUL_LOG_BACKUPS (3)."""
+    config = dotenv_values(env_path)
+    try:
+        max_mb = float(config.get("TRISUL_LOG_MAX_MB") or DEFAULT_MAX_MB)
+        backup_count = int(config.get("TRISUL_LOG_BACKUPS") or DEFAULT_BACKUP_COUNT)
+    except ValueError:
+        max_mb, backup_count = DEFAULT_MAX_MB, DEFAULT_BACKUP_COUNT
+    return setup_logging(
+        log_path,
+        level=config.get("TRISUL_LOG_LEVEL") or "INFO",
+        module_levels=parse_module_levels(config.get("TRISUL_LOG_LEVELS")),
+        max_bytes=int(max_mb * 1024 * 1024),
+        backup_count=backup_count,
+    )
@@ -0,0 +1,76 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+
+# Prefetched results answer the follow-up asked within this many seconds, later ones query the hub again
+PREFETCH_TTL_SECS = 60
+# A follow-up whose prefetch is still running waits this long for it before querying the hub itself
+PREFETCH_WAIT_SECS = 15
+PREFETCH_BUDGET_WINDOW_SECS = 60
+
+
+class Prefetcher:
+    """Runs likely follow-up queries in the background and hands their results to the tool call that asks for them.
+
+    Queries are keyed by a tuple of the tool and its normalized arguments. At most `budget` queries are started
+    per PREFETCH_BUDGET_WINDOW_SECS, on `max_workers` threads, so prefetching never floods the hub. A result is
+    used once it is ready or, while its query is still running, by waiting for it instead of sending the same
+    query again. A result answers one call only and expires after ttl_secs, a failed prefetch is simply a miss.
+    """
+
+    def __init__(self, max_workers=2, budget=20, ttl_secs=PREFETCH_TTL_SECS, logging=None):
+        self.budget = budget
+        self.ttl_secs = ttl_secs
+        self.logging = logging
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="trisul-prefetch")
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._started = deque()
+        self.stats = {"submitted": 0, "skipped": 0, "hits": 0, "misses": 0}
+
+    def _expire(self, now):
+        for key in [k for k, (submitted_at, _) in self._entries.items() if now - submitted_at > self.ttl_secs]:
+            del self._entries[key]
+        while self._started and now - self._started[0] > PREFETCH_BUDGET_WINDOW_SECS:
+            self._started.popleft()
+
+    def submit(self, key, fn, *args):
+        """Start fn(*args) for key unless it is already prefetched or the budget is spent. Returns True when started."""
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            if key in self._entries:
+                return False
+            if len(self._started) >= self.budget:
+                self.stats["skipped"] += 1
+                return False
+            self._started.append(now)
+            self._entries[key] = (now, self._pool.submit(fn, *args))
+            self.stats["submitted"] += 1
+        return True
+
+    def take(self, key, wait_secs=PREFETCH_WAIT_SECS):
+        """The prefetched result for key, waiting for a running prefetch, or None."""
+        with self._lock:
+            self._expire(time.time())
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        try:
+            result = entry[1].result(timeout=wait_secs)
+        except FutureTimeoutError:
+            result = None
+        except Exception as e:
+            if self.logging:
+                self.logging.warning(f"[Prefetcher] Prefetch of {key} failed: {e}")
+            result = None
+
+        # A prefetched result answers one call, a repeated question (e.g. "refresh") queries the hub again
+        with self._lock:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+            self.stats["misses" if result is None else "hits"] += 1
+        return result
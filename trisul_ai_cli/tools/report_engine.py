@@ -0,0 +1,242 @@
+import os
+import random
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from datetime import datetime
+
+from trisul_ai_cli.tools.utils import RENDER_WORKERS, render_chart_file
+
+
+# Chart images only need to be sharp at their printed size (6.5 x 4 inch)
+REPORT_CHART_DPI = 150
+# Large tables are laid out in chunks of this many rows, each a separate Table with the header repeated,
+# created when the layout reaches it
+TABLE_CHUNK_ROWS = 300
+# Rows sampled to fit the column widths to the data
+COLUMN_WIDTH_SAMPLE_ROWS = 200
+TABLE_FONT = "Helvetica"
+TABLE_HEADER_FONT = "Helvetica-Bold"
+TABLE_FONT_SIZE = 9
+TABLE_CELL_PADDING = 12
+LOGO_FORM_NAME = "trisul_logo"
+
+# Report charts are drawn on threads of the MCP server process: render worker processes started with spawn
+# would re-run the server module and each open the log file and register the tools again. Agg Figures need no pyplot.
+# Agg draws mostly while holding the GIL, so the threads overlap the file writes but draw largely one after another.
+REPORT_RENDER_THREADS = RENDER_WORKERS
+
+
+def render_report_charts(jobs, logging):
+    """Render the chart images of a report on threads. This is not truly parallel, Agg holds the GIL for most
+    of the drawing, so a report with many charts takes about the sum of their render times.
+    jobs: list of (kind, data, file_path). Returns {file_path: error message} for the charts that failed."""
+    if not jobs:
+        return {}
+
+    errors = {}
+    with ThreadPoolExecutor(max_workers=min(REPORT_RENDER_THREADS, len(jobs)), thread_name_prefix="trisul-report-render") as pool:
+        futures = {pool.submit(render_chart_file, kind, data, file_path, REPORT_CHART_DPI): file_path for kind, data, file_path in jobs}
+        for future, file_path in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                logging.error(f"[report_engine] Chart {file_path} failed: {e}")
+                errors[file_path] = str(e)
+    return errors
+
+
+def fit_column_widths(data, available_width):
+    """Column widths proportional to the widest text of each column (header and sampled rows), filling available_width."""
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    columns = max(len(row) for row in data)
+    widths = [0.0] * columns
+    for row_index, row in enumerate(data[:COLUMN_WIDTH_SAMPLE_ROWS + 1]):
+        font = TABLE_HEADER_FONT if row_index == 0 else TABLE_FONT
+        for i, cell in enumerate(row):
+            widths[i] = max(widths[i], stringWidth(str(cell), font, TABLE_FONT_SIZE) + TABLE_CELL_PADDING)
+
+    total = sum(widths) or 1
+    return [w * available_width / total for w in widths]
+
+
+def table_flowables(data, available_width, table_style):
+    """Flowables of a table with fitted column widths, laid out in chunks of TABLE_CHUNK_ROWS rows, each a Table
+    starting with the header row. A chunk's Table is only created when the layout reaches it and its rows are
+    dropped once it is placed, so a huge table is never held as Table objects all at once."""
+    from reportlab.platypus import Flowable, Table
+
+    col_widths = fit_column_widths(data, available_width)
+    header, rows = data[0], deque(islice(data, 1, None))
+
+    class TableChunks(Flowable):
+        """The rows not laid out yet. It is never drawn itself: it asks for more than the space left, so the frame
+        splits it into the part of the next chunk that fits and the rest."""
+
+        def __init__(self):
+            super().__init__()
+            self._table = None
+
+        def wrap(self, available_width, available_height):
+            return available_width, available_height + 1
+
+        def split(self, available_width, available_height):
+            if self._table is None:
+                self._table = Table([header] + list(islice(rows, TABLE_CHUNK_ROWS)), repeatRows=1, colWidths=col_widths)
+                self._table.setStyle(table_style)
+            _, height = self._table.wrap(available_width, available_height)
+            parts = [self._table] if height <= available_height else self._table.split(available_width, available_height)
+            if not parts:
+                # Not even the header and one row fit, the chunk is tried again in the next frame
+                return []
+            for _ in range(min(TABLE_CHUNK_ROWS, len(rows))):
+                rows.popleft()
+            return parts + ([TableChunks()] if rows else [])
+
+    return [TableChunks()]
+
+
+def chart_file_path(kind):
+    return os.path.join(tempfile.gettempdir(), f"{kind}_chart_{int(datetime.now().timestamp())}_{random.randint(1000, 9999)}.png")
+
+
+def build_report(pages, filename, report_title, duration_string, logo_path, logging):
+    """Lay out the report pages into filename.
+
+    pages: list of {"type": "table", "title", "subtitle", "data": 2D list} or
+                   {"type": "chart", "title", "subtitle", "file_path": png} or
+                   {"type": "chart", "title", "subtitle", "chart": "line" | "pie", "data": chart data}
+    Chart pages with chart data are rendered first, in parallel. The header strings are computed once
+    and the logo is drawn once into a form XObject that every page reuses.
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import inch
+    from reportlab.lib.utils import ImageReader
+    from reportlab.platypus import SimpleDocTemplate, TableStyle, Paragraph, Spacer, PageBreak, Image
+    from reportlab.lib.styles import getSampleStyleSheet
+
+    # Render the chart images of all chart pages at once
+    jobs = []
+    for page in pages:
+        if page.get("type") == "chart" and page.get("chart") in ("line", "pie") and page.get("data") and not page.get("file_path"):
+            page["file_path"] = chart_file_path(page["chart"])
+            jobs.append((page["chart"], page["data"], page["file_path"]))
+    chart_errors = render_report_charts(jobs, logging)
+
+    styles = getSampleStyleSheet()
+    title_style = styles["Heading2"]
+    title_style.leftIndent = 0
+    title_style.spaceAfter = 10
+
+    subtitle_style = styles["Heading5"]
+    subtitle_style.leftIndent = 0
+    subtitle_style.spaceAfter = 20
+    subtitle_style.textColor = colors.HexColor("#800080")
+
+    pdf = SimpleDocTemplate(
+        filename,
+        pagesize=A4,
+        leftMargin=10,
+        rightMargin=15,
+        topMargin=55,
+        bottomMargin=70,
+    )
+
+    generated_at = f"Generated at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} +05:30"
+    logo_state = {"defined": False, "available": os.path.exists(logo_path)}
+
+    # Header/footer rendering
+    def draw_header_footer(canvas, doc):
+        width, height = A4
+
+        # Header separator
+        canvas.setStrokeColor(colors.black)
+        canvas.line(15, height - 65, width - 15, height - 65)
+
+        # Logo, the image is embedded once and every page refers to the same form
+        if logo_state["available"]:
+            try:
+                if not logo_state["defined"]:
+                    canvas.beginForm(LOGO_FORM_NAME)
+                    canvas.drawImage(str(logo_path), 14, height - 63, width=69, height=49, mask='auto')
+                    canvas.endForm()
+                    logo_state["defined"] = True
+                canvas.doForm(LOGO_FORM_NAME)
+            except Exception as e:
+                logging.warning(f"[report_engine] Unable to draw the logo: {e}")
+                logo_state["available"] = False
+
+        # Header text
+        canvas.setFillColorRGB(0, 0, 0)
+        canvas.setFont("Helvetica", 14)
+        canvas.drawRightString(width - 15, height - 28, report_title)
+        canvas.setFont("Helvetica", 10)
+        canvas.drawRightString(width - 15, height - 44, duration_string)
+        canvas.drawRightString(width - 15, height - 58, generated_at)
+
+        # Footer line and text
+        canvas.line(15, 43, width - 15, 43)
+        canvas.setFont("Helvetica", 9)
+        canvas.setFillColor(colors.black)
+        canvas.drawString(15, 30, "ACME Inc")
+        canvas.drawCentredString(width / 2, 30, f"Page {doc.page}")
+        canvas.drawRightString(width - 15, 30, "Generated by Trisul Network Analytics (AI Edition)")
+
+    # Shared table style
+    base_table_style = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#2880BA")),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), TABLE_HEADER_FONT),
+        ('FONTNAME', (0, 1), (-1, -1), TABLE_FONT),
+        ('FONTSIZE', (0, 0), (-1, -1), TABLE_FONT_SIZE),
+        ('GRID', (0, 0), (-1, -1), 0.25, colors.lightgrey),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.whitesmoke, colors.white]),
+    ])
+
+    MAX_WIDTH = 6.5 * inch
+    MAX_HEIGHT = 4.0 * inch
+
+    elements = []
+    for i, page in enumerate(pages):
+        page_type = page.get("type", "")
+
+        # Add titles
+        elements.append(Spacer(1, 5))
+        elements.append(Paragraph(page.get("title", ""), title_style))
+        elements.append(Paragraph(f"<font color='#800080'>{page.get('subtitle', '')}</font>", subtitle_style))
+        elements.append(Spacer(1, 10))
+
+        if page_type == "table":
+            # The page lets go of its rows, the table flowables drop them as they are laid out
+            data = page.pop("data", None) or []
+            if not data:
+                elements.append(Paragraph("<i>No table data available.</i>", styles["Normal"]))
+            else:
+                elements.extend(table_flowables(data, pdf.width, base_table_style))
+            del data
+
+        elif page_type == "chart":
+            image_path = page.get("file_path")
+            if image_path in chart_errors:
+                elements.append(Paragraph(f"<i>Failed to render chart: {chart_errors[image_path]}</i>", styles["Normal"]))
+            elif image_path:
+                try:
+                    # Scale to the page while preserving the aspect ratio
+                    orig_w, orig_h = ImageReader(image_path).getSize()
+                    scale = min(MAX_WIDTH / orig_w, MAX_HEIGHT / orig_h)
+                    elements.append(Image(image_path, width=orig_w * scale, height=orig_h * scale))
+                except Exception as e:
+                    elements.append(Paragraph(f"<i>Failed to load chart: {e}</i>", styles["Normal"]))
+            else:
+                elements.append(Paragraph("<i>No chart image path provided.</i>", styles["Normal"]))
+
+        # Add page break except for the last page
+        if i < len(pages) - 1:
+            elements.append(PageBreak())
+
+    pdf.build(elements, onFirstPage=draw_header_footer, onLaterPages=draw_header_footer)
+    return filename
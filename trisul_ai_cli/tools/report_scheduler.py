@@ -0,0 +1,319 @@
+import calendar
+import json
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+# Tools that are not replayed: terminal prompts, model status and answers the LLM reads but no report uses
+UNREPLAYED_TOOLS = {
+    "configure_llm_model", "configure_embedding_model", "configure_llm_api_key", "configure_embedding_api_key",
+    "get_current_model_status", "rag_query", "list_all_available_counter_groups", "get_cginfo_from_countergroup_name",
+}
+# Absolute time arguments, shifted by the whole schedule periods between recording and replay
+TIME_ARGUMENTS = ("start_ts", "end_ts", "from_ts", "to_ts")
+
+CRON_ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+}
+# (name, min, max) of the five cron fields
+CRON_FIELDS = [("minute", 0, 59), ("hour", 0, 23), ("day of month", 1, 31), ("month", 1, 12), ("day of week", 0, 6)]
+
+_HANDLE = re.compile(r"resultHandle\"?\s*:\s*\"?(r\d+)")
+
+
+def _value_pattern(value):
+    # A handle or path as a whole token: r1 does not match inside r12, a path not inside a longer path
+    return rf"(?<![\w/.]){re.escape(value)}(?!\w)"
+
+
+class CronSchedule:
+    """Five field cron expression (minute hour day-of-month month day-of-week) with *, */n, a-b, a-b/n and lists,
+    or one of @hourly, @daily, @weekly, @monthly. Day of week 0 (or 7) is Sunday. As in cron, when both day fields
+    are restricted a day matches either of them."""
+
+    def __init__(self, expression):
+        self.expression = expression.strip()
+        fields = CRON_ALIASES.get(self.expression, self.expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression '{expression}' must have 5 fields: minute hour day-of-month month day-of-week")
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            self._parse_field(field, name, low, 7 if name == "day of week" else high)
+            for field, (name, low, high) in zip(fields, CRON_FIELDS)
+        )
+        self.weekdays = {d % 7 for d in self.weekdays}
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+
+    @staticmethod
+    def _parse_field(field, name, low, high):
+        values = set()
+        for part in field.split(","):
+            step = 1
+            if "/" in part:
+                part, step_text = part.split("/", 1)
+                if not step_text.isdigit() or int(step_text) == 0:
+                    raise ValueError(f"Invalid step '{step_text}' in the {name} field")
+                step = int(step_text)
+            if part == "*":
+                start, end = low, high
+            elif "-" in part:
+                start_text, end_text = part.split("-", 1)
+                if not (start_text.isdigit() and end_text.isdigit()):
+                    raise ValueError(f"Invalid range '{part}' in the {name} field")
+                start, end = int(start_text), int(end_text)
+            elif part.isdigit():
+                start = end = int(part)
+                if step > 1:
+                    end = high
+            else:
+                raise ValueError(f"Invalid value '{part}' in the {name} field")
+            if start < low or end > high or start > end:
+                raise ValueError(f"'{part}' is out of range {low}-{high} in the {name} field")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, dt):
+        day = dt.day in self.days
+        weekday = (dt.isoweekday() % 7) in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def matches(self, dt):
+        return dt.minute in self.minutes and dt.hour in self.hours and dt.month in self.months and self._day_matches(dt)
+
+    def next_after(self, dt):
+        """First matching minute after dt (local naive datetime)."""
+        dt = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = dt + timedelta(days=366 * 5)
+        while dt < limit:
+            if dt.month not in self.months or not self._day_matches(dt):
+                dt = dt.replace(hour=0, minute=0) + timedelta(days=1)
+            elif dt.hour not in self.hours:
+                dt = dt.replace(minute=0) + timedelta(hours=1)
+            elif dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+            else:
+                return dt
+        raise ValueError(f"Cron expression '{self.expression}' never matches")
+
+    def period(self):
+        """Unit the runs repeat in: minute, hour, day, week (one weekday) or month (one day of the month)."""
+        if len(self.minutes) > 1:
+            return "minute"
+        if len(self.hours) > 1:
+            return "hour"
+        if self.any_weekday and not self.any_day and len(self.days) == 1:
+            return "month"
+        if self.any_day and not self.any_weekday and len(self.weekdays) == 1:
+            return "week"
+        return "day"
+
+    def _period_start(self, dt, period):
+        if period == "minute":
+            return dt.replace(second=0, microsecond=0)
+        if period == "hour":
+            return dt.replace(minute=0, second=0, microsecond=0)
+        day = dt.replace(hour=0, minute=0, second=0, microsecond=0)
+        if period == "week":
+            return day - timedelta(days=(dt.isoweekday() % 7 - next(iter(self.weekdays))) % 7)
+        if period == "month":
+            return day.replace(day=1)
+        return day
+
+    def time_shift(self, recorded_at, run_at):
+        """Function moving an epoch time of the recording to the run at run_at by the whole periods of the
+        schedule between them, in local time: a "yesterday" window recorded at 10:15 for a daily job covers
+        the day before each run, not the 24 hours before 10:15 of the run day."""
+        period = self.period()
+        recorded = self._period_start(datetime.fromtimestamp(recorded_at), period)
+        run = self._period_start(datetime.fromtimestamp(run_at), period)
+        if period == "month":
+            count = (run.year - recorded.year) * 12 + run.month - recorded.month
+        elif period in ("day", "week"):
+            count = (run.date() - recorded.date()).days // (7 if period == "week" else 1)
+        else:
+            count = round((run.timestamp() - recorded.timestamp()) / (60 if period == "minute" else 3600))
+
+        def shift(ts):
+            dt = datetime.fromtimestamp(ts)
+            if period == "month":
+                month = dt.month - 1 + count
+                year, month = dt.year + month // 12, month % 12 + 1
+                dt = dt.replace(year=year, month=month, day=min(dt.day, calendar.monthrange(year, month)[1]))
+            elif period in ("day", "week"):
+                dt += timedelta(days=count * (7 if period == "week" else 1))
+            else:
+                return int(ts) + count * (60 if period == "minute" else 3600)
+            return int(dt.timestamp())
+        return shift
+
+
+def step_outputs(tool_result):
+    """Values of a tool result that later tool calls can refer to: result handles and written file paths."""
+    outputs = {"result_handles": _HANDLE.findall(tool_result or "")}
+    try:
+        result = json.loads(tool_result)
+    except (TypeError, ValueError):
+        result = None
+    if isinstance(result, dict):
+        if result.get("file_path"):
+            outputs["file_path"] = result["file_path"]
+        outputs["result_handles"] += [h for h in (result.get("result_handles") or {}).values() if h not in outputs["result_handles"]]
+    return outputs
+
+
+def plan_dependencies(plan):
+    """For each step, the earlier steps whose handles or files its arguments use."""
+    dependencies = []
+    for i, step in enumerate(plan):
+        args_text = json.dumps(step["args"], default=str)
+        dependencies.append({
+            j for j, earlier in enumerate(plan[:i])
+            if any(re.search(_value_pattern(value), args_text) for value in _output_values(earlier.get("outputs")))
+        })
+    return dependencies
+
+
+def _output_values(outputs):
+    outputs = outputs or {}
+    return list(outputs.get("result_handles") or []) + ([outputs["file_path"]] if outputs.get("file_path") else [])
+
+
+def map_outputs(recorded, replayed):
+    """Recorded output value -> the value of the same output on replay."""
+    mapping = dict(zip((recorded or {}).get("result_handles") or [], (replayed or {}).get("result_handles") or []))
+    if (recorded or {}).get("file_path") and (replayed or {}).get("file_path"):
+        mapping[recorded["file_path"]] = replayed["file_path"]
+    return mapping
+
+
+def inline_data_steps(plan):
+    """Report pages and saved charts of a plan that carry their rows or series in `data` instead of a result handle.
+    A replay sends the recorded arguments again, so those pages would show the numbers of the recording day."""
+    found = []
+    for step in plan:
+        args = step["args"]
+        if step["tool"] == "generate_trisul_report":
+            pages = args.get("pages")
+            if isinstance(pages, str):
+                try:
+                    pages = json.loads(pages)
+                except ValueError:
+                    pages = []
+            titles = [
+                page.get("title") or f"page {i + 1}" for i, page in enumerate(pages or [])
+                if isinstance(page, dict) and page.get("data") and not page.get("result_handle")
+            ]
+            if titles:
+                found.append(f"generate_trisul_report pages {', '.join(repr(t) for t in titles)}")
+        # Chart windows are not replayed, only saved charts end up in a report
+        elif step["tool"] in ("show_line_chart", "show_pie_chart") and args.get("save_image") and args.get("data") and not (args.get("result_handle") or args.get("series")):
+            found.append(step["tool"])
+    return found
+
+
+def replay_args(args, substitutions, time_shift, run_stamp=None):
+    """Arguments of a recorded tool call for a replay: earlier outputs substituted, absolute times moved
+    by time_shift (see CronSchedule.time_shift) and the report file name suffixed with run_stamp."""
+    text = json.dumps(args, default=str)
+    if substitutions:
+        # One pass over all values, a replayed handle is never rewritten again as a recorded one
+        pattern = "|".join(_value_pattern(old) for old in sorted(substitutions, key=len, reverse=True))
+        text = re.sub(pattern, lambda m: substitutions[m.group(0)], text)
+    args = json.loads(text)
+    for name in TIME_ARGUMENTS:
+        if isinstance(args.get(name), (int, float)) or (isinstance(args.get(name), str) and args[name].isdigit()):
+            args[name] = time_shift(int(args[name]))
+    if run_stamp and isinstance(args.get("filename"), str):
+        stem, dot, extension = args["filename"].rpartition(".")
+        args["filename"] = f"{stem}_{run_stamp}.{extension}" if dot else f"{args['filename']}_{run_stamp}"
+    return args
+
+
+class ScheduledJobStore:
+    """Scheduled report jobs backed by SQLite: the cron expression, the recorded tool plan and the last run."""
+
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS scheduled_jobs (
+                name TEXT PRIMARY KEY,
+                cron TEXT NOT NULL,
+                query TEXT NOT NULL,
+                plan TEXT NOT NULL,
+                recorded_at INTEGER NOT NULL,
+                output_dir TEXT,
+                next_run INTEGER NOT NULL,
+                last_run INTEGER,
+                last_status TEXT,
+                last_output TEXT
+            )
+        """)
+        self._conn.commit()
+
+    @staticmethod
+    def _job(row):
+        job = dict(row)
+        job["plan"] = json.loads(job["plan"])
+        job["last_output"] = json.loads(job["last_output"]) if job["last_output"] else None
+        return job
+
+    def add(self, name, cron, query, plan, recorded_at, output_dir=None):
+        next_run = int(CronSchedule(cron).next_after(datetime.now()).timestamp())
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO scheduled_jobs (name, cron, query, plan, recorded_at, output_dir, next_run) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (name, cron, query, json.dumps(plan, default=str), int(recorded_at), output_dir, next_run),
+            )
+            self._conn.commit()
+        return next_run
+
+    def get(self, name):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM scheduled_jobs WHERE name = ?", (name,)).fetchone()
+        return self._job(row) if row else None
+
+    def list(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM scheduled_jobs ORDER BY next_run").fetchall()
+        return [self._job(row) for row in rows]
+
+    def remove(self, name):
+        with self._lock:
+            removed = self._conn.execute("DELETE FROM scheduled_jobs WHERE name = ?", (name,)).rowcount
+            self._conn.commit()
+        return bool(removed)
+
+    def due(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM scheduled_jobs WHERE next_run <= ? ORDER BY next_run", (int(now),)).fetchall()
+        return [self._job(row) for row in rows]
+
+    def record_run(self, name, status, output, started_at):
+        """Store the outcome of a run. A due job moves to its next time after the run started,
+        a job run by hand before it is due keeps its next time."""
+        job = self.get(name)
+        if job is None:
+            return None
+        next_run = job["next_run"]
+        if next_run <= started_at:
+            next_run = int(CronSchedule(job["cron"]).next_after(datetime.fromtimestamp(started_at)).timestamp())
+        with self._lock:
+            self._conn.execute(
+                "UPDATE scheduled_jobs SET last_run = ?, last_status = ?, last_output = ?, next_run = ? WHERE name = ?",
+                (int(started_at), status, json.dumps(output, default=str), next_run, name),
+            )
+            self._conn.commit()
+        return next_run
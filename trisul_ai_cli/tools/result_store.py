@@ -0,0 +1,297 @@
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+
+# Lists that hold the rows of the TRP responses, in order of preference
+_ROW_LIST_FIELDS = ["keys", "stats", "alerts", "sessions", "hits", "groupDetails"]
+
+_AGGREGATION_PATTERN = re.compile(r'^\s*(count|sum|avg|mean|min|max|median)\s*\(\s*(\*|[\w.]+)\s*\)\s*$', re.IGNORECASE)
+
+_FILTER_OPS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    ">": lambda a, b: a is not None and a > b,
+    ">=": lambda a, b: a is not None and a >= b,
+    "<": lambda a, b: a is not None and a < b,
+    "<=": lambda a, b: a is not None and a <= b,
+    "contains": lambda a, b: a is not None and str(b).lower() in str(a).lower(),
+    "startswith": lambda a, b: a is not None and str(a).lower().startswith(str(b).lower()),
+    "in": lambda a, b: a in b,
+}
+
+
+def _coerce(value):
+    """MessageToDict renders int64 as strings, turn numeric strings back into numbers."""
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            try:
+                return float(value)
+            except ValueError:
+                return value
+    return value
+
+
+def _flatten(record, prefix=""):
+    """Flatten one TRP record into a single level row.
+    KeyT values collapse to their readable form, timestamps to epoch seconds and
+    the per meter `values` array of key traffic stats to meter_0, meter_1 ...
+    """
+    row = {}
+    for name, value in record.items():
+        column = f"{prefix}{name}"
+        if isinstance(value, dict):
+            if "tvSec" in value:
+                row[column] = _coerce(value["tvSec"])
+            elif any(k in value for k in ("readable", "label", "key")):
+                row[column] = value.get("readable") or value.get("label") or value.get("key")
+            else:
+                row.update(_flatten(value, prefix=f"{column}_"))
+        elif isinstance(value, list):
+            if name == "values" and all(not isinstance(v, (dict, list)) for v in value):
+                for i, v in enumerate(value):
+                    row[f"{prefix}meter_{i}"] = _coerce(v)
+            else:
+                row[column] = json.dumps(value)
+        else:
+            row[column] = _coerce(value)
+    return row
+
+
+def result_to_rows(result):
+    """Extract the table of rows from a TRP tool result dict."""
+    if not isinstance(result, dict):
+        return []
+
+    candidates = [name for name in _ROW_LIST_FIELDS if isinstance(result.get(name), list)]
+    if not candidates:
+        candidates = [name for name, value in result.items() if isinstance(value, list) and value and isinstance(value[0], dict)]
+    if not candidates:
+        return [_flatten(result)]
+
+    return [_flatten(item) if isinstance(item, dict) else {"value": _coerce(item)} for item in result[candidates[0]]]
+
+
+def _aggregate(func, values):
+    values = [v for v in values if isinstance(v, (int, float)) and not isinstance(v, bool)]
+    if func == "count":
+        return len(values)
+    if not values:
+        return None
+    if func == "sum":
+        return sum(values)
+    if func in ("avg", "mean"):
+        return sum(values) / len(values)
+    if func == "min":
+        return min(values)
+    if func == "max":
+        return max(values)
+    if func == "median":
+        ordered = sorted(values)
+        middle = len(ordered) // 2
+        return ordered[middle] if len(ordered) % 2 else (ordered[middle - 1] + ordered[middle]) / 2
+    raise ValueError(f"Unsupported aggregation: {func}")
+
+
+def analyze_rows(rows, filters=None, group_by=None, aggregations=None, sort_by=None, descending=True, limit=None, columns=None):
+    """Filter, group, aggregate and sort a list of flat rows.
+
+    filters      : list of {"column": str, "op": one of ==, !=, >, >=, <, <=, contains, startswith, in, "value": any}
+    group_by     : list of column names
+    aggregations : list of expressions like "sum(meter_1)", "avg(metric)", "count(*)", output columns are named sum_meter_1 ...
+    sort_by      : column to sort by, can be an aggregation output column
+    columns      : columns to keep in the output rows
+    """
+    for f in filters or []:
+        column, op, value = f.get("column"), f.get("op", "=="), _coerce(f.get("value"))
+        if op not in _FILTER_OPS:
+            raise ValueError(f"Unsupported filter op '{op}', use one of {list(_FILTER_OPS)}")
+        if op == "in":
+            value = [_coerce(v) for v in (value if isinstance(value, list) else [value])]
+        rows = [r for r in rows if _FILTER_OPS[op](r.get(column), value)]
+
+    parsed_aggregations = []
+    for expr in aggregations or []:
+        m = _AGGREGATION_PATTERN.match(expr)
+        if not m:
+            raise ValueError(f"Invalid aggregation '{expr}', expected the form sum(column), avg(column), count(*)")
+        func, column = m.group(1).lower(), m.group(2)
+        out_name = "count" if column == "*" else f"{func}_{column}"
+        parsed_aggregations.append((out_name, func, column))
+
+    if group_by or parsed_aggregations:
+        group_by = group_by or []
+        groups = OrderedDict()
+        for r in rows:
+            groups.setdefault(tuple(r.get(c) for c in group_by), []).append(r)
+
+        grouped_rows = []
+        for group_key, members in groups.items():
+            out = dict(zip(group_by, group_key))
+            if not parsed_aggregations:
+                out["count"] = len(members)
+            for out_name, func, column in parsed_aggregations:
+                if column == "*":
+                    out[out_name] = len(members)
+                else:
+                    out[out_name] = _aggregate(func, [m.get(column) for m in members])
+            grouped_rows.append(out)
+        rows = grouped_rows
+
+    if sort_by:
+        present = [r for r in rows if r.get(sort_by) is not None]
+        missing = [r for r in rows if r.get(sort_by) is None]
+        rows = sorted(present, key=lambda r: r[sort_by], reverse=descending) + missing
+
+    if columns:
+        rows = [{c: r.get(c) for c in columns} for r in rows]
+
+    if limit:
+        rows = rows[:int(limit)]
+
+    return rows
+
+
+def rows_to_series(rows, column, time_column="tsTvSec", multiplier=1):
+    """Timestamps and values of one numeric column of time series rows (key traffic stats), in time order."""
+    points = sorted(
+        (r[time_column], r[column]) for r in rows
+        if isinstance(r.get(time_column), (int, float)) and isinstance(r.get(column), (int, float))
+    )
+    return [ts for ts, _ in points], [value * multiplier for _, value in points]
+
+
+def rows_to_table(rows, columns, headers=None, formatters=None):
+    """2D list (header row first) of the given columns, formatters maps a column to a function applied to its values."""
+    formatters = formatters or {}
+    table = [list(headers or columns)]
+    for r in rows:
+        table.append([
+            formatters[c](r.get(c)) if c in formatters and isinstance(r.get(c), (int, float)) else ("" if r.get(c) is None else str(r.get(c)))
+            for c in columns
+        ])
+    return table
+
+
+class ResultStore:
+    """In-process cache of the last N TRP tool results, keyed by tool name and normalized query arguments.
+
+    Each result gets a short handle (r1, r2 ...) that is handed to the LLM with the tool output,
+    follow-up questions are answered from the cached rows without another hub round trip.
+    """
+
+    def __init__(self, max_entries=20):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._handles = {}
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _query_key(tool_name, query_args):
+        args = {k: v for k, v in (query_args or {}).items() if v is not None}
+        return f"{tool_name}:{json.dumps(args, sort_keys=True, default=str)}"
+
+    def put(self, tool_name, query_args, result):
+        query_key = self._query_key(tool_name, query_args)
+        with self._lock:
+            handle = self._handles.get(query_key)
+            if handle is None:
+                self._counter += 1
+                handle = f"r{self._counter}"
+                self._handles[query_key] = handle
+
+            self._entries.pop(handle, None)
+            self._entries[handle] = {
+                "handle": handle,
+                "tool": tool_name,
+                "query": {k: v for k, v in (query_args or {}).items() if v is not None},
+                "result": result,
+                "rows": None,
+                "stored_at": int(time.time()),
+                "query_key": query_key,
+            }
+
+            while len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._handles.pop(evicted["query_key"], None)
+
+        return handle
+
+    def export(self, handles):
+        """Stored entries of the given handles (tool, query and raw result), for saving with a session."""
+        with self._lock:
+            return [
+                {"handle": e["handle"], "tool": e["tool"], "query": e["query"], "result": e["result"], "stored_at": e["stored_at"]}
+                for e in (self._entries.get(h) for h in handles) if e is not None
+            ]
+
+    def restore(self, entries, min_counter=0):
+        """Put saved entries back under their original handles, replacing any entry under the same handle, so the
+        store must belong to the client that resumes. New results get handles after min_counter and after the
+        restored ones, so they never take a restored handle."""
+        with self._lock:
+            self._counter = max(self._counter, int(min_counter))
+            for entry in entries:
+                handle = entry["handle"]
+                query_key = self._query_key(entry["tool"], entry["query"])
+                old = self._entries.pop(handle, None)
+                if old and self._handles.get(old["query_key"]) == handle:
+                    self._handles.pop(old["query_key"], None)
+                self._entries[handle] = {
+                    "handle": handle,
+                    "tool": entry["tool"],
+                    "query": entry["query"],
+                    "result": entry["result"],
+                    "rows": None,
+                    "stored_at": entry.get("stored_at", int(time.time())),
+                    "query_key": query_key,
+                }
+                self._handles.setdefault(query_key, handle)
+                if handle[1:].isdigit():
+                    self._counter = max(self._counter, int(handle[1:]))
+
+            while len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                if self._handles.get(evicted["query_key"]) == evicted["handle"]:
+                    self._handles.pop(evicted["query_key"], None)
+
+    def get(self, handle):
+        with self._lock:
+            entry = self._entries.get(handle)
+            if entry is not None:
+                self._entries.move_to_end(handle)
+            return entry
+
+    @staticmethod
+    def _entry_rows(entry):
+        if entry["rows"] is None:
+            entry["rows"] = result_to_rows(entry["result"])
+        return entry["rows"]
+
+    def rows(self, handle):
+        entry = self.get(handle)
+        if entry is None:
+            raise KeyError(f"Unknown result handle '{handle}'")
+        return self._entry_rows(entry)
+
+    def describe(self):
+        """Summary of the cached results for the LLM, most recent first."""
+        with self._lock:
+            entries = list(self._entries.values())
+
+        summary = []
+        for entry in reversed(entries):
+            rows = self._entry_rows(entry)
+            summary.append({
+                "resultHandle": entry["handle"],
+                "tool": entry["tool"],
+                "query": json.dumps(entry["query"], default=str),
+                "row_count": len(rows),
+                "columns": ",".join(rows[0].keys()) if rows else "",
+            })
+        return summary
@@ -0,0 +1,140 @@
+import csv
+import heapq
+from collections import Counter
+
+
+SESSION_COLUMNS = [
+    "session_id", "session_key", "start_ts", "end_ts", "protocol",
+    "source_ip", "source_port", "dest_ip", "dest_port",
+    "az_bytes", "za_bytes", "total_bytes", "az_packets", "za_packets",
+    "az_payload", "za_payload", "setup_rtt", "retransmissions",
+    "nf_routerid", "nf_ifindex_in", "nf_ifindex_out", "tags", "probe_id",
+]
+
+_INT_COLUMNS = {
+    "start_ts", "end_ts", "az_bytes", "za_bytes", "total_bytes", "az_packets", "za_packets",
+    "az_payload", "za_payload", "setup_rtt", "retransmissions",
+}
+
+
+def _key_text(key):
+    """Readable value of a TRP KeyT, falling back to the internal key."""
+    return key.readable or key.label or key.key
+
+
+def session_to_row(session):
+    """Flatten a TRP SessionT protobuf into a row ordered as SESSION_COLUMNS."""
+    start_ts = getattr(session.time_interval, 'from').tv_sec
+    return [
+        session.session_id,
+        session.session_key,
+        start_ts,
+        session.time_interval.to.tv_sec,
+        _key_text(session.protocol),
+        _key_text(session.key1A),
+        _key_text(session.key2A),
+        _key_text(session.key1Z),
+        _key_text(session.key2Z),
+        session.az_bytes,
+        session.za_bytes,
+        session.az_bytes + session.za_bytes,
+        session.az_packets,
+        session.za_packets,
+        session.az_payload,
+        session.za_payload,
+        session.setup_rtt,
+        session.retransmissions,
+        _key_text(session.nf_routerid),
+        _key_text(session.nf_ifindex_in),
+        _key_text(session.nf_ifindex_out),
+        session.tags,
+        session.probe_id,
+    ]
+
+
+class SessionFileWriter:
+    """Append-only writer for exported sessions.
+
+    Rows are written in chunks as they arrive from the hub, so only one chunk is held in memory.
+    CSV is always available, Parquet needs the optional pyarrow package.
+    A small summary (row count, volume, top talkers) is accumulated on the way for the LLM.
+    """
+
+    def __init__(self, file_path, file_format="csv", logging=None, top_n=5):
+        self.file_path = file_path
+        self.file_format = file_format
+        self.logging = logging
+        self.top_n = top_n
+        self.row_count = 0
+        self.total_bytes = 0
+        self.first_ts = None
+        self.last_ts = None
+        self.source_bytes = Counter()
+        self.dest_bytes = Counter()
+        self.dest_port_bytes = Counter()
+        self._file = None
+        self._csv_writer = None
+        self._parquet_writer = None
+        self._pa = None
+
+        if file_format == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            self._pa = pa
+            schema = pa.schema([
+                (name, pa.int64() if name in _INT_COLUMNS else pa.string())
+                for name in SESSION_COLUMNS
+            ])
+            self._parquet_writer = pq.ParquetWriter(file_path, schema)
+        else:
+            self._file = open(file_path, "w", newline="")
+            self._csv_writer = csv.writer(self._file)
+            self._csv_writer.writerow(SESSION_COLUMNS)
+
+    def write_rows(self, rows):
+        if not rows:
+            return
+
+        for row in rows:
+            record = dict(zip(SESSION_COLUMNS, row))
+            self.total_bytes += record["total_bytes"]
+            self.source_bytes[record["source_ip"]] += record["total_bytes"]
+            self.dest_bytes[record["dest_ip"]] += record["total_bytes"]
+            self.dest_port_bytes[record["dest_port"]] += record["total_bytes"]
+            if self.first_ts is None or record["start_ts"] < self.first_ts:
+                self.first_ts = record["start_ts"]
+            if self.last_ts is None or record["end_ts"] > self.last_ts:
+                self.last_ts = record["end_ts"]
+
+        if self._parquet_writer:
+            columns = list(zip(*rows))
+            table = self._pa.table({name: list(values) for name, values in zip(SESSION_COLUMNS, columns)}, schema=self._parquet_writer.schema)
+            self._parquet_writer.write_table(table)
+        else:
+            self._csv_writer.writerows(rows)
+            self._file.flush()
+
+        self.row_count += len(rows)
+
+    def close(self):
+        if self._parquet_writer:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def summary(self):
+        def top(counter):
+            return [{"key": k, "bytes": v} for k, v in heapq.nlargest(self.top_n, counter.items(), key=lambda kv: kv[1])]
+
+        return {
+            "row_count": self.row_count,
+            "total_bytes": self.total_bytes,
+            "first_session_ts": self.first_ts,
+            "last_session_ts": self.last_ts,
+            "top_source_ips": top(self.source_bytes),
+            "top_dest_ips": top(self.dest_bytes),
+            "top_dest_ports": top(self.dest_port_bytes),
+        }
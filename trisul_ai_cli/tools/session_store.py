@@ -0,0 +1,151 @@
+import getpass
+import json
+import re
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+
+from langchain_core.messages import messages_to_dict, messages_from_dict
+
+
+# Turns loaded when a session is resumed, and turns paged in by each /history
+SESSION_RESUME_TURNS = 5
+
+_HANDLE = re.compile(r"(?<![\w/.])r(\d+)(?!\w)")
+
+
+def _pack(value):
+    return zlib.compress(json.dumps(value, separators=(",", ":"), default=str).encode("utf-8"))
+
+
+def _unpack(blob):
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+def handles_in(value):
+    """Result handles (r1, r2 ...) mentioned anywhere in value, as {handle: number}."""
+    text = value if isinstance(value, str) else json.dumps(value, default=str)
+    return {f"r{n}": int(n) for n in _HANDLE.findall(text)}
+
+
+class SessionStore:
+    """Conversations of one user in SQLite, so an investigation can be resumed later.
+
+    A session keeps its messages one row each, numbered by turn, and the stored results behind the result
+    handles its tool calls returned. Messages and results are zlib compressed JSON. Resuming loads only the
+    last turns, older turns are read when they are paged in, and results are read per handle when a tool
+    call refers to them, so the hub queries are not run again.
+    """
+
+    def __init__(self, db_path, user=None):
+        self.db_path = str(db_path)
+        self.user = user or getpass.getuser()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                user TEXT NOT NULL,
+                title TEXT NOT NULL,
+                created_at INTEGER NOT NULL,
+                updated_at INTEGER NOT NULL,
+                turns INTEGER NOT NULL DEFAULT 0,
+                max_handle INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS sessions_user ON sessions (user, updated_at);
+            CREATE TABLE IF NOT EXISTS session_messages (
+                session_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                turn INTEGER NOT NULL,
+                message BLOB NOT NULL,
+                PRIMARY KEY (session_id, seq)
+            );
+            CREATE INDEX IF NOT EXISTS session_messages_turn ON session_messages (session_id, turn);
+            CREATE TABLE IF NOT EXISTS session_results (
+                session_id TEXT NOT NULL,
+                handle TEXT NOT NULL,
+                result BLOB NOT NULL,
+                PRIMARY KEY (session_id, handle)
+            );
+        """)
+        self._conn.commit()
+
+    def create(self, title):
+        session_id = uuid.uuid4().hex[:8]
+        now = int(time.time())
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO sessions (session_id, user, title, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (session_id, self.user, title[:200], now, now),
+            )
+            self._conn.commit()
+        return session_id
+
+    def get(self, session_id=None):
+        """A session of this user by id, or the most recent one when session_id is None."""
+        with self._lock:
+            if session_id is None:
+                row = self._conn.execute("SELECT * FROM sessions WHERE user = ? ORDER BY updated_at DESC LIMIT 1", (self.user,)).fetchone()
+            else:
+                row = self._conn.execute("SELECT * FROM sessions WHERE user = ? AND session_id = ?", (self.user, session_id)).fetchone()
+        return dict(row) if row else None
+
+    def list(self, limit=20):
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM sessions WHERE user = ? ORDER BY updated_at DESC LIMIT ?", (self.user, limit)).fetchall()
+        return [dict(row) for row in rows]
+
+    def add_turn(self, session_id, messages, results):
+        """Append the messages of one turn and the results behind its new handles. Returns the turn number."""
+        with self._lock:
+            with self._conn:
+                turns, max_handle = self._conn.execute("SELECT turns, max_handle FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+                seq = self._conn.execute("SELECT COALESCE(MAX(seq), -1) + 1 FROM session_messages WHERE session_id = ?", (session_id,)).fetchone()[0]
+                turn = turns + 1
+                message_dicts = messages_to_dict(messages)
+                self._conn.executemany(
+                    "INSERT INTO session_messages (session_id, seq, turn, message) VALUES (?, ?, ?, ?)",
+                    [(session_id, seq + i, turn, _pack(message)) for i, message in enumerate(message_dicts)],
+                )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO session_results (session_id, handle, result) VALUES (?, ?, ?)",
+                    [(session_id, entry["handle"], _pack(entry)) for entry in results],
+                )
+                # Handles the tool results mentioned, also the ones the server no longer had to export
+                tool_contents = [m["data"]["content"] for m in message_dicts if m["type"] == "tool"]
+                max_handle = max([max_handle] + list(handles_in(tool_contents + [entry["handle"] for entry in results]).values()))
+                self._conn.execute(
+                    "UPDATE sessions SET turns = ?, max_handle = ?, updated_at = ? WHERE session_id = ?",
+                    (turn, max_handle, int(time.time()), session_id),
+                )
+        return turn
+
+    def load_turns(self, session_id, before_turn, count=SESSION_RESUME_TURNS):
+        """Messages of the count turns before before_turn, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT message FROM session_messages WHERE session_id = ? AND turn >= ? AND turn < ? ORDER BY seq",
+                (session_id, before_turn - count, before_turn),
+            ).fetchall()
+        return messages_from_dict([_unpack(row[0]) for row in rows])
+
+    def result_handles(self, session_id):
+        with self._lock:
+            rows = self._conn.execute("SELECT handle FROM session_results WHERE session_id = ?", (session_id,)).fetchall()
+        return {row[0] for row in rows}
+
+    def load_results(self, session_id, handles):
+        """Stored result entries of the given handles, as the server's export_results returned them."""
+        handles = list(handles)
+        if not handles:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT result FROM session_results WHERE session_id = ? AND handle IN ({','.join('?' * len(handles))})",
+                [session_id] + handles,
+            ).fetchall()
+        return [_unpack(row[0]) for row in rows]
@@ -0,0 +1,117 @@
+"""Startup import time benchmark for the Trisul AI CLI.
+
+Runs each entry module in a fresh interpreter with `python -X importtime`, adds up the
+cumulative import time of the top level imports and compares it with STARTUP_BUDGET_MS.
+
+    python -m trisul_ai_cli.tools.startup_benchmark [--runs 5] [--top 10]
+
+Exits with status 1 when a module goes over its budget, so it can be used as a release check.
+"""
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+
+
+# Import time budget per entry module in milliseconds (median over the runs).
+# Keep these tight, raise them only together with the change that needs it.
+STARTUP_BUDGET_MS = {
+    "trisul_ai_cli.cli": 120,
+    "trisul_ai_cli.client": 1500,
+    "trisul_ai_cli.server": 1500,
+}
+
+# Modules that must never be imported at startup, they are loaded on first use
+LAZY_MODULES = [
+    "chromadb",
+    "reportlab",
+    "matplotlib",
+    "langchain_google_genai",
+    "langchain_openai",
+    "langchain_anthropic",
+    "langchain_community",
+]
+
+_IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$')
+
+
+def parse_importtime(stderr):
+    """Parse `-X importtime` output into a list of (module, self_us, cumulative_us, depth)."""
+    entries = []
+    for line in stderr.splitlines():
+        m = _IMPORTTIME_LINE.match(line)
+        if m:
+            self_us, cumulative_us, indent, module = m.groups()
+            entries.append((module, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return entries
+
+
+def measure(module):
+    """Import `module` in a fresh interpreter, returns (total_ms, entries)."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    entries = parse_importtime(proc.stderr)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{proc.stderr[-2000:]}")
+    total_us = sum(cumulative for _, _, cumulative, depth in entries if depth == 0)
+    return total_us / 1000, entries
+
+
+def run_benchmark(modules=None, runs=5, top=10):
+    modules = modules or list(STARTUP_BUDGET_MS)
+    report = []
+    for module in modules:
+        timings = []
+        entries = []
+        for _ in range(runs):
+            total_ms, entries = measure(module)
+            timings.append(total_ms)
+
+        imported = {name.split(".")[0] for name, _, _, _ in entries}
+        # Direct imports of the entry module (and of its package) are the ones worth looking at
+        slowest = sorted(
+            ((name, cumulative / 1000) for name, _, cumulative, depth in entries if depth == 1),
+            key=lambda kv: kv[1],
+            reverse=True,
+        )[:top]
+        budget = STARTUP_BUDGET_MS.get(module)
+        median_ms = statistics.median(timings)
+        report.append({
+            "module": module,
+            "median_ms": round(median_ms, 1),
+            "min_ms": round(min(timings), 1),
+            "budget_ms": budget,
+            "over_budget": budget is not None and median_ms > budget,
+            "eager_lazy_modules": sorted(imported.intersection(LAZY_MODULES)),
+            "slowest_imports": slowest,
+        })
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the startup import time of the Trisul AI CLI")
+    parser.add_argument("modules", nargs="*", help="modules to measure (default: all modules with a budget)")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreter runs per module")
+    parser.add_argument("--top", type=int, default=10, help="number of slowest direct imports to show")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for result in run_benchmark(args.modules, runs=args.runs, top=args.top):
+        status = "OVER BUDGET" if result["over_budget"] else "ok"
+        budget = f"{result['budget_ms']} ms" if result["budget_ms"] is not None else "none"
+        print(f"{result['module']}: median {result['median_ms']} ms, min {result['min_ms']} ms, budget {budget} [{status}]")
+        for name, ms in result["slowest_imports"]:
+            print(f"    {ms:8.1f} ms  {name}")
+        if result["eager_lazy_modules"]:
+            print(f"    imported at startup but expected lazy: {', '.join(result['eager_lazy_modules'])}")
+        failed = failed or result["over_budget"] or bool(result["eager_lazy_modules"])
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+import copy
+import re
+import weakref
+from collections import Counter
+
+
+# Tools bound on every call, most questions go through the counter groups and the cached results
+CORE_TOOLS = [
+    "list_all_available_counter_groups",
+    "get_cginfo_from_countergroup_name",
+    "get_counter_group_topper",
+    "get_key_traffic_data",
+    "analyze_cached_results",
+    "rag_query",
+]
+
+# Words users ask with that the tool descriptions do not (all) contain
+TOOL_KEYWORDS = {
+    "get_counter_group_topper": ["top", "toppers", "busiest", "most", "highest", "heaviest", "ranking"],
+    "get_key_traffic_data": ["trend", "history", "usage", "bandwidth", "volume"],
+    "get_alerts_data": ["alert", "alerts", "ids", "signature", "sigid", "attack", "malware", "threat", "intrusion", "blacklist", "badfellas", "suricata", "snort", "suspicious", "anomaly", "anomalous", "unusual", "security", "incident"],
+    "get_flows_or_sessions_data": ["flow", "flows", "session", "sessions", "connection", "connections", "conversation", "talking", "communicated", "between", "talk", "talked", "contacted", "reached", "connected", "peer", "peers"],
+    "export_flows_or_sessions_to_file": ["export", "csv", "dump", "download", "file"],
+    "get_key_space_range": ["range", "subnet", "active", "scan", "keyspace"],
+    "create_crosskey_counter_group": ["crosskey", "cross", "combine", "combined", "create"],
+    "rag_query": ["docs", "documentation", "manual", "configure"],
+    "show_line_chart": ["chart", "graph", "plot", "line", "trend", "visualize", "draw", "image"],
+    "show_pie_chart": ["chart", "graph", "pie", "share", "distribution", "breakdown", "visualize", "image"],
+    "generate_trisul_report": ["report", "pdf", "document", "summary"],
+    "generate_report_from_template": ["report", "pdf", "document", "summary"],
+    "configure_llm_model": ["model", "llm", "change", "switch"],
+    "configure_embedding_model": ["embedding", "embeddings"],
+    "configure_llm_api_key": ["api", "apikey"],
+    "configure_embedding_api_key": ["embedding", "api", "apikey"],
+    "get_current_model_status": ["model", "status", "provider", "current", "using"],
+}
+
+# A word of a tool name or description selects the tool only when at most this many tools use it
+DISTINCTIVE_WORD_MAX_TOOLS = 2
+
+_STOPWORDS = {
+    "the", "and", "for", "with", "from", "that", "this", "into", "are", "can", "use", "used", "all", "any",
+    "not", "but", "its", "each", "per", "one", "two", "get", "set", "str", "int", "dict", "list", "bool",
+    "default", "true", "false", "none", "returns", "return", "example", "args", "arguments", "eg",
+    # Words of everyday questions that happen to appear in only a few descriptions
+    "show", "give", "what", "which", "last", "hour", "hours", "minute", "minutes", "day", "days", "week",
+    "today", "yesterday", "time", "window", "app", "apps", "generate",
+}
+
+_WORD = re.compile(r"[a-z][a-z0-9_]+")
+_SECTION_HEADER = re.compile(r"^(\*\*.+\*\*:?|[A-Z][\w ]*:)$")
+
+
+def _words(text):
+    words = set()
+    for word in _WORD.findall((text or "").lower()):
+        words.update(w for w in word.split("_") if len(w) > 2)
+    return words - _STOPWORDS
+
+
+def _normalize(word):
+    # Plain plural folding, enough to match "hosts" with "host" and "alerts" with "alert"
+    return word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+
+
+def compact_description(description):
+    """Description without indentation, blank lines and call/result examples.
+    Examples of the input format (chart data, report pages) are kept, result examples are cut at the "->"."""
+    lines = []
+    in_example = skipping = False
+    for raw in (description or "").splitlines():
+        line = raw.strip()
+        if skipping:
+            if line and not _SECTION_HEADER.match(line):
+                continue
+            skipping = False
+        if not line:
+            in_example = False
+            continue
+        in_example = in_example or line.startswith("Example")
+        if in_example and "->" in line:
+            # The rest of the example is the result, up to the next blank line or section
+            line = line.split("->", 1)[0].rstrip()
+            skipping = True
+        lines.append(re.sub(r"\s{2,}", " ", line))
+    return "\n".join(lines)
+
+
+def compact_schema(schema):
+    """JSON schema without the titles pydantic derives from the argument names."""
+    if isinstance(schema, dict):
+        return {k: compact_schema(v) for k, v in schema.items() if not (k == "title" and isinstance(v, str))}
+    if isinstance(schema, list):
+        return [compact_schema(v) for v in schema]
+    return schema
+
+
+class ToolRouter:
+    """Picks the tools to bind for a conversation by keyword matching the user messages against the tools.
+
+    The keyword index is built once from the tool list: the tool name, TOOL_KEYWORDS and the words that only
+    one or two tool descriptions use. CORE_TOOLS are always bound. When the user messages have no word the index
+    knows at all, every tool is bound: the question is worded in a way routing cannot judge. The tools keep the
+    order of the server's tool list and the selection of a conversation only grows (the union of its earlier
+    selections is kept), so the tool definitions stay a stable prompt prefix for the provider's prompt cache.
+    """
+
+    def __init__(self, tools, core_tools=None, logging=None):
+        """tools: tool definitions in OpenAI function format, in the order to bind them."""
+        self.logging = logging
+        self.core_tools = set(CORE_TOOLS if core_tools is None else core_tools)
+        self.tools = []
+        for tool in tools:
+            compact = copy.deepcopy(tool)
+            compact["function"]["description"] = compact_description(tool["function"].get("description"))
+            compact["function"]["parameters"] = compact_schema(tool["function"].get("parameters") or {})
+            self.tools.append(compact)
+
+        self.keywords = {}
+        for source in ("name", "description"):
+            words = {t["function"]["name"]: {_normalize(w) for w in _words(t["function"].get(source))} for t in tools}
+            tool_count = Counter(w for tool_words in words.values() for w in tool_words)
+            for name, tool_words in words.items():
+                self.keywords.setdefault(name, set()).update(w for w in tool_words if tool_count[w] <= DISTINCTIVE_WORD_MAX_TOOLS)
+        for name, keywords in TOOL_KEYWORDS.items():
+            if name in self.keywords:
+                self.keywords[name].update(_normalize(w) for w in keywords)
+        self.vocabulary = set().union(*self.keywords.values())
+        # Tool names bound so far, by id of the conversation object, dropped when the object is collected
+        self._selections = {}
+
+        if self.logging:
+            full = sum(len(str(t)) for t in tools)
+            self.logging.info(f"[ToolRouter] Indexed {len(self.tools)} tools, compacted tool definitions from {full} to {sum(len(str(t)) for t in self.tools)} chars")
+
+    def select(self, user_texts, used_tools=(), conversation=None):
+        """Tool definitions for a conversation with the given user messages and already called tools.
+        conversation: an object that lives as long as the conversation (its first message), the tools
+        selected for it before stay selected."""
+        query_words = set()
+        for text in user_texts:
+            query_words.update(_normalize(w) for w in _words(text))
+
+        if query_words & self.vocabulary:
+            names = {
+                t["function"]["name"] for t in self.tools
+                if t["function"]["name"] in self.core_tools or t["function"]["name"] in used_tools or self.keywords.get(t["function"]["name"], set()) & query_words
+            }
+        else:
+            names = {t["function"]["name"] for t in self.tools}
+        if conversation is not None:
+            key = id(conversation)
+            if key not in self._selections:
+                weakref.finalize(conversation, self._selections.pop, key, None)
+            names |= self._selections.get(key, set())
+            self._selections[key] = names
+        return [t for t in self.tools if t["function"]["name"] in names]
@@ -0,0 +1,162 @@
+import contextvars
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+
+# Key of the trace context in the MCP request _meta, set by the client and read by the server
+TRACE_META_KEY = "trisulTrace"
+
+_current_span = contextvars.ContextVar("trisul_current_span", default=None)
+
+# Trace context of the calling client, for callers that do not go through an MCP request (in-process transport)
+remote_trace_context = contextvars.ContextVar("trisul_remote_trace_context", default=None)
+
+
+class Span:
+    """One timed stage. to_dict() uses the OpenTelemetry (OTLP JSON) field names."""
+
+    def __init__(self, service, name, trace_id, parent_id, attributes):
+        self.service = service
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = dict(attributes)
+        self.start_time = time.time()
+        self.end_time = None
+        self._start = time.perf_counter()
+        self.duration_ms = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def end(self):
+        self.duration_ms = (time.perf_counter() - self._start) * 1000
+        self.end_time = self.start_time + self.duration_ms / 1000
+
+    def to_dict(self):
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "service": self.service,
+            "startTimeUnixNano": int(self.start_time * 1e9),
+            "endTimeUnixNano": int((self.end_time or self.start_time) * 1e9),
+            "durationMs": round(self.duration_ms or 0, 3),
+            "attributes": self.attributes,
+        }
+
+
+class Tracer:
+    """Records spans of the agent loop and the MCP tools.
+
+    Finished spans are kept in memory (last max_spans) for the /stats breakdown and, when
+    export_path is set, appended to that file as JSON lines.
+    """
+
+    def __init__(self, service, max_spans=5000, export_path=None, logging=None):
+        self.service = service
+        self.export_path = export_path
+        self.logging = logging
+        self._spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, trace_id=None, parent_id=None, **attributes):
+        parent = _current_span.get()
+        if parent is not None and trace_id is None:
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        span = Span(self.service, name, trace_id or uuid.uuid4().hex, parent_id, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set(error=str(e) or type(e).__name__)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+            self._record(span)
+
+    def _record(self, span):
+        with self._lock:
+            self._spans.append(span)
+            if self.export_path:
+                try:
+                    with open(self.export_path, "a") as file:
+                        file.write(json.dumps(span.to_dict(), default=str) + "\n")
+                except OSError as e:
+                    if self.logging:
+                        self.logging.warning(f"[Tracer] Unable to export span to {self.export_path}: {e}")
+
+    def spans(self, trace_id=None):
+        with self._lock:
+            return [s.to_dict() for s in self._spans if trace_id is None or s.trace_id == trace_id]
+
+
+def current_trace_meta():
+    """Trace context of the current span, to send along with an MCP request as _meta."""
+    span = _current_span.get()
+    if span is None:
+        return None
+    return {TRACE_META_KEY: {"traceId": span.trace_id, "parentSpanId": span.span_id}}
+
+
+def summarize_turn(spans):
+    """Time breakdown of one agent turn from its client and server spans."""
+    def total(name):
+        return sum(s["durationMs"] for s in spans if s["name"] == name)
+
+    def count(name):
+        return sum(1 for s in spans if s["name"] == name)
+
+    llm_spans = [s for s in spans if s["name"] == "llm.invoke"]
+    tools = {}
+    for s in spans:
+        if s["name"] == "mcp.call_tool":
+            entry = tools.setdefault(s["attributes"].get("tool"), {"calls": 0, "ms": 0, "result_bytes": 0})
+            entry["calls"] += 1
+            entry["ms"] += s["durationMs"]
+            entry["result_bytes"] += s["attributes"].get("result_bytes", 0)
+
+    models = {}
+    for s in llm_spans:
+        entry = models.setdefault(s["attributes"].get("model"), {"role": s["attributes"].get("role"), "calls": 0, "ms": 0, "input_tokens": 0, "output_tokens": 0})
+        entry["calls"] += 1
+        entry["ms"] += s["durationMs"]
+        entry["input_tokens"] += s["attributes"].get("input_tokens", 0)
+        entry["output_tokens"] += s["attributes"].get("output_tokens", 0)
+
+    input_tokens = sum(s["attributes"].get("input_tokens", 0) for s in llm_spans)
+    cache_read_tokens = sum(s["attributes"].get("cache_read_tokens", 0) for s in llm_spans)
+    turn_ms = total("agent.turn")
+    client_tool_ms = total("mcp.call_tool")
+    server_tool_ms = total("server.tool")
+    return {
+        "turn_ms": turn_ms,
+        "llm_calls": len(llm_spans),
+        "llm_ms": total("llm.invoke"),
+        "input_tokens": input_tokens,
+        "output_tokens": sum(s["attributes"].get("output_tokens", 0) for s in llm_spans),
+        "cache_read_tokens": cache_read_tokens,
+        "cache_hit_rate": cache_read_tokens / input_tokens if input_tokens else 0,
+        "cost_usd": sum(s["attributes"].get("cost_usd") or 0 for s in llm_spans),
+        "models": models,
+        "tool_calls": count("mcp.call_tool"),
+        "tool_ms": client_tool_ms,
+        "server_tool_ms": server_tool_ms,
+        "transport_ms": max(0, client_tool_ms - server_tool_ms) if server_tool_ms else None,
+        "trp_requests": count("trp.request"),
+        "trp_ms": total("trp.request"),
+        "trp_bytes": sum(s["attributes"].get("response_bytes", 0) for s in spans if s["name"] == "trp.request"),
+        "message_to_dict_ms": total("trp.message_to_dict"),
+        "toon_ms": total("toon.encode"),
+        "chart_ms": total("chart.render"),
+        "other_ms": max(0, turn_ms - total("llm.invoke") - client_tool_ms - total("chart.render")),
+        "tools": tools,
+    }
@@ -0,0 +1,108 @@
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+
+class TRPResultCache:
+    """Disk cache of TRP query results backed by SQLite.
+
+    Results for closed time intervals never change on the hub, so they are kept until evicted.
+    Entries are stored as compressed JSON and the least recently used entries are evicted
+    once the cache grows past max_bytes.
+    """
+
+    def __init__(self, db_path, max_bytes=256 * 1024 * 1024, logging=None):
+        self.db_path = str(db_path)
+        self.max_bytes = max_bytes
+        self.logging = logging
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS trp_cache (
+                cache_key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS trp_cache_last_access ON trp_cache (last_access)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM trp_cache").fetchone()[0]
+
+    @staticmethod
+    def make_key(*parts):
+        return "|".join("" if p is None else str(p) for p in parts)
+
+    def get(self, cache_key):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM trp_cache WHERE cache_key = ?", (cache_key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE trp_cache SET last_access = ? WHERE cache_key = ?", (time.time(), cache_key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, cache_key, value):
+        blob = zlib.compress(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM trp_cache WHERE cache_key = ?", (cache_key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO trp_cache (cache_key, value, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (cache_key, blob, len(blob), now, now),
+            )
+            self._total_bytes += len(blob) - (old[0] if old else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache is back under 90% of max_bytes."""
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        for cache_key, size in self._conn.execute("SELECT cache_key, size FROM trp_cache ORDER BY last_access").fetchall():
+            if self._total_bytes <= target:
+                break
+            self._conn.execute("DELETE FROM trp_cache WHERE cache_key = ?", (cache_key,))
+            self._total_bytes -= size
+            evicted += 1
+        if self.logging:
+            self.logging.info(f"[TRPResultCache] Evicted {evicted} entries, cache size is now {self._total_bytes} bytes")
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM trp_cache").fetchone()[0]
+        return {"entries": entries, "size_bytes": self._total_bytes, "max_bytes": self.max_bytes, "hits": self.hits, "misses": self.misses}
+
+
+def closed_segments(from_ts, to_ts, closed_until, segment_secs):
+    """Split [from_ts, to_ts] into segment_secs aligned segments.
+    Returns (segments, tail_start) where segments are the (start, end) pairs that are completely
+    closed before closed_until and tail_start is where the open part starts (None if there is none).
+    """
+    segments = []
+    start = from_ts - (from_ts % segment_secs)
+    while start <= to_ts and start + segment_secs <= closed_until:
+        segments.append((start, start + segment_secs))
+        start += segment_secs
+    tail_start = start if start <= to_ts else None
+    return segments, tail_start
+
+
+def contiguous_runs(segments):
+    """Group consecutive (start, end) segments into runs, so each run can be fetched with one request."""
+    runs = []
+    for segment in segments:
+        if runs and runs[-1][-1][1] == segment[0]:
+            runs[-1].append(segment)
+        else:
+            runs.append([segment])
+    return runs
@@ -0,0 +1,194 @@
+import json
+import math
+import re
+import sqlite3
+import threading
+import time
+
+
+# Facts attached to a question, and facts shown to the memory update as the existing memory
+MEMORY_TOP_K = 5
+MEMORY_UPDATE_TOP_K = 20
+# Relevance of a fact halves every MEMORY_HALF_LIFE_DAYS since it was last confirmed
+MEMORY_HALF_LIFE_DAYS = 90
+# Facts whose key contains one of these words go with every question (the user's name for greetings)
+MEMORY_PINNED_KEY_WORDS = ("name",)
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {
+    "the", "and", "for", "with", "from", "that", "this", "what", "which", "who", "how", "are", "was", "were",
+    "you", "your", "can", "could", "would", "should", "please", "show", "give", "get", "tell", "all", "any",
+    "last", "about", "into", "over", "have", "has", "had", "not", "but", "its", "them", "they", "there",
+}
+
+
+def _keywords(text):
+    words = []
+    for word in _WORD.findall(str(text or "").lower()):
+        if len(word) > 2 and word not in _STOPWORDS:
+            # Plain plural folding, "hosts" finds "host"
+            word = word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+            if word not in words:
+                words.append(word)
+    return words
+
+
+def load_memory(path):
+    """Memory facts stored at path, [] if the file is missing or unreadable."""
+    try:
+        with open(path, "r") as file:
+            memory = json.load(file)
+        return memory if isinstance(memory, list) else []
+    except (OSError, ValueError):
+        return []
+
+
+def parse_memory_diff(text):
+    """{"upsert": [facts], "delete": [keys]} from the LLM answer (with or without a ```json fence)."""
+    diff = json.loads(re.sub(r"```json|```", "", text).strip())
+    if isinstance(diff, list):
+        # A full memory list instead of a diff, treat every fact as an upsert
+        diff = {"upsert": diff, "delete": []}
+    if not isinstance(diff, dict):
+        raise ValueError(f"Memory diff must be a JSON object, got {type(diff).__name__}")
+    upsert = [fact for fact in diff.get("upsert") or [] if isinstance(fact, dict) and fact.get("key")]
+    delete = [str(key) for key in diff.get("delete") or [] if key]
+    return {"upsert": upsert, "delete": delete}
+
+
+def format_facts(facts):
+    """Facts as short "key: value" lines for a prompt."""
+    lines = []
+    for fact in facts:
+        value = fact.get("value")
+        value = ", ".join(str(v) for v in value) if isinstance(value, list) else str(value)
+        lines.append(f"- {fact.get('key')}: {value}")
+    return "\n".join(lines)
+
+
+class MemoryStore:
+    """User memory facts in SQLite with a keyword index.
+
+    Each fact is the JSON object the memory update returns (key, value, confidence, source ...), stored under
+    its lower cased key with the time it was last updated. search() ranks facts by keyword relevance (FTS5 bm25,
+    plain keyword overlap when SQLite has no FTS5), confidence and recency, so only the facts relevant to a
+    question go into the prompt. Diffs are applied in one transaction.
+    """
+
+    def __init__(self, db_path, import_path=None, logging=None):
+        self.db_path = str(db_path)
+        self.logging = logging
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS memory_facts (
+                fact_key TEXT PRIMARY KEY,
+                fact TEXT NOT NULL,
+                search_text TEXT NOT NULL,
+                confidence REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                last_used_at REAL
+            )
+        """)
+        try:
+            self._conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS memory_facts_fts USING fts5(fact_key UNINDEXED, search_text)")
+            self.fts = True
+        except sqlite3.OperationalError:
+            self.fts = False
+        self._conn.commit()
+
+        # Facts of the JSON memory file of earlier versions, imported once into an empty store
+        if import_path and self.count() == 0:
+            facts = load_memory(import_path)
+            if facts:
+                changes = self.apply_diff({"upsert": facts, "delete": []})
+                if self.logging:
+                    self.logging.info(f"[MemoryStore] Imported {changes} facts from {import_path}")
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM memory_facts").fetchone()[0]
+
+    def all(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT fact FROM memory_facts ORDER BY updated_at").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def apply_diff(self, diff, confidence_threshold=0):
+        """Upsert and delete facts by key (case-insensitive), upserts below confidence_threshold are skipped.
+        Returns the number of facts changed."""
+        now = time.time()
+        changes = 0
+        with self._lock:
+            with self._conn:
+                for key in diff.get("delete", []):
+                    fact_key = str(key).strip().lower()
+                    changes += self._conn.execute("DELETE FROM memory_facts WHERE fact_key = ?", (fact_key,)).rowcount
+                    if self.fts:
+                        self._conn.execute("DELETE FROM memory_facts_fts WHERE fact_key = ?", (fact_key,))
+
+                for fact in diff.get("upsert", []):
+                    try:
+                        confidence = float(fact.get("confidence", 100))
+                    except (TypeError, ValueError):
+                        continue
+                    if confidence < confidence_threshold:
+                        continue
+                    fact_key = str(fact["key"]).strip().lower()
+                    fact_json = json.dumps(fact, sort_keys=True, default=str)
+                    old = self._conn.execute("SELECT fact FROM memory_facts WHERE fact_key = ?", (fact_key,)).fetchone()
+                    if old and old[0] == fact_json:
+                        continue
+                    search_text = " ".join(_keywords(f"{fact.get('key')} {json.dumps(fact.get('value'), default=str)}"))
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO memory_facts (fact_key, fact, search_text, confidence, updated_at) VALUES (?, ?, ?, ?, ?)",
+                        (fact_key, fact_json, search_text, confidence, now),
+                    )
+                    if self.fts:
+                        self._conn.execute("DELETE FROM memory_facts_fts WHERE fact_key = ?", (fact_key,))
+                        self._conn.execute("INSERT INTO memory_facts_fts (fact_key, search_text) VALUES (?, ?)", (fact_key, search_text))
+                    changes += 1
+        return changes
+
+    def _relevance(self, words):
+        """{fact_key: keyword relevance} of the facts matching any of the words."""
+        if self.fts:
+            match = " OR ".join(f'"{word}"*' for word in words)
+            rows = self._conn.execute(
+                "SELECT fact_key, bm25(memory_facts_fts) FROM memory_facts_fts WHERE memory_facts_fts MATCH ?", (match,)
+            ).fetchall()
+            # bm25 is lower for better matches
+            return {key: -score for key, score in rows}
+
+        relevance = {}
+        for key, search_text in self._conn.execute("SELECT fact_key, search_text FROM memory_facts").fetchall():
+            fact_words = search_text.split()
+            hits = sum(1 for word in words if any(w.startswith(word) for w in fact_words))
+            if hits:
+                relevance[key] = hits / len(fact_words)
+        return relevance
+
+    def search(self, text, limit=MEMORY_TOP_K, pinned=True):
+        """Facts relevant to text, best first: keyword relevance weighted by confidence and recency.
+        With pinned, facts whose key has a MEMORY_PINNED_KEY_WORDS word come first."""
+        words = _keywords(text)
+        now = time.time()
+        with self._lock:
+            relevance = self._relevance(words) if words else {}
+            rows = self._conn.execute("SELECT fact_key, fact, confidence, updated_at FROM memory_facts").fetchall()
+
+            pinned_facts, scored = [], []
+            for key, fact, confidence, updated_at in rows:
+                if pinned and any(word in key for word in MEMORY_PINNED_KEY_WORDS):
+                    pinned_facts.append((key, json.loads(fact)))
+                elif key in relevance:
+                    recency = math.pow(0.5, (now - updated_at) / (MEMORY_HALF_LIFE_DAYS * 86400))
+                    scored.append((relevance[key] * (confidence / 100) * recency, key, json.loads(fact)))
+            scored.sort(key=lambda item: item[0], reverse=True)
+
+            selected = pinned_facts + [(key, fact) for _, key, fact in scored[:limit]]
+            if selected:
+                self._conn.executemany("UPDATE memory_facts SET last_used_at = ? WHERE fact_key = ?", [(now, key) for key, _ in selected])
+                self._conn.commit()
+        return [fact for _, fact in selected]
@@ -1,16 +1,92 @@
-import matplotlib.pyplot as plt
 from datetime import datetime
-from matplotlib.ticker import FuncFormatter
-import matplotlib.dates as mdates
 import ast
+import asyncio
 import json
+import logging
+import multiprocessing
+import os
 import re
 
 
+# Saved charts (save_image=True, report pages) render in a pool of worker processes with the
+# non-interactive Agg backend, so they do not hold up the event loop and render in parallel
+RENDER_WORKERS = min(4, os.cpu_count() or 1)
+
+# Line series longer than this are drawn without point markers
+LINE_MARKER_MAX_POINTS = 200
+# Tooltip shows the nearest point within this many pixels of the mouse
+TOOLTIP_MAX_DISTANCE_PX = 15
+
+
+def epoch_to_datenum(timestamps):
+    """Epoch seconds to matplotlib date numbers in local time (what datetime.fromtimestamp gives), vectorized."""
+    import numpy as np
+    import matplotlib.dates as mdates
+
+    ts = np.asarray(timestamps, dtype=float)
+    if ts.size == 0:
+        return ts
+    first, last = int(ts.min()), int(ts.max())
+    offsets = [datetime.fromtimestamp(t).astimezone().utcoffset().total_seconds() for t in (first, last)]
+    if offsets[0] == offsets[1]:
+        local = ts + offsets[0]
+    else:
+        # The series crosses a DST change, take the offset per point
+        local = ts + np.array([datetime.fromtimestamp(t).astimezone().utcoffset().total_seconds() for t in ts])
+    return mdates.date2num(local.astype("datetime64[s]"))
+
+
+def decimate_min_max(x, y, buckets):
+    """Reduce a series to the min and max point of each of `buckets` equal index ranges.
+    The peaks and dips stay visible at screen resolution with about 2 * buckets points."""
+    import numpy as np
+
+    n = len(y)
+    if buckets <= 0 or n <= 2 * buckets:
+        return x, y
+    per_bucket = -(-n // buckets)
+    padded = np.concatenate([y, np.full(per_bucket * buckets - n, y[-1])]).reshape(buckets, per_bucket)
+    base = np.arange(buckets) * per_bucket
+    index = np.unique(np.concatenate([base + padded.argmin(axis=1), base + padded.argmax(axis=1), [0, n - 1]]))
+    index = index[index < n]
+    return x[index], y[index]
+
+
+def _init_render_worker():
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+def render_chart_file(kind, data, file_path, dpi=300):
+    """Draw a chart on an Agg Figure and save it to file_path. Runs in a render worker process (or thread)."""
+    from matplotlib.figure import Figure
+
+    utils = TrisulAIUtils(logging=logging)
+    fig = Figure(figsize=TrisulAIUtils.CHART_SIZES[kind])
+    getattr(utils, f"draw_{kind}_chart")(fig, data)
+    fig.savefig(file_path, dpi=dpi, bbox_inches='tight')
+    return file_path
+
+
+def show_chart_window(kind, data):
+    """Show a chart in an interactive window, runs in its own process until the window is closed."""
+    import matplotlib.pyplot as plt
+
+    utils = TrisulAIUtils(logging=logging)
+    fig = plt.figure(figsize=TrisulAIUtils.CHART_SIZES[kind])
+    getattr(utils, f"draw_{kind}_chart")(fig, data, interactive=True)
+    plt.show()
+
+
 class TrisulAIUtils:
     """Utility class for Trisul AI CLI"""
+    CHART_SIZES = {"line": (12, 6), "pie": (7, 6)}
+
     def __init__(self,logging=None):
         self.logging = logging
+        self._render_pool = None
+        self._render_in_threads = False
+        self._chart_windows = []
 
     
     def bytes_to_human(self, num, as_string=True):
@@ -28,6 +104,49 @@ class TrisulAIUtils:
     
     
 
+    # CHART RENDERING
+
+    def get_render_pool(self):
+        if self._render_pool is None:
+            from concurrent.futures import ProcessPoolExecutor
+            # spawn, not fork: the CLI process runs threads (input reader, MCP session) that fork would copy mid-state
+            self._render_pool = ProcessPoolExecutor(max_workers=RENDER_WORKERS, mp_context=multiprocessing.get_context("spawn"), initializer=_init_render_worker)
+        return self._render_pool
+
+    async def render_chart(self, kind, data, file_path=None):
+        """Save the chart to file_path in a render worker, or open it in a window without waiting for the window to close."""
+        if not file_path:
+            # A window needs the GUI main loop of its process, each chart window gets its own process
+            self._chart_windows = [p for p in self._chart_windows if p.is_alive()]
+            window = multiprocessing.get_context("spawn").Process(target=show_chart_window, args=(kind, data), daemon=True)
+            window.start()
+            self._chart_windows.append(window)
+            self.logging.info(f"[Utils] [render_chart] {kind} chart window opened (pid {window.pid})")
+            return None
+
+        loop = asyncio.get_running_loop()
+        try:
+            if self._render_in_threads:
+                await asyncio.to_thread(render_chart_file, kind, data, file_path)
+            else:
+                await loop.run_in_executor(self.get_render_pool(), render_chart_file, kind, data, file_path)
+        except (OSError, RuntimeError) as e:
+            # No worker processes (broken pool, process limits), Agg Figures can also be drawn on threads
+            self.logging.warning(f"[Utils] [render_chart] Render process failed ({e}), rendering charts on threads")
+            self.shutdown_renderer()
+            self._render_in_threads = True
+            await asyncio.to_thread(render_chart_file, kind, data, file_path)
+        self.logging.info(f"[Utils] [render_chart] {kind} chart saved to {file_path}")
+        return file_path
+
+    def shutdown_renderer(self):
+        """Stop the render workers. Open chart windows are daemon processes and close with the CLI."""
+        if self._render_pool is not None:
+            self._render_pool.shutdown(wait=False)
+            self._render_pool = None
+
+
+
     # LINE CHART
     
     async def display_line_chart(self, line_chart_data, file_path=None):
@@ -49,36 +168,46 @@ class TrisulAIUtils:
             self.logging.error("[Utils] [display_line_chart] Invalid line chart data format. Expected dict or JSON string.")
             return
 
+        if not any(series.get("values") for series in data.get("keys", [])):
+            self.logging.warning("[Utils] [display_line_chart] No data points to plot.")
+            return
 
+        return await self.render_chart("line", data, file_path)
 
 
+    def draw_line_chart(self, fig, data, interactive=False):
+        # matplotlib is imported on the first chart, not at CLI start
+        import numpy as np
+        import matplotlib.dates as mdates
+        from matplotlib.ticker import FuncFormatter
 
-        fig, ax = plt.subplots(figsize=(12, 6))
+        ax = fig.add_subplot()
         scatter_points = []
-        all_values = []  # collect all values to find best axis scale
+        max_val = 0  # largest value, to find the best axis scale
+        # More points than pixels across the plot cannot be seen, keep a min and a max per pixel column
+        width_px = int(fig.get_figwidth() * fig.dpi)
 
         for series in data.get("keys", []):
-            # Convert epoch seconds → datetime
-            timestamps = [datetime.fromtimestamp(ts) for ts in series["timestamps"]]
-            values = series["values"]
-            all_values.extend(values)
-
+            # Convert epoch seconds → date numbers
+            x = epoch_to_datenum(series["timestamps"])
+            y = np.asarray(series["values"], dtype=float)
+            order = np.argsort(x, kind="stable")
+            x, y = x[order], y[order]
+            if y.size:
+                max_val = max(max_val, float(y.max()))
+
+            plot_x, plot_y = decimate_min_max(x, y, width_px)
             line, = ax.plot(
-                timestamps,
-                values,
+                plot_x,
+                plot_y,
                 label=series["legend_label"],
                 color=series.get("color", None),
-                marker='o'
+                marker='o' if len(plot_x) <= LINE_MARKER_MAX_POINTS else None
             )
-            scatter_points.append((line, timestamps, values))
+            scatter_points.append((line, x, y))
+        ax.xaxis_date()
 
         # Determine global scale for axis
-        if not all_values:
-            self.logging.warning("[Utils] [display_line_chart] No data points to plot.")
-            plt.close()
-            return
-
-        max_val = max(all_values)
         if max_val == 0:
             scale_factor = 1
             unit = "B"
@@ -99,51 +228,78 @@ class TrisulAIUtils:
         ax.legend()
         ax.grid(True)
         fig.autofmt_xdate()
-        
-        # Create annotation (tooltip)
+
+        if interactive:
+            self._add_line_chart_tooltip(fig, ax, scatter_points)
+        fig.tight_layout()
+
+
+    def _add_line_chart_tooltip(self, fig, ax, scatter_points):
+        import numpy as np
+        import matplotlib.dates as mdates
+
+        # Create annotation (tooltip), animated: it is drawn by blitting over a saved background
         annot = ax.annotate(
             "", xy=(0,0), xytext=(20,20), textcoords="offset points",
             bbox=dict(boxstyle="round", fc="w"),
-            arrowprops=dict(arrowstyle="->")
+            arrowprops=dict(arrowstyle="->"),
+            animated=True
         )
         annot.set_visible(False)
+        canvas = fig.canvas
+        state = {"background": None, "point": None}
 
-        def update_annot(ind, line, x_data, y_data):
-            x = x_data[ind]
-            y = y_data[ind]
+        def on_draw(event):
+            state["background"] = canvas.copy_from_bbox(fig.bbox) if canvas.supports_blit else None
+            if annot.get_visible():
+                fig.draw_artist(annot)
+
+        def redraw():
+            if state["background"] is None:
+                canvas.draw_idle()
+                return
+            canvas.restore_region(state["background"])
+            if annot.get_visible():
+                fig.draw_artist(annot)
+            canvas.blit(fig.bbox)
+
+        def nearest_point(event):
+            # Bisect each series at the mouse time, the closest of the two neighbours in screen space wins
+            best = None
+            for line, x_data, y_data in scatter_points:
+                if not line.get_visible() or not len(x_data):
+                    continue
+                i = int(np.searchsorted(x_data, event.xdata))
+                for j in (i - 1, i):
+                    if 0 <= j < len(x_data):
+                        px, py = ax.transData.transform((x_data[j], y_data[j]))
+                        distance = np.hypot(px - event.x, py - event.y)
+                        if distance <= TOOLTIP_MAX_DISTANCE_PX and (best is None or distance < best[0]):
+                            best = (distance, line, x_data[j], y_data[j])
+            return best
+
+        def hover(event):
+            found = nearest_point(event) if event.inaxes == ax else None
+            if found is None:
+                if annot.get_visible():
+                    annot.set_visible(False)
+                    state["point"] = None
+                    redraw()
+                return
+
+            _, line, x, y = found
+            if state["point"] == (line, x):
+                return
+            state["point"] = (line, x)
             annot.xy = (x, y)
-            text = f"{x.strftime('%Y-%m-%d %H:%M:%S')}\n{self.bytes_to_human(y)}"
-            annot.set_text(text)
+            annot.set_text(f"{mdates.num2date(x).strftime('%Y-%m-%d %H:%M:%S')}\n{self.bytes_to_human(y)}")
             annot.get_bbox_patch().set_facecolor(line.get_color())
             annot.get_bbox_patch().set_alpha(0.6)
+            annot.set_visible(True)
+            redraw()
 
-        def hover(event):
-            visible = annot.get_visible()
-            if event.inaxes == ax:
-                for line, x_data, y_data in scatter_points:
-                    cont, ind = line.contains(event)
-                    if cont:
-                        update_annot(ind["ind"][0], line, x_data, y_data)
-                        annot.set_visible(True)
-                        fig.canvas.draw_idle()
-                        return
-            if visible:
-                annot.set_visible(False)
-                fig.canvas.draw_idle()
-
-        fig.canvas.mpl_connect("motion_notify_event", hover)
-        plt.tight_layout()
-        
-        if(file_path):
-            plt.savefig(file_path, dpi=300, bbox_inches='tight')
-            plt.close()
-            self.logging.info(f"[Utils] [display_line_chart] Chart saved to {file_path}")
-        else:
-            self.logging.info("[Utils] [display_line_chart] Chart UI ready. Awaiting user interaction")
-            plt.show()
-            plt.close()
-            self.logging.info("[Utils] [display_line_chart] Chart closed by user")
-            print("🤖 (Bot) : Chart Closed\n")
+        canvas.mpl_connect("draw_event", on_draw)
+        canvas.mpl_connect("motion_notify_event", hover)
 
             
 
@@ -206,7 +362,17 @@ class TrisulAIUtils:
         self.logging.info("[Utils] [display_pie_chart] Rendering chart: title='%s' total_items=%d total_volume=%s",
                     chart_title, len(volumes), self.bytes_to_human(total_volume))
 
-        fig, ax = plt.subplots(figsize=(7, 6))
+        return await self.render_chart("pie", chart_opts, file_path)
+
+
+    def draw_pie_chart(self, fig, chart_opts, interactive=False):
+        labels = chart_opts.get('labels', [])
+        volumes = chart_opts.get('volumes', [])
+        colors = chart_opts.get('colors', [])
+        chart_title = chart_opts.get('chart_title', "Pie Chart")
+        legend_title = chart_opts.get('legend_title', "Legend")
+
+        ax = fig.add_subplot()
         wedges, texts = ax.pie(
             volumes,
             labels=labels,
@@ -217,7 +383,7 @@ class TrisulAIUtils:
         )
 
         ax.axis('equal')
-        plt.title(chart_title, pad=20)
+        ax.set_title(chart_title, pad=20)
         legend = ax.legend(
             wedges,
             labels,
@@ -227,6 +393,12 @@ class TrisulAIUtils:
             title=legend_title
         )
 
+        if interactive:
+            self._add_pie_chart_handlers(fig, ax, wedges, legend, labels, volumes)
+        fig.tight_layout()
+
+
+    def _add_pie_chart_handlers(self, fig, ax, wedges, legend, labels, volumes):
         self.logging.info("[Utils] [display_pie_chart] Hover and click event handlers initializing")
 
         # Tooltip
@@ -321,20 +493,3 @@ class TrisulAIUtils:
 
         fig.canvas.mpl_connect("motion_notify_event", on_motion)
         fig.canvas.mpl_connect("button_press_event", on_click)
-
-        plt.tight_layout()
-        
-        
-        if(file_path):
-            plt.savefig(file_path, dpi=300, bbox_inches='tight')
-            plt.close()
-            self.logging.info(f"[Utils] [display_pie_chart] Chart saved to {file_path}")
-
-        else:
-            self.logging.info("[Utils] [display_pie_chart] Chart UI ready. Awaiting user interaction")
-            plt.show()
-            plt.close()
-            self.logging.info("[Utils] [display_pie_chart] Chart closed by user")
-            print("🤖 (Bot) : Chart Closed\n")
-            
-